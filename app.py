@@ -19,6 +19,24 @@ from collections import namedtuple
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+from covid_model import InterventionSchedule, add_date_column
+from covid_model.age import US_AGE_SHARES, normalized, stylized_contacts
+from covid_model.assimilation import particle_filter
+from covid_model.cache import results
+from covid_model.calibration import FIT_DAYS, calibrate
+from covid_model.capacity import breach_table, capacity_frame, find_breaches, surge_plan_from_csv
+from covid_model.census import empirical_survival, gamma_survival
+from covid_model.graph import Graph
+from covid_model.integrators import INTEGRATORS
+from covid_model.jhu import case_data
+from covid_model.mcmc import credible_intervals, posterior_draws, sample_posterior
+from covid_model.metapop import REPORTING_FRACTION
+from covid_model.pipeline import add_resource_nodes, add_system_nodes, model_handles
+from covid_model.resources import catalogue_from_csv, item_labels, iter_resources_csv, ppe_catalogue
+from covid_model.system import peak_census, system_from_csv
+from covid_model.uncertainty import (
+    around, draw, percentile_bands, run_chain_binomial_ensemble, run_seird_ensemble, sample_parameters)
+
 hide_menu_style = """
         <style>
         #MainMenu {visibility: hidden;}
@@ -27,447 +45,6 @@ hide_menu_style = """
 st.markdown(hide_menu_style, unsafe_allow_html=True)
 
 
-###########################
-# Models and base functions
-###########################
-def sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n: float
-    ) -> Tuple[float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    i_n = (beta * s * i - gamma * i) + i
-    r_n = gamma * i + r
-    if s_n < 0.0:
-        s_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-
-    scale = n / (s_n + i_n + r_n)
-    return s_n * scale, i_n * scale, r_n * scale
-    
-def gen_sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
-    ) -> Generator[Tuple[float, float, float], None, None]:
-    """Simulate SIR model forward in time yielding tuples."""
-    s, i, r = (float(v) for v in (s, i, r))
-    n = s + i + r
-    for _ in range(n_days + 1):
-        yield s, i, r
-        s, i, r = sir(s, i, r, beta, gamma, n)
-
-def sim_sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, i, r = (float(v) for v in (s, i, r))
-    n = s + i + r
-    s_v, i_v, r_v = [s], [i], [r]
-    for day in range(n_days):
-        s, i, r = sir(s, i, r, beta, gamma, n)
-        s_v.append(s)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-    
-def sim_sir_df(
-    p) -> pd.DataFrame:
-    """Simulate the SIR model forward in time.
-
-    p is a Parameters instance. for circuluar dependency reasons i can't annotate it.
-    """
-    return pd.DataFrame(
-        data=gen_sir(S, total_infections, recovered, beta, gamma, n_days),
-        columns=("Susceptible", "Infected", "Recovered"),
-    )
-
-def get_dispositions(
-    patient_state: np.ndarray, rates: Tuple[float, ...], regional_hosp_share: float = 1.0
-    ) -> Tuple[np.ndarray, ...]:
-    """Get dispositions of infected adjusted by rate and market_share."""
-    return (*(patient_state * rate * regional_hosp_share for rate in rates),)
-
-def build_admissions_df(
-    dispositions) -> pd.DataFrame:
-    """Build admissions dataframe from Parameters."""
-    days = np.array(range(0, n_days + 1))
-    data_dict = dict(
-        zip(
-            ["day", "hosp", "icu", "vent"], 
-            [days] + [disposition for disposition in dispositions],
-        )
-    )
-    projection = pd.DataFrame.from_dict(data_dict)
-    
-    # New cases
-    projection_admits = projection.iloc[:-1, :] - projection.shift(1)
-    projection_admits["day"] = range(projection_admits.shape[0])
-    return projection_admits
-
-def build_census_df(
-    projection_admits: pd.DataFrame) -> pd.DataFrame:
-    """ALOS for each category of COVID-19 case (total guesses)"""
-    #n_days = np.shape(projection_admits)[0]
-    los_dict = {
-    "hosp": hosp_los, "icu": icu_los, "vent": vent_los,
-    }
-
-    census_dict = dict()
-    for k, los in los_dict.items():
-        census = (
-            projection_admits.cumsum().iloc[:-los, :]
-            - projection_admits.cumsum().shift(los).fillna(0)
-        ).apply(np.ceil)
-        census_dict[k] = census[k]
-
-    census_df = pd.DataFrame(census_dict)
-    census_df["day"] = census_df.index
-    census_df = census_df[["day", "hosp", "icu", "vent", 
-    ]]
-    
-    # PPE for hosp/icu
-    census_df['ppe_mild_d'] = census_df['hosp'] * ppe_mild_val_lower
-    census_df['ppe_mild_u'] = census_df['hosp'] * ppe_mild_val_upper
-    census_df['ppe_severe_d'] = census_df['icu'] * ppe_severe_val_lower
-    census_df['ppe_severe_u'] = census_df['icu'] * ppe_severe_val_upper
-    census_df['ppe_mean_mild'] = census_df[["ppe_mild_d","ppe_mild_u"]].mean(axis=1)
-    census_df['ppe_mean_severe'] = census_df[["ppe_severe_d","ppe_severe_u"]].mean(axis=1)
-    
-    census_df = census_df.head(n_days-10)
-    
-    return census_df
-
-def seir(
-    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n: float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    e_n = (beta * s * i) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    r_n = gamma * i + r
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + r_n)
-    return s_n * scale, e_n * scale, i_n * scale, r_n * scale
-
-def sim_seir(
-    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
-    for day in range(n_days):
-        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-
-def gen_seir(
-    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
-    ) -> Generator[Tuple[float, float, float, float], None, None]:
-    """Simulate SIR model forward in time yielding tuples."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    for _ in range(n_days + 1):
-        yield s, e, i, r
-        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
-# phase-adjusted https://www.nature.com/articles/s41421-020-0148-0     
-   
-def sim_seir_decay(
-    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
-    for day in range(n_days):
-        if start_day<=day<=int1_delta:
-            beta_decay=beta*(1-decay1)
-        elif int1_delta<=day<=int2_delta:
-            beta_decay=beta*(1-decay2)
-        elif int2_delta<=day<=end_delta:
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i, r = seir(s, e, i, r, beta_decay, gamma, alpha, n)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-# https://www.ncbi.nlm.nih.gov/pmc/articles/PMC4552173/
-
-def seird(
-    s: float, e: float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    e_n = (beta * s * i) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    r_n = (1-fatal)*gamma * i + r
-    d_n = (fatal)*gamma * i +d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, r_n * scale, d_n * scale
-
-def sim_seird_decay(
-    s: float, e:float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int, fatal: float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r, d= (float(v) for v in (s, e, i, r, d))
-    n = s + e + i + r + d
-    s_v, e_v, i_v, r_v, d_v = [s], [e], [i], [r], [d]
-    for day in range(n_days):
-        if start_day<=day<=int1_delta:
-            beta_decay=beta*(1-decay1)
-        elif int1_delta<=day<=int2_delta:
-            beta_decay=beta*(1-decay2)
-        elif int2_delta<=day<=end_delta:
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i, r,d = seird(s, e, i, r, d, beta_decay, gamma, alpha, n, fatal)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
-
-def seijcrd(
-    s: float, e: float, i: float, j:float, c:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal_hosp: float, hosp_rate:float, icu_rate:float, icu_days:float,crit_lag:float, death_days:float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * (i+j+c)) + s
-    e_n = (beta * s * (i+j+c)) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    j_n = hosp_rate * i * gamma + (1-icu_rate)* c *icu_days + j
-    c_n = icu_rate * j * (1/crit_lag) - c *  (1/death_days)
-    r_n = (1-hosp_rate)*gamma * i + (1-icu_rate) * (1/crit_lag)* j + r
-    d_n = (fatal_hosp)* c * (1/crit_lag)+d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if j_n < 0.0:
-        j_n = 0.0
-    if c_n < 0.0:
-        c_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + j_n+ c_n+ r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, c_n*scale, r_n * scale, d_n * scale
-
-def sim_seijcrd_decay(
-    s: float, e:float, i: float, j:float, c: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int, fatal_hosp: float, hosp_rate: float, icu_rate: float, icu_days:float, crit_lag: float, death_days:float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, j, c, r, d= (float(v) for v in (s, e, i, c, j, r, d))
-    n = s + e + i + j+r + d
-    s_v, e_v, i_v, j_v, c_v, r_v, d_v = [s], [e], [i], [j], [c], [r], [d]
-    for day in range(n_days):
-        if 0<=day<=21:
-            beta_decay=beta*(1-decay1)
-        elif 22<=day<=28:
-            beta_decay=beta*(1-decay2)
-        elif 29<=day<=end_delta: 
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i,j, c, r,d = seijcrd(s, e, i,j, c, r, d, beta_decay, gamma, alpha, n, fatal_hosp, hosp_rate, icu_rate, icu_days, crit_lag, death_days)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        j_v.append(j)
-        c_v.append(c)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(j_v),
-        np.array(c_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
-
-# Less complicated
-
-def seijcrd2(
-    s: float, e: float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float, fatal_hosp: float, hosp_rate:float,
-    hosp_day_rate:float, l:float
-    ) -> Tuple[float, float, float, float, float,float]:
-    """The SIR model, one time step."""
-    s_n = -beta*s*(i + (l*j)) +s
-    e_n = beta*s*(i + (l*j)) - alpha * e + e
-    i_n = alpha * e - (hosp_rate + gamma) * i + i 
-    j_n = hosp_rate * i - hosp_day_rate*j +j
-    r_n = gamma * (1-fatal)*i + ((1-fatal_hosp) * hosp_day_rate * j) +r
-    d_n = gamma * (fatal)*i + ((fatal_hosp)*hosp_day_rate*j) +d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if j_n < 0.0:
-        j_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + j_n+ r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, r_n * scale, d_n * scale
-# 
-
-def sim_seijcrd_decay2(
-    s: float, e:float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay2:float, decay3: float, fatal: float, fatal_hosp: float, hosp_rate: float, hosp_day_rate:float, l:float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, j, r, d= (float(v) for v in (s, e, i, j, r, d))
-    n = s + e + i + j+r + d
-    s_v, e_v, i_v, j_v, r_v, d_v = [s], [e], [i], [j], [r], [d]
-    for day in range(n_days):
-        if 0<=day<=21:
-            beta_decay=beta
-        elif 22<=day<=28:
-            beta_decay=beta*(1-decay2)
-        else: 
-            beta_decay=beta*(1-decay3)
-        s, e, i,j, r,d = seijcrd2(s, e, i,j, r, d, beta_decay, gamma, alpha, n, fatal, fatal_hosp, hosp_rate,hosp_day_rate, l)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        j_v.append(j)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(j_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
- 
-
-# Add dates #
-def add_date_column(
-    df: pd.DataFrame, drop_day_column: bool = False, date_format: Optional[str] = None,
-    ) -> pd.DataFrame:
-    """Copies input data frame and converts "day" column to "date" column
-
-    Assumes that day=0 is today and allocates dates for each integer day.
-    Day range can must not be continous.
-    Columns will be organized as original frame with difference that date
-    columns come first.
-
-    Arguments:
-        df: The data frame to convert.
-        drop_day_column: If true, the returned data frame will not have a day column.
-        date_format: If given, converts date_time objetcts to string format specified.
-
-    Raises:
-        KeyError: if "day" column not in df
-        ValueError: if "day" column is not of type int
-    """
-    if not "day" in df:
-        raise KeyError("Input data frame for converting dates has no 'day column'.")
-    if not pd.api.types.is_integer_dtype(df.day):
-        raise KeyError("Column 'day' for dates converting data frame is not integer.")
-
-    df = df.copy()
-    # Prepare columns for sorting
-    non_date_columns = [col for col in df.columns if not col == "day"]
-
-    # Allocate (day) continous range for dates
-    n_days = int(df.day.max())
-    start = start_date
-    end = start + timedelta(days=n_days + 1)
-    # And pick dates present in frame
-    dates = pd.date_range(start=start, end=end, freq="D")[df.day.tolist()]
-
-    if date_format is not None:
-        dates = dates.strftime(date_format)
-
-    df["date"] = dates
-
-    if drop_day_column:
-        df.pop("day")
-        date_columns = ["date"]
-    else:
-        date_columns = ["day", "date"]
-
-    # sort columns
-    df = df[date_columns + non_date_columns]
-
-    return df
-
-    
-# PPE Values
-ppe_mild_val_lower = 14
-ppe_mild_val_upper = 15
-ppe_severe_val_lower = 15
-ppe_severe_val_upper = 24
-
 # List of Groups
 groups = ['hosp', 'icu', 'vent']
 
@@ -475,18 +52,45 @@ groups = ['hosp', 'icu', 'vent']
 # model_options = st.sidebar.radio(
     # "Service", ('Inpatient', 'ICU', 'Ventilated'))
 
+cases_snapshot = case_data()
+counties = cases_snapshot.counties
+
 location_option = st.sidebar.radio(
-    "Location", ('United States', 'New York State', 'Erie County, NY'))
+    "Location", ('United States', 'New York State', 'Erie County, NY', 'Other state', 'Other county'))
 
+location = location_option
 if location_option =='United States':
     S = 328000000
     first_case_date = datetime(2020,1,20)
+    location_series = counties.national()
+    location_rows = counties.rows()
 if location_option =='New York State':
     S = 19450000
     first_case_date = datetime(2020,3,1)
+    location_series = counties.state('New York')
+    location_rows = counties.rows('New York')
 if location_option =='Erie County, NY':
     S = 1500000
     first_case_date = datetime(2020,3,16)
+    location_series = counties.county_by_name('New York', 'Erie')
+    location_rows = counties.rows('New York', 'Erie')
+if location_option in ('Other state', 'Other county'):
+    states = counties.states()
+    location_state = st.sidebar.selectbox("State", states, index=states.index('New York'))
+    if location_option == 'Other state':
+        location = (location_state,)
+        location_series = counties.state(location_state)
+        location_population = counties.population(location_state)
+        location_rows = counties.rows(location_state)
+    else:
+        location_county = st.sidebar.selectbox("County", counties.counties(location_state))
+        location = (location_state, location_county)
+        location_series = counties.county_by_name(location_state, location_county)
+        location_population = counties.population(location_state, location_county)
+        location_rows = counties.rows(location_state, location_county)
+    # Populations come from the JHU lookup table; the number input below can override them
+    S = int(location_population) if location_population > 0 else 1000000
+    first_case_date = counties.first_case_date(location_series) or datetime(2020,3,1)
 
 # Populations and Infections
 population = S
@@ -505,7 +109,6 @@ doubling_time = st.sidebar.number_input(
 
 start_date = st.sidebar.date_input(
     "Suspected first contact", first_case_date)
-start_day = 1
 
 ##relative_contact_rate = st.sidebar.number_input(
 ##    "Social distancing (% reduction in social contact) Unadjusted Model", 0, 100, value=0, step=5, format="%i")/100.0
@@ -535,6 +138,44 @@ end_delta = (end_date - start_date).days
 decay4 = st.sidebar.number_input(
     "Social distancing after end date", 0, 100, value=20 ,step=5, format="%i")/100.0
 
+# Each chosen date is the last day of the previous level
+schedule = InterventionSchedule([
+    (0, decay1, 0),
+    (int1_delta + 1, decay2, 0),
+    (int2_delta + 1, decay3, 0),
+    (end_delta + 1, decay4, 0),
+])
+
+schedule_file = st.sidebar.file_uploader(
+    "Social distancing schedule (CSV with date, reduction %, ramp_days) - replaces the phases above", type="csv")
+# Chart rules mark the chosen dates, as they always have; a schedule file's
+# dates are the first days of its phases
+intervention_days = [int1_delta, int2_delta, end_delta]
+if schedule_file is not None:
+    schedule = InterventionSchedule.from_csv(schedule_file, start_date)
+    intervention_days = [phase.day for phase in schedule.phases if phase.day > 0]
+
+calibration_mode = st.sidebar.checkbox(
+    "Fit doubling time and social distancing to confirmed cases (replaces the values above)", value=False)
+assimilation_mode = st.sidebar.checkbox(
+    "Start projections from the particle filter over the daily case feed", value=False)
+metapop_mode = not assimilation_mode and st.sidebar.checkbox(
+    "Couple all US counties through mobility (metapopulation model)", value=False)
+reporting_fraction = REPORTING_FRACTION
+if metapop_mode:
+    reporting_fraction = st.sidebar.number_input(
+        "Infections reported as confirmed cases, for seeding the counties (%)",
+        1.0, 100.0, value=REPORTING_FRACTION * 100, step=5.0, format="%f")/100.0
+age_mode = not (assimilation_mode or metapop_mode) and st.sidebar.checkbox(
+    "Age-structured model (rates by age band, schools and workplaces closed separately)", value=False)
+if age_mode:
+    school_closure = st.sidebar.number_input(
+        "School contacts closed from the school closure date (%), on top of social distancing",
+        0, 100, value=90, step=5, format="%i")/100.0
+    work_closure = st.sidebar.number_input(
+        "Workplace contacts closed from the business closure date (%), on top of social distancing",
+        0, 100, value=50, step=5, format="%i")/100.0
+
 hosp_rate = (
     st.sidebar.number_input("Hospitalization %", 0.0, 100.0, value=2.5, step=0.50, format="%f")/ 100.0)
 
@@ -571,6 +212,29 @@ fatal_hosp = st.sidebar.number_input(
 hosp_los = st.sidebar.number_input("Hospital Length of Stay", value=5, step=1, format="%i")
 icu_los = st.sidebar.number_input("ICU Length of Stay", value=9, step=1, format="%i")
 vent_los = st.sidebar.number_input("Ventilator Length of Stay", value=6, step=1, format="%i")
+los_distribution = st.sidebar.selectbox(
+    "Length of stay distribution", ("Fixed", "Gamma", "Empirical (CSV)"))
+if los_distribution == "Gamma":
+    los_shape = st.sidebar.number_input(
+        "Length of stay gamma shape (lengths of stay above are the means)", 0.1, 50.0, value=2.0, step=0.5, format="%f")
+if los_distribution == "Empirical (CSV)":
+    los_file = st.sidebar.file_uploader(
+        "Observed lengths of stay (CSV with hosp, icu and vent columns, in days)", type="csv")
+
+resources_file = st.sidebar.file_uploader(
+    "Resource catalogue (CSV with item, unit and per bed-day hosp, icu and vent use) - replaces PPE sets",
+    type="csv")
+system_file = st.sidebar.file_uploader(
+    "Health system hospitals (CSV with hospital, region FIPS, share and optional hosp_los, icu_los, vent_los)",
+    type="csv")
+
+# The daily Euler step loses accuracy when the infectious period is short;
+# the Runge-Kutta integrators take sub-daily steps over the same equations
+integrator = dict(zip(
+    ("Daily steps (Euler)", "Runge-Kutta 4, four steps a day", "Adaptive Runge-Kutta (Dormand-Prince 5(4))"),
+    INTEGRATORS))[st.sidebar.selectbox(
+        "Integrator", ("Daily steps (Euler)", "Runge-Kutta 4, four steps a day",
+                       "Adaptive Runge-Kutta (Dormand-Prince 5(4))"))]
 
 # regional_hosp_share = (
    # st.sidebar.number_input(
@@ -581,6 +245,55 @@ vent_los = st.sidebar.number_input("Ventilator Length of Stay", value=6, step=1,
 S = st.sidebar.number_input(
   "Regional Population", value=S_default, step=100000, format="%i")
 
+# Defaults follow US staffed beds, ICU beds and full-feature ventilators per 1,000 people
+capacity_mode = st.sidebar.checkbox("Compare census with bed, ICU and ventilator capacity", value=False)
+overflow_mode = False
+if capacity_mode:
+    capacity = (
+        st.sidebar.number_input("Staffed beds", 0, value=int(S * 2.4 / 1000), step=100, format="%i"),
+        st.sidebar.number_input("ICU beds", 0, value=int(S * 0.29 / 1000), step=10, format="%i"),
+        st.sidebar.number_input("Ventilators", 0, value=int(S * 0.19 / 1000), step=10, format="%i"))
+    surge_file = st.sidebar.file_uploader(
+        "Surge plan (CSV with date and hosp, icu and vent capacity from that date) - optional", type="csv")
+    # Hospital fatality applies in a bed; patients who find none die at these instead
+    overflow_mode = not (assimilation_mode or metapop_mode or age_mode) and st.sidebar.checkbox(
+        "Overflow mortality: project with beds filling up (capacity-constrained model)", value=False)
+    if overflow_mode:
+        overflow_fatal = (
+            st.sidebar.number_input(
+                "Fatality without a hospital bed (%)", 0.0, 100.0, value=20.0, step=1.0, format="%f")/100.0,
+            st.sidebar.number_input(
+                "Fatality without an ICU bed (%)", 0.0, 100.0, value=80.0, step=1.0, format="%f")/100.0)
+
+# The bands are drawn around the step-wise distancing model, not the filter's
+# or the one with beds filling up
+uncertainty_mode = not (assimilation_mode or metapop_mode or age_mode or overflow_mode) and st.sidebar.checkbox("Show uncertainty bands (Monte Carlo)", value=False)
+if uncertainty_mode:
+    n_draws = st.sidebar.number_input("Number of draws", 100, 20000, value=5000, step=500, format="%i")
+    stochastic_mode = st.sidebar.checkbox(
+        "Chance alone: stochastic replicates with the values above (whole patients, for small populations)",
+        value=False)
+    posterior_mode = False
+    if not stochastic_mode:
+        draw_kind = st.sidebar.selectbox("Parameter distribution", ("triangular", "uniform"))
+        spread_periods = st.sidebar.number_input(
+            "Incubation and infectious period uncertainty (+/- %)", 0, 100, value=20, step=5, format="%i")/100.0
+        spread_rates = st.sidebar.number_input(
+            "Hospital, ICU and ventilated % uncertainty (+/- %)", 0, 100, value=25, step=5, format="%i")/100.0
+        spread_fatal = st.sidebar.number_input(
+            "Fatality uncertainty (+/- %)", 0, 100, value=25, step=5, format="%i")/100.0
+        spread_decay = st.sidebar.number_input(
+            "Social distancing uncertainty (+/- %)", 0, 100, value=25, step=5, format="%i")/100.0
+        posterior_mode = st.sidebar.checkbox(
+            "Draw doubling time and social distancing from their posterior given confirmed cases (MCMC)", value=False)
+
+# Fits read the confirmed cases of the first fit_days days only, so each
+# candidate run stops there however long the case feed gets
+fit_days = FIT_DAYS
+if calibration_mode or (uncertainty_mode and posterior_mode):
+    fit_days = st.sidebar.number_input(
+        "Days of confirmed cases to fit, from the first contact", 10, value=FIT_DAYS, step=10, format="%i")
+
 ##initial_infections = st.sidebar.number_input(
 ##    "Currently Known Regional Infections (only used to compute detection rate - does not change projections)", value=known_infections, step=10.0, format="%f")
 initial_infections=known_cases
@@ -589,47 +302,9 @@ detection_prob = initial_infections / total_infections
 
 
 #S, I, R = S, initial_infections / detection_prob, 0
+# Rates (beta, gamma, alpha, ...) are nodes of the model graph below
 
-intrinsic_growth_rate = 2 ** (1 / doubling_time) - 1
-# (0.12 + 0.07)/
-
-recovered = 0.0
-
-# mean recovery rate, gamma, (in 1/days).
-gamma = 1 / recovery_days
-
-# Contact rate, beta
-beta = (
-    intrinsic_growth_rate + gamma
-) / S * (1-relative_contact_rate) # {rate based on doubling time} / {initial S}
-
-r_t = beta / gamma * S # r_t is r_0 after distancing
-r_naught = (intrinsic_growth_rate + gamma) / gamma
-#doubling_time_t = 1/np.log2(beta*S - gamma +1) # doubling time after distancing
-
-# Contact rate,  beta for SEIR
-beta2 = (
-    intrinsic_growth_rate + (1/infectious_period)
-) / S * (1-relative_contact_rate)
-alpha = 1/incubation_period
-
-# Contact rate,  beta for SEIR with phase adjusted R0
-beta3 = (
-(alpha+intrinsic_growth_rate)*(intrinsic_growth_rate + (1/infectious_period))
-) / (alpha*S) *(1-relative_contact_rate)
-
-## converting beta to intrinsic growth rate calculation
-# https://www.sciencedirect.com/science/article/pii/S2468042719300491
-beta4 = (
-    (alpha+intrinsic_growth_rate)*(intrinsic_growth_rate + (1/infectious_period))
-) / (alpha*S) 
-
-
-# for SEIJRD
-gamma_hosp = 1 / hosp_los
-icu_days = 1 / icu_los
-gamma2=1/infectious_period
-l=0.8
+#l=0.8
 #beta5= R_0_j * ((1/((gamma2)+(alpha)))+((alpha/(+(alpha)))*(l/gamma_hosp)))**(-1)
 #beta5= R_0_j * ((1/(gamma2+alpha) )+ ((l/(gamma_hosp))*(alpha/ (gamma2+alpha))))**(-1)
 ##beta5=(R_0_j * 1/((1/(gamma2+alpha)+alpha/(gamma2+alpha)*l/gamma_hosp)))/S
@@ -684,278 +359,197 @@ ventilated=RateLos(vent_rate, vent_los)
 
 rates = tuple(each.rate for each in (hospitalized, icu, ventilated))
 lengths_of_stay = tuple(each.length_of_stay for each in (hospitalized, icu, ventilated))
+if los_distribution == "Gamma":
+    lengths_of_stay = tuple(gamma_survival(los, los_shape, n_days) for los in lengths_of_stay)
+if los_distribution == "Empirical (CSV)" and los_file is not None:
+    observed_los = pd.read_csv(los_file)
+    lengths_of_stay = tuple(empirical_survival(observed_los[k]) for k in ("hosp", "icu", "vent"))
+catalogue = ppe_catalogue()
+if resources_file is not None:
+    try:
+        catalogue = catalogue_from_csv(resources_file)
+    except ValueError as error:
+        st.sidebar.warning("Could not read the resource catalogue: {}".format(error))
+health_system = None
+if system_file is not None:
+    try:
+        health_system = system_from_csv(system_file, (hosp_los, icu_los, vent_los))
+    except ValueError as error:
+        st.sidebar.warning("Could not read the health system: {}".format(error))
+# The particle filter's projection starts on the last assimilated day, so
+# the charts, their dates and the surge plan are laid out from that day
+chart_start_date = start_date
+if assimilation_mode:
+    assimilation = particle_filter(location, start_date, S, incubation_period, infectious_period, fatal)
+    assimilation.catch_up(location_series, counties.dates.values, start_date)
+    assimilated = assimilation.posterior()
+    chart_start_date = start_date + timedelta(days=assimilated.day)
+    intervention_days = [day - assimilated.day for day in intervention_days if day > assimilated.day]
+capacity_plan = None
+if capacity_mode:
+    capacity_plan = np.tile(np.asarray(capacity, dtype=float), (n_days, 1))
+    if surge_file is not None:
+        try:
+            capacity_plan = surge_plan_from_csv(surge_file, capacity, chart_start_date, n_days)
+        except (KeyError, ValueError) as error:
+            st.sidebar.warning("Could not read the surge plan: {}".format(error))
 
 
 #############
-### SIR model
-s_v, i_v, r_v = sim_sir(S-2, 1, 1 ,beta, gamma, n_days)
-susceptible_v, infected_v, recovered_v = s_v, i_v, r_v
-
-i_hospitalized_v, i_icu_v, i_ventilated_v = get_dispositions(i_v, rates, regional_hosp_share)
-
-r_hospitalized_v, r_icu_v, r_ventilated_v = get_dispositions(r_v, rates, regional_hosp_share)
-
-dispositions = (
-            i_hospitalized_v + r_hospitalized_v,
-            i_icu_v + r_icu_v,
-            i_ventilated_v + r_ventilated_v)
-
-hospitalized_v, icu_v, ventilated_v = (
-            i_hospitalized_v,
-            i_icu_v,
-            i_ventilated_v)
-
-
-##############
-### SEIR model
-gamma2=1/infectious_period
-exposed2=beta4*S*total_infections
-S2=S-exposed2-total_infections
-
-s_e, e_e, i_e, r_e = sim_seir(S-11, 1 ,10, recovered, beta3, gamma2, alpha, n_days)
-
-susceptible_e, exposed_e, infected_e, recovered_e = s_e, e_e, i_e, r_e
-
-i_hospitalized_e, i_icu_e, i_ventilated_e = get_dispositions(i_e, rates, regional_hosp_share)
-
-r_hospitalized_e, r_icu_e, r_ventilated_e = get_dispositions(r_e, rates, regional_hosp_share)
-
-dispositions_e = (
-            i_hospitalized_e + r_hospitalized_e,
-            i_icu_e + r_icu_e,
-            i_ventilated_e + r_ventilated_e)
-
-hospitalized_e, icu_e, ventilated_e = (
-            i_hospitalized_e,
-            i_icu_e,
-            i_ventilated_e)
-
-
-#####################################
-## SEIR model with phase adjusted R_0
-
-s_R, e_R, i_R, r_R = sim_seir_decay(S-2, 1 ,1, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta)
-
-susceptible_R, exposed_R, infected_R, recovered_R = s_R, e_R, i_R, r_R
-
-i_hospitalized_R, i_icu_R, i_ventilated_R = get_dispositions(i_R, rates, regional_hosp_share)
-
-r_hospitalized_R, r_icu_R, r_ventilated_R = get_dispositions(r_R, rates, regional_hosp_share)
-
-dispositions_R = (
-            i_hospitalized_R + r_hospitalized_R,
-            i_icu_R + r_icu_R,
-            i_ventilated_R + r_ventilated_R)
-
-hospitalized_R, icu_R, ventilated_R = (
-            i_hospitalized_R,
-            i_icu_R,
-            i_ventilated_R)
-
-
-####################################################################
-#### SEIR model with phase adjusted R_0 and Disease Related Fatality
-##
-##s_D, e_D, i_D, r_D, d_D = sim_seird_decay(S-2, 1, 1 , 0.0, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta, fatal)
-##
-##susceptible_D, exposed_D, infected_D, recovered_D = s_D, e_D, i_D, r_D
-##
-##i_hospitalized_D, i_icu_D, i_ventilated_D = get_dispositions(i_D, rates, regional_hosp_share)
-##
-##r_hospitalized_D, r_icu_D, r_ventilated_D = get_dispositions(r_D, rates, regional_hosp_share)
-##
-##dispositions_D = (
-##            i_hospitalized_D + r_hospitalized_D,
-##            i_icu_D + r_icu_D,
-##            i_ventilated_D + r_ventilated_D)
-##
-##hospitalized_D, icu_D, ventilated_D = (
-##            i_hospitalized_D,
-##            i_icu_D,
-##            i_ventilated_D)
-##
-##
-### Projection days
-##plot_projection_days = n_days - 10
-
-
-
-##################################################################
-## SEIJR model with phase adjusted R_0 and Disease Related Fatality 
-
-s_D, e_D, i_D, r_D, d_D = sim_seird_decay(S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta, fatal)
-
-susceptible_D, exposed_D, infected_D, recovered_D = s_D, e_D, i_D, r_D
-
-i_hospitalized_D, i_icu_D, i_ventilated_D = get_dispositions(i_D, rates, regional_hosp_share)
-
-r_hospitalized_D, r_icu_D, r_ventilated_D = get_dispositions(r_D, rates, regional_hosp_share)
-d_hospitalized_D, d_icu_D, d_ventilated_D = get_dispositions(d_D, rates, regional_hosp_share)
-
-dispositions_D = (
-            i_hospitalized_D + r_hospitalized_D+d_hospitalized_D,
-            i_icu_D + r_icu_D+d_icu_D,
-            i_ventilated_D + r_ventilated_D+ d_icu_D)
-
-hospitalized_D, icu_D, ventilated_D = (
-            i_hospitalized_D,
-            i_icu_D,
-            i_ventilated_D)
-
+### Model graph
+# Every derived rate, model run, table and chart is a node: a rerun only
+# recomputes what lies downstream of a changed input, so toggling as_date
+# rebuilds the charts alone and changing vent_los reruns only the vent census
+# columns. Runs and tables (shared=True) are also kept in the process-wide
+# result cache, where other sessions with the same inputs find them.
+graph = st.session_state.setdefault("graph", Graph(results))
+graph.begin()
+
+# Calibration mode replaces the doubling time and the levels of the phases
+# the chosen location's confirmed cases cover with the fitted values
+calibration = None
+graph.update(
+    observed_cases=location_series, case_dates=counties.dates.values, start_date=start_date, S=S,
+    distancing_schedule=schedule, incubation_period=incubation_period,
+    infectious_period=infectious_period, fatal=fatal, fit_days=fit_days)
+if calibration_mode:
+    graph.node("calibration", calibrate, "observed_cases", "case_dates", "start_date", "S", "distancing_schedule",
+        "incubation_period", "infectious_period", "fatal", "fit_days", shared=True)
+    try:
+        calibration = graph.get("calibration")
+    except ValueError as error:
+        st.sidebar.warning("Could not calibrate: {}".format(error))
+if calibration is not None:
+    doubling_time, schedule = calibration.doubling_time, calibration.schedule
+    if schedule_file is None:
+        decay1, decay2, decay3, decay4 = calibration.reductions
+
+graph.update(
+    S=S, doubling_time=doubling_time, recovery_days=recovery_days, infectious_period=infectious_period,
+    incubation_period=incubation_period, relative_contact_rate=relative_contact_rate, fatal=fatal,
+    schedule=schedule, n_days=n_days, rates=rates, regional_hosp_share=regional_hosp_share, integrator=integrator,
+    intervention_days=intervention_days,
+    hosp_los=lengths_of_stay[0], icu_los=lengths_of_stay[1], vent_los=lengths_of_stay[2],
+    start_date=start_date, chart_start_date=chart_start_date, as_date=as_date, plot_projection_days=n_days - 10, counties=counties,
+    location_rows=location_rows, reporting_fraction=reporting_fraction, catalogue=catalogue)
+
+# Each registered model (covid_model.pipeline) gets a lazy handle: declaring
+# it costs nothing and it is simulated only when something shown needs it.
+models = model_handles(graph)
+
+# With assimilation on, the charts below follow the SEIRD model run on from
+# the particle filter's posterior instead of the step-wise distancing one.
+# The filter is kept per location and only advances by the days it has not
+# seen, one step per particle and day. The metapopulation model instead sums
+# the location's counties from one national run in which every county infects
+# its neighbours through a gravity model of travel.
+primary = "D"
+if assimilation_mode:
+    graph.set("assimilated", assimilated)
+    primary = "F"
+if metapop_mode:
+    primary = "M"
+# The age-structured model spreads the rates above over nine age bands and
+# mixes them through home, school, work and community contact matrices
+if age_mode:
+    graph.update(
+        age_shares=US_AGE_SHARES, age_contacts=normalized(stylized_contacts()),
+        setting_schedules={
+            "school": InterventionSchedule([(int1_delta + 1, school_closure, 0)]),
+            "work": InterventionSchedule([(int2_delta + 1, work_closure, 0)])})
+    primary = "A"
+# Beds are filled within each step of the capacity-constrained model, and
+# patients who find none take the higher fatality
+if overflow_mode:
+    graph.update(capacity_plan=capacity_plan, fatal_hosp=fatal_hosp, overflow_fatal=overflow_fatal)
+    primary = "C"
+s_D, e_D, i_D, r_D, d_D = models[primary].totals()[:5]
 
 # Projection days
 plot_projection_days = n_days - 10
 
-SEIRD_max=max(hospitalized_D)
-
-########## no social distancing
-
-s_D2, e_D2, i_D2, r_D2, d_D2 = sim_seird_decay(S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2,alpha, n_days, 0, 0, 0, 0,
-                                               end_delta, fatal)
-
-susceptible_D2, exposed_D2, infected_D2, recovered_D2 = s_D2, e_D2, i_D2, r_D2
-
-i_hospitalized_D2, i_icu_D2, i_ventilated_D2 = get_dispositions(i_D2, rates, regional_hosp_share)
-
-r_hospitalized_D2, r_icu_D2, r_ventilated_D2 = get_dispositions(r_D2, rates, regional_hosp_share)
-
-d_hospitalized_D2,d_icu_D2,d_ventilated_D2 = get_dispositions(d_D2, rates, regional_hosp_share)
-dispositions_D2 = (
-            i_hospitalized_D2 + r_hospitalized_D2+d_hospitalized_D2,
-            i_icu_D2 + r_icu_D2+d_icu_D2,
-            i_ventilated_D2 + r_ventilated_D2, d_ventilated_D2)
-
-hospitalized_D2, icu_D2, ventilated_D2 = (
-            i_hospitalized_D2,
-            i_icu_D2,
-            i_ventilated_D2)
-
-SEIRDno_max=max(hospitalized_D2)
-
-Difference_admissions_height=SEIRDno_max-SEIRD_max
-
-
-
-
+########## Monte Carlo ensemble of the step-wise distancing model
+def ensemble_bands(
+    S, doubling_time, incubation_period, infectious_period, fatal, rates, regional_hosp_share, schedule, n_days,
+    hosp_los, icu_los, vent_los, integrator, uncertainty, chain=None):
+    n_draws, draw_kind, spread_periods, spread_rates, spread_fatal, spread_decay = uncertainty
+    hosp_rate, icu_rate, vent_rate = rates
+    samples = sample_parameters(dict(
+        doubling_time=around(doubling_time, 0.0),
+        incubation_period=around(incubation_period, spread_periods, draw_kind),
+        infectious_period=around(infectious_period, spread_periods, draw_kind),
+        fatal=around(fatal, spread_fatal, draw_kind, upper=1.0),
+        hosp_rate=around(hosp_rate, spread_rates, draw_kind, upper=1.0),
+        icu_rate=around(icu_rate, spread_rates, draw_kind, upper=1.0),
+        vent_rate=around(vent_rate, spread_rates, draw_kind, upper=1.0),
+    ), n_draws, seed=0)
+    rng = np.random.default_rng(1)
+    reductions = np.stack(
+        [draw(around(phase.reduction, spread_decay, draw_kind, upper=1.0), n_draws, rng) for phase in schedule.phases],
+        axis=-1)
+    reporting = {}
+    if chain is not None:
+        # The reported cases inform the doubling time and the levels of the
+        # phases they cover; later phases and the rates keep the spreads above
+        posterior, posterior_reductions = posterior_draws(chain, n_draws, seed=2)
+        samples["doubling_time"] = posterior["doubling_time"]
+        reductions[:, list(chain.phases)] = posterior_reductions[:, list(chain.phases)]
+        reporting = dict(reporting_fraction=posterior["reporting_fraction"])
+    sampled = dict(
+        samples, **{"reduction_{}".format(k): reductions[:, k] for k in range(reductions.shape[1])}, **reporting)
+    ensemble = run_seird_ensemble(
+        S, 100.0, 50.0, samples, schedule, reductions, n_days, (hosp_los, icu_los, vent_los), integrator,
+        regional_hosp_share)
+    return (
+        percentile_bands(ensemble.admits, ("Hospitalized", "ICU", "Ventilated")),
+        percentile_bands(ensemble.census, ("Hospital Census", "ICU Census", "Ventilated Census")),
+        credible_intervals(sampled))
+
+########## Chain binomial replicates of the step-wise distancing model
+def replicate_bands(
+    S: float, beta4: float, gamma2: float, alpha: float, fatal: float, contact: np.ndarray, rates: Tuple[float, ...],
+    regional_hosp_share: float, n_days: int, hosp_los, icu_los, vent_los, n_replicates: int
+    ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Admissions and census percentile bands and total admissions across stochastic replicates."""
+    ensemble = run_chain_binomial_ensemble(
+        int(S), 100, 50, beta4, gamma2, alpha, fatal, contact, rates, n_days, (hosp_los, icu_los, vent_los),
+        n_replicates, regional_hosp_share)
+    totals = ensemble.admits.sum(axis=1)
+    return (
+        percentile_bands(ensemble.admits, ("Hospitalized", "ICU", "Ventilated")),
+        percentile_bands(ensemble.census, ("Hospital Census", "ICU Census", "Ventilated Census")),
+        credible_intervals(dict(zip(("hosp admissions", "icu admissions", "vent admissions"), totals.T))))
+
+if uncertainty_mode and stochastic_mode:
+    graph.set("n_replicates", n_draws)
+    graph.node("bands", replicate_bands, "S", "beta4", "gamma2", "alpha", "fatal", "contact", "rates",
+        "regional_hosp_share", "n_days", "hosp_los", "icu_los", "vent_los", "n_replicates", shared=True)
+if uncertainty_mode and not stochastic_mode:
+    graph.set("uncertainty", (n_draws, draw_kind, spread_periods, spread_rates, spread_fatal, spread_decay))
+    posterior_deps = ()
+    if posterior_mode:
+        graph.node("posterior", sample_posterior, "observed_cases", "case_dates", "start_date", "S",
+            "distancing_schedule", "incubation_period", "infectious_period", "fatal", "fit_days", shared=True)
+        posterior_deps = ("posterior",)
+    graph.node("bands", ensemble_bands, "S", "doubling_time", "incubation_period", "infectious_period", "fatal",
+        "rates", "regional_hosp_share", "schedule", "n_days", "hosp_los", "icu_los", "vent_los", "integrator", "uncertainty", *posterior_deps,
+        shared=True)
 
 ###################################################################
 #### SEIJR model with phase adjusted R_0 and Disease Related Fatality
 ##
 ##hosp_day_rate=1/hosp_los
 ##
-##s_H2, e_H2, i_H2, j_H2, r_H2, d_H2 = sim_seijcrd_decay2(S-2, 1.0, 1.0, 0.0, 0.0, 0.0, beta5, gamma2,alpha, n_days,decay2,decay3, fatal, fatal_hosp, hosp_day_rate, hosp_rate, l)
+##s_H2, e_H2, i_H2, j_H2, r_H2, d_H2 = sim_seijcrd_decay2(S-2, 1.0, 1.0, 0.0, 0.0, 0.0, beta5, gamma2,alpha, n_days,
+##    InterventionSchedule([(0, 0, 0), (22, decay2, 0), (29, decay3, 0)]).contact_multipliers(n_days), fatal, fatal_hosp, hosp_day_rate, hosp_rate, l)
 ##
 
-#############
-# # SIR Model
-# # New cases
-projection_admits = build_admissions_df(dispositions)
-# # Census Table
-census_table = build_census_df(projection_admits)
-# ############################
-
-############
-# SEIR Model
-# New cases
-projection_admits_e = build_admissions_df(dispositions_e)
-# Census Table
-census_table_e = build_census_df(projection_admits_e)
-
-#############
-# SEIR Model with phase adjustment
-# New cases
-projection_admits_R = build_admissions_df(dispositions_R)
-# Census Table
-census_table_R = build_census_df(projection_admits_R)
-
-#############
-# SEIR Model with phase adjustment and Disease Fatality
-# New cases
-projection_admits_D = build_admissions_df(dispositions_D)
-# Census Table
-census_table_D = build_census_df(projection_admits_D)
-
-#############
-# SEIR Model with phase adjustment and Disease Fatality NO SOCIAL DISTANCING
-# New cases
-projection_admits_D2 = build_admissions_df(dispositions_D2)
-# Census Table
-census_table_D2 = build_census_df(projection_admits_D2)
+projection_admits_D, census_table_D = models[primary].admissions(), models[primary].census()
 
 
 ## Confirmed cases graphs
 
-url = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_US.csv'
-df = pd.read_csv(url)
-url2='https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_global.csv'
-df2=pd.read_csv(url2)
-is_US=df2['Country/Region']=='US'
-df_US=df2[is_US]
-
-is_NY =  df['Province_State']=='New York'
-df_NY = df[is_NY]
-is_Erie = df_NY['Admin2']=='Erie'
-df_Erie = df_NY[is_Erie]
-list(df_NY.columns)
-df_NY = df_NY.drop(['UID','iso2','iso3','code3',
- 'FIPS','Admin2','Country_Region', 'Province_State','Lat','Long_','Combined_Key','1/22/20','1/23/20','1/24/20','1/25/20','1/26/20','1/27/20',
- '1/28/20','1/29/20','1/30/20','1/31/20','2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20',
- '2/8/20','2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20','2/15/20','2/16/20','2/17/20','2/18/20',
- '2/19/20','2/20/20','2/21/20','2/22/20','2/23/20','2/24/20','2/25/20','2/26/20', '2/27/20','2/28/20','2/29/20'], axis=1)
-df_NY_all=df_NY.agg([sum])
-
-df_Erie = df_Erie.drop(['UID','iso2','iso3','code3',
- 'FIPS','Admin2', 'Lat','Long_','Combined_Key','Province_State','1/22/20','1/23/20','1/24/20','1/25/20','1/26/20','1/27/20',
- '1/28/20','1/29/20','1/30/20','1/31/20','2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20',
- '2/8/20','2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20','2/15/20','2/16/20','2/17/20','2/18/20',
- '2/19/20','2/20/20','2/21/20','2/22/20','2/23/20','2/24/20','2/25/20','2/26/20', '2/27/20','2/28/20','2/29/20'], axis=1)
-
-list(df_US.columns)
-df_US = df_US.drop(['Province/State','Lat','Country/Region',
- 'Long','1/22/20','1/23/20', '1/24/20','1/25/20','1/26/20','1/27/20','1/28/20', '1/29/20','1/30/20','1/31/20',
- '2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20','2/8/20', '2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20',
- '2/15/20','2/16/20', '2/17/20', '2/18/20', '2/19/20', '2/20/20', '2/21/20', '2/22/20', '2/23/20', '2/24/20', 
-'2/25/20', '2/26/20', '2/27/20','2/28/20','2/29/20'],axis=1)
-
-
-df_US['Region']='US'
-df_Erie['Region']='Erie'
-df_NY_all['Region']="NY"
-
-df_US2=pd.melt(df_US, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20', '4/14/20',
-                                                     '4/15/20','4/16/20','4/17/20','4/18/20','4/19/20','4/20/20','4/21/20',
-                                                     '4/22/20','4/23/20','4/24/20','4/25/20','4/26/20','4/27/20','4/28/20', '4/29/20'],
-                        var_name='Date',value_name='US')
-
-df_NY2=pd.melt(df_NY_all, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20', '4/14/20',
-                                                     '4/15/20','4/16/20','4/17/20','4/18/20','4/19/20','4/20/20','4/21/20',
-                                                     '4/22/20','4/23/20','4/24/20','4/25/20','4/26/20','4/27/20','4/28/20', '4/29/20'],
-                        var_name='Day2',value_name='NY')
-
-df_Erie2=pd.melt(df_Erie, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20', '4/14/20',
-                                                     '4/15/20','4/16/20','4/17/20','4/18/20','4/19/20','4/20/20','4/21/20',
-                                                     '4/22/20','4/23/20','4/24/20','4/25/20','4/26/20','4/27/20','4/28/20', '4/29/20'],
-                        var_name='Day3',value_name='Erie')
-
-df_US2=df_US2.drop(['Region'], axis=1)
-df_NY2=df_NY2.drop(['Region'], axis=1)
-df_Erie2=df_Erie2.drop(['Region'], axis=1)
-
-result = pd.concat([df_US2, df_NY2, df_Erie2], axis=1, sort=False)
-result=result.drop(['Day2', 'Day3'],axis=1)
-result['day'] = np.arange(len(result))
-result['US']=(result['US']/328000000)*100
-result['NY']=(result['NY']/19450000)*100
-result['Erie']=(result['Erie']/1500000)*100
+result = cases_snapshot.result
 #st.dataframe(result)
 
 st.subheader("""Confirmed Cases for the US, New York, and Erie County""")
@@ -967,7 +561,7 @@ def confirmed_chart(
     
     tooltip_dict = {False: "day", True: "Date:T"}
     if as_date:
-        #projection = add_date_column(projection)
+        #projection = add_date_column(projection, start_date)
         x_kwargs = {"shorthand": "Date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -994,11 +588,57 @@ def confirmed_chart(
     )
 
  # Bar chart of Erie cases with layer of HERDS DAta Erie
-st.altair_chart(confirmed_chart(result, as_date=as_date), use_container_width=True)
+graph.set("confirmed", result)
+graph.node("confirmed_chart", confirmed_chart, "confirmed", "as_date")
+st.altair_chart(graph.get("confirmed_chart"), use_container_width=True)
 
 st.markdown(
     """This chart shows the percent daily [confirmed](https://coronavirus.jhu.edu/map.html) cases per region population. These numbers are highly influenced by testing rates and testing practices in each geographic location. """
 )
+if cases_snapshot.checked_at is not None:
+    st.markdown("Case data through {:%B %d, %Y}, last checked against JHU {:%Y-%m-%d %H:%M} UTC.".format(
+        cases_snapshot.counties.dates[-1], cases_snapshot.checked_at))
+
+def calibration_chart(
+    fit: pd.DataFrame,
+    as_date: bool = False,
+    start_date = None) -> alt.Chart:
+    """Observed and fitted cumulative confirmed cases, on a log scale."""
+    fit = fit.rename(columns={"observed": "Confirmed", "fitted": "Fitted"})
+    if as_date:
+        fit = add_date_column(fit, start_date)
+        x_kwargs = {"shorthand": "date:T", "title": "Date"}
+    else:
+        x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
+
+    return (
+        alt
+        .Chart(fit)
+        .transform_fold(fold=["Confirmed", "Fitted"])
+        .mark_line(strokeWidth=2)
+        .encode(
+            x=alt.X(**x_kwargs),
+            y=alt.Y("value:Q", title="Cumulative Confirmed Cases", scale=alt.Scale(type="log")),
+            color="key:N",
+            tooltip=[alt.Tooltip("value:Q", format=".0f"), "key:N"],
+        )
+        .interactive()
+    )
+
+if calibration is not None:
+    st.subheader("Calibration to confirmed cases")
+    graph.node("calibration_chart", lambda calibration, as_date, start_date: calibration_chart(
+        calibration.fit, as_date, start_date), "calibration", "as_date", "start_date")
+    st.altair_chart(graph.get("calibration_chart"), use_container_width=True)
+    st.markdown(
+        """The projections below use a fitted doubling time of **{doubling_time:.1f}** days and social distancing of
+**{levels}** in the phases starting on days **{days}**. About **{reporting:.0%}** of infections are reported as
+confirmed cases; the root mean square error of log cumulative cases is **{rmse:.3f}**.""".format(
+            doubling_time=calibration.doubling_time,
+            levels=", ".join("{:.0%}".format(calibration.reductions[k]) for k in calibration.phases) or "none",
+            days=", ".join(str(calibration.schedule.phases[k].day) for k in calibration.phases) or "none",
+            reporting=calibration.reporting_fraction,
+            rmse=calibration.loss ** 0.5))
 #cols = [2,4]
 #result.drop(result.columns[cols],axis=1,inplace=True)
 
@@ -1014,14 +654,15 @@ st.header("""Model Projections""")
 def regional_admissions_chart(
     projection_admits: pd.DataFrame, 
     plot_projection_days: int,
-    as_date:bool = False) -> alt.Chart:
+    as_date:bool = False,
+    start_date: datetime = None) -> alt.Chart:
     """docstring"""
     
     projection_admits = projection_admits.rename(columns={"hosp": "Hospitalized", "icu": "ICU", "vent": "Ventilated"})
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        projection_admits = add_date_column(projection_admits)
+        projection_admits = add_date_column(projection_admits, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1074,7 +715,7 @@ def regional_admissions_chart(
     
     # tooltip_dict = {False: "day", True: "date:T"}
     # if as_date:
-        # projection_admits = add_date_column(projection_admits)
+        # projection_admits = add_date_column(projection_admits, start_date)
         # x_kwargs = {"shorthand": "date:T", "title": "Date"}
     # else:
         # x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1106,16 +747,15 @@ def regional_admissions_chart(
 ###################### Vertical Lines Graph ###################
 # Schools 18th
 # Non-essential business 22nd
-vertical = pd.DataFrame({'day': [int1_delta, int2_delta, end_delta]})
-
 def vertical_chart(
     projection_admits: pd.DataFrame, 
-    as_date:bool = False) -> alt.Chart:
+    as_date:bool = False,
+    start_date: datetime = None) -> alt.Chart:
     """docstring"""
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        projection_admits = add_date_column(projection_admits)
+        projection_admits = add_date_column(projection_admits, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1131,7 +771,33 @@ def vertical_chart(
         )
     )
 
-vertical1 = vertical_chart(vertical, as_date=as_date)
+graph.node("vertical_chart", lambda intervention_days, as_date, start_date: vertical_chart(
+    pd.DataFrame({'day': np.array(intervention_days, dtype=int)}), as_date, start_date),
+    "intervention_days", "as_date", "chart_start_date")
+vertical1 = graph.get("vertical_chart")
+
+
+def fan_chart(
+    bands: pd.DataFrame,
+    plot_projection_days: int,
+    as_date:bool = False,
+    start_date: datetime = None) -> alt.Chart:
+    """Shaded p5-p95 and p25-p75 bands and the p50 line from percentile_bands."""
+    bands = bands[bands["day"] < plot_projection_days]
+    if as_date:
+        bands = add_date_column(bands, start_date)
+        x_kwargs = {"shorthand": "date:T", "title": "Date"}
+    else:
+        x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
+
+    base = alt.Chart(bands).encode(x=alt.X(**x_kwargs), color="key:N")
+    return (
+        base.mark_area(opacity=0.15).encode(y="p5:Q", y2="p95:Q")
+        + base.mark_area(opacity=0.3).encode(y="p25:Q", y2="p75:Q")
+        + base.mark_line(strokeDash=[4, 2]).encode(
+            y="p50:Q",
+            tooltip=["day", "key:N"] + [alt.Tooltip("p{}:Q".format(p), format=".0f") for p in (5, 25, 50, 75, 95)])
+    )
 
 
 
@@ -1139,9 +805,15 @@ vertical1 = vertical_chart(vertical, as_date=as_date)
 #4/3/20 First Projection Graph - Admissions
 #############
 st.subheader("Projected number of **daily** COVID-19 admissions")
-admits_graph = regional_admissions_chart(projection_admits_D, 
-        plot_projection_days, 
-        as_date=as_date)
+for model in models:
+    graph.node("admits_chart_" + model, regional_admissions_chart,
+        "admits_" + model, "plot_projection_days", "as_date", "chart_start_date")
+admits_graph = graph.get("admits_chart_" + primary)
+if uncertainty_mode:
+    graph.node("admits_fan_chart", lambda bands, plot_projection_days, as_date, start_date: fan_chart(
+        bands[0], plot_projection_days, as_date, start_date), "bands", "plot_projection_days", "as_date",
+        "chart_start_date")
+    admits_graph = alt.layer(graph.get("admits_fan_chart"), admits_graph)
 
 st.altair_chart(admits_graph, use_container_width=True)
 
@@ -1150,6 +822,23 @@ st.altair_chart(admits_graph, use_container_width=True)
 st.markdown(
     """This model shows the number of daily admissions projected for the chosen time period. """
 )
+if uncertainty_mode and stochastic_mode:
+    st.markdown(
+        """The shaded bands show the 5th-95th and 25th-75th percentiles, and the dashed line the median, of **{n_draws:,}** replicates of the stochastic (chain binomial) model with the values in the sidebar. Every replicate counts whole people, so in a small population the bands show how much admissions can vary by chance alone, including outbreaks that die out.""".format(
+            n_draws=n_draws
+        ))
+    st.markdown("Total admissions over the projection (2.5th, 50th and 97.5th percentiles):")
+    st.table(graph.get("bands")[2])
+if uncertainty_mode and not stochastic_mode:
+    st.markdown(
+        """The shaded bands show the 5th-95th and 25th-75th percentiles, and the dashed line the median, of **{n_draws:,}** projections with parameters drawn around the values in the sidebar.""".format(
+            n_draws=n_draws
+        ))
+    if posterior_mode:
+        st.markdown(
+            """The doubling time and the social distancing of the phases the confirmed cases cover are drawn from their posterior given those cases (ensemble MCMC). The cases carry no information on the fatality and hospitalization rates, which keep the spreads in the sidebar.""")
+    st.markdown("Parameters of the projections (2.5th, 50th and 97.5th percentiles):")
+    st.table(graph.get("bands")[2])
 
 #st.dataframe(projection_admits)
 if st.checkbox("Show more info about the model specification and assumptions"):
@@ -1180,36 +869,36 @@ However, parameters can be different depending on population characteristics and
 Therefore, interpreting the results can be difficult. """)
 
 
-sir = regional_admissions_chart(projection_admits, plot_projection_days, as_date=as_date)
-seir = regional_admissions_chart(projection_admits_e, plot_projection_days, as_date=as_date)
-seir_r = regional_admissions_chart(projection_admits_R, plot_projection_days, as_date=as_date)
-seir_d = regional_admissions_chart(projection_admits_D, plot_projection_days, as_date=as_date)
-seir_d2 = regional_admissions_chart(projection_admits_D2, plot_projection_days, as_date=as_date)
+# The no distancing comparison runs from the first contact, so it is shown
+# only when the charts start there too
+if not assimilation_mode:
+    seir_d = graph.get("admits_chart_" + primary)
+    seir_d2 = graph.get("admits_chart_D2")
 
-Max_hosp_admissions=max(projection_admits_D['hosp'].dropna())
-Max_hosp_admissions_nosoc=max(projection_admits_D2['hosp'].dropna())
-Max_diff=Max_hosp_admissions_nosoc-Max_hosp_admissions
+    Max_hosp_admissions=max(projection_admits_D['hosp'].dropna())
+    Max_hosp_admissions_nosoc=max(models["D2"].admissions()['hosp'].dropna())
+    Max_diff=Max_hosp_admissions_nosoc-Max_hosp_admissions
 
 
-st.subheader("Projected number of **daily** COVID-19 admissions: Model Comparison (Left: 0% Social Distancing, Right: Step-Wise Social Distancing)")
-st.altair_chart(
-    alt.layer(seir_d2.mark_line())
-    + alt.layer(seir_d.mark_point())
-    + alt.layer(vertical1.mark_rule())
-    , use_container_width=True)
+    st.subheader("Projected number of **daily** COVID-19 admissions: Model Comparison (Left: 0% Social Distancing, Right: Step-Wise Social Distancing)")
+    st.altair_chart(
+        alt.layer(seir_d2.mark_line())
+        + alt.layer(seir_d.mark_point())
+        + alt.layer(vertical1.mark_rule())
+        , use_container_width=True)
 
-st.markdown(
-    """In the above graph, the curves to the left (indicated by the solid lines) represent projections if government implemented
+    st.markdown(
+        """In the above graph, the curves to the left (indicated by the solid lines) represent projections if government implemented
 social distancing (e.g. New York State on PAUSE) had not gone into effect. The second set of curves (denoted by points) represent projections with social distancing.
 The percent of social distancing can be chosen by the user."""
-    )
+        )
 
-st.markdown(
-    """Compared to a projection with no social distancing (letting the virus run it's natural course with no government shut-down),
+    st.markdown(
+        """Compared to a projection with no social distancing (letting the virus run it's natural course with no government shut-down),
     there are **{Max_diff:.0f}** fewer admissions (daily hospitalizations) at the peak of the epidemic curve. Therefore,
     we are flattening the curve.""".format(
-        Max_diff=Max_diff
-    ))
+            Max_diff=Max_diff
+        ))
 
 
 
@@ -1258,7 +947,8 @@ st.header("""Projected Census Models""")
 def admitted_patients_chart(
     census: pd.DataFrame,
     plot_projection_days: int,
-    as_date=False) -> alt.Chart:
+    as_date=False,
+    start_date: datetime = None) -> alt.Chart:
     """docstring"""
     
     census = census.rename(columns={"hosp": "Hospital Census", 
@@ -1267,7 +957,7 @@ def admitted_patients_chart(
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        census = add_date_column(census)
+        census = add_date_column(census, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1287,10 +977,61 @@ def admitted_patients_chart(
     )
 
 #SEIR w/ adjusted R_0 and deaths
-st.altair_chart(admitted_patients_chart(census_table_D, 
-    plot_projection_days, 
-    as_date=as_date),
-    use_container_width=True)
+graph.node("census_chart", admitted_patients_chart, "census_" + primary, "plot_projection_days", "as_date",
+    "chart_start_date")
+census_graph = graph.get("census_chart")
+if uncertainty_mode:
+    graph.node("census_fan_chart", lambda bands, plot_projection_days, as_date, start_date: fan_chart(
+        bands[1], plot_projection_days, as_date, start_date), "bands", "plot_projection_days", "as_date",
+        "chart_start_date")
+    census_graph = alt.layer(graph.get("census_fan_chart"), census_graph)
+# Capacity (dashed) and the first day each category overruns it, found for
+# the charted model and the no distancing comparison at once
+capacity_labels = ("Staffed beds", "ICU beds", "Ventilators")
+def capacity_chart(
+    capacity_plan: np.ndarray, first_days: np.ndarray, plot_projection_days: int,
+    as_date: bool = False, start_date=None) -> alt.Chart:
+    """Capacity lines and rules at each category's first day over capacity."""
+    capacity_df = capacity_frame(capacity_plan[:plot_projection_days], plot_projection_days, capacity_labels)
+    breach_df = pd.DataFrame({
+        "day": first_days[first_days >= 0], "key": np.asarray(capacity_labels)[first_days >= 0]})
+    if as_date:
+        capacity_df = add_date_column(capacity_df, start_date)
+        breach_df = add_date_column(breach_df, start_date)
+        x_kwargs = {"shorthand": "date:T", "title": "Date"}
+    else:
+        x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
+
+    lines = (
+        alt
+        .Chart(capacity_df)
+        .transform_fold(fold=list(capacity_labels))
+        .mark_line(point=False, strokeDash=[6, 4])
+        .encode(x=alt.X(**x_kwargs), y=alt.Y("value:Q", title="Census"), color="key:N", tooltip=["key:N", "value:Q"])
+    )
+    rules = (
+        alt
+        .Chart(breach_df)
+        .mark_rule(color="red")
+        .encode(x=alt.X(**x_kwargs), tooltip=[alt.Tooltip("key:N", title="Over capacity from")])
+    )
+    return alt.layer(lines, rules)
+
+# The no distancing comparison runs from the first contact, not the last
+# assimilated day, so it is left out of the filter's tables
+capacity_scenarios = (primary,) if assimilation_mode else (primary, "D2")
+if capacity_plan is not None:
+    graph.set("capacity_plan", capacity_plan)
+    graph.node("breaches",
+        lambda capacity_plan, plot_projection_days, *census: find_breaches(
+            np.stack(census)[:, :plot_projection_days], capacity_plan[:plot_projection_days]),
+        "capacity_plan", "plot_projection_days", *("census_array_" + key for key in capacity_scenarios))
+    graph.node("capacity_chart",
+        lambda capacity_plan, breaches, plot_projection_days, as_date, start_date: capacity_chart(
+            capacity_plan, breaches.first_day[0], plot_projection_days, as_date, start_date),
+        "capacity_plan", "breaches", "plot_projection_days", "as_date", "chart_start_date")
+    census_graph = alt.layer(census_graph, graph.get("capacity_chart"))
+st.altair_chart(census_graph, use_container_width=True)
 
 
 # Version with single line
@@ -1311,6 +1052,62 @@ st.altair_chart(admitted_patients_chart(census_table_D,
 st.markdown(
     """This model shows the daily census for projected occupied hospital beds. """
 )
+if capacity_plan is not None:
+    st.markdown(
+        """Dashed lines show capacity and red rules the first day census exceeds it. For each model and category: the first day over capacity, how many days that overrun lasts, the total days over, and the largest shortfall and its day (-1 and 0 if capacity holds).""")
+    st.table(breach_table(
+        graph.get("breaches"), [models[key].label for key in capacity_scenarios], chart_start_date,
+        capacity_labels))
+
+# Each hospital's share of the location's patients, with its own lengths of
+# stay; all of them are tabulated in one batch from the charted model's run
+def hospitals_census_chart(
+    census: np.ndarray, hospitals: Tuple[str, ...], category: str, plot_projection_days: int,
+    as_date: bool = False, start_date=None) -> alt.Chart:
+    """One line per hospital of its census in category, from (n_hospitals, n_days, 3) census."""
+    days = min(plot_projection_days, census.shape[1])
+    frame = pd.DataFrame({
+        "day": np.tile(np.arange(days), len(hospitals)),
+        "hospital": np.repeat(hospitals, days),
+        "census": census[:, :days, groups.index(category)].ravel()})
+    if as_date:
+        frame = add_date_column(frame, start_date)
+        x_kwargs = {"shorthand": "date:T", "title": "Date"}
+    else:
+        x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
+
+    return (
+        alt
+        .Chart(frame)
+        .mark_line(point=False)
+        .encode(
+            x=alt.X(**x_kwargs),
+            y=alt.Y("census:Q", title="Census"),
+            color="hospital:N",
+            tooltip=["hospital:N", alt.Tooltip("census:Q", format=".0f")]
+        )
+        .interactive()
+    )
+
+if health_system is not None:
+    st.subheader("Projected census by hospital")
+    graph.set("system", health_system)
+    add_system_nodes(graph, primary)
+    system_tables = graph.get("system_tables_" + primary)
+    system_category = st.selectbox("Census of", groups)
+    st.altair_chart(
+        hospitals_census_chart(
+            system_tables.census, health_system.hospitals, system_category, plot_projection_days, as_date,
+            chart_start_date),
+        use_container_width=True)
+    st.table(peak_census(system_tables, health_system.hospitals, plot_projection_days))
+    if not np.isnan(health_system.capacity).all():
+        st.markdown("Hospitals over their own capacity (columns hosp_capacity, icu_capacity and vent_capacity):")
+        st.table(breach_table(
+            find_breaches(system_tables.census[:, :plot_projection_days], health_system.capacity[:, None, :]),
+            health_system.hospitals, chart_start_date, capacity_labels))
+    st.markdown(
+        """Each hospital's patients are its market share of each region (county) of the location, which get the location's projection in proportion to their population. Regions outside the location add none.""")
 
 ################# Add 0% 10% 20% SD graph of SEIR MODEL ###################
 
@@ -1334,46 +1131,69 @@ st.markdown(
 ###########            PPE            ####################
 ##########################################################
 ##########################################################
-#st.header("Projected PPE Needs")
-def ppe_chart(
-    census: pd.DataFrame,
-    as_date:bool = False) -> alt.Chart:
-    """docstring"""
-    census = census.rename(columns={'ppe_mean_mild': 'Mean PPE needs - mild cases', 'ppe_mean_severe': 'Mean PPE needs - severe cases'})
+st.header("Projected Resource Needs")
+def resources_chart(
+    projection: np.ndarray, labels: Tuple[str, ...], items: Tuple[str, ...], plot_projection_days: int,
+    as_date: bool = False, start_date=None) -> alt.Chart:
+    """Daily use of the chosen items from one model's (n_days, n_items) projection."""
+    columns = [labels.index(item) for item in items]
+    needs = pd.DataFrame(projection[:plot_projection_days, columns], columns=list(items))
+    needs.insert(0, "day", np.arange(len(needs)))
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        census = add_date_column(census)
+        needs = add_date_column(needs, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
 
     return (
         alt
-        .Chart(census)
-        .transform_fold(fold=['Mean PPE needs - mild cases', 'Mean PPE needs - severe cases'])
+        .Chart(needs)
+        .transform_fold(fold=list(items))
         .mark_line(point=False)
         .encode(
             x=alt.X(**x_kwargs),
-            y=alt.Y("value:Q", title="Projected PPE needs per day"),
+            y=alt.Y("value:Q", title="Projected needs per day"),
             color="key:N",
             tooltip=[
                 tooltip_dict[as_date],
-                alt.Tooltip("value:Q", format=".0f", title="PPE Needs"),
+                alt.Tooltip("value:Q", format=".0f", title="Needs"),
                 "key:N",
             ],
         )
         .interactive()
     )
 
-# , scale=alt.Scale(domain=[0, 450000])
-    
-### SEIR Model with adjusted R_0 with Case Fatality - PPE predictions
-##st.subheader("Projected personal protective equipment needs for mild and severe cases of COVID-19: SEIR Model with Adjutes R_0 and Case Fatality")
-##
-##ppe_graph = ppe_chart(census_table_D, as_date=as_date)
-##
-##st.altair_chart(alt.layer(ppe_graph.mark_line()) + alt.layer(vertical1), use_container_width=True)
-##
+# Every item of the catalogue for the charted model and the no distancing
+# comparison, projected in one product of their census with the burn rates;
+# only the chosen items are charted and the CSV is written when downloaded
+resource_scenarios = (primary,) if assimilation_mode else (primary, "D2")
+add_resource_nodes(graph, resource_scenarios)
+resource_labels = tuple(item_labels(catalogue))
+resource_items = st.multiselect(
+    "Items to chart", resource_labels,
+    default=[label for label in resource_labels if label.startswith("Mean PPE")] or list(resource_labels[:2]))
+graph.set("resource_items", tuple(resource_items))
+graph.node("resources_chart",
+    lambda resources, catalogue, items, plot_projection_days, as_date, start_date: resources_chart(
+        resources[0], tuple(item_labels(catalogue)), items, plot_projection_days, as_date, start_date),
+    "resources", "catalogue", "resource_items", "plot_projection_days", "as_date", "chart_start_date")
+if resource_items:
+    st.altair_chart(
+        alt.layer(graph.get("resources_chart")) + alt.layer(vertical1), use_container_width=True)
+# The export is only written once asked for, and again only when the projection changes
+graph.set("resource_scenario_labels", tuple(models[key].label for key in resource_scenarios))
+graph.node("resources_csv",
+    lambda resources, catalogue, labels, start_date: "".join(
+        iter_resources_csv(resources, catalogue, labels, start_date)),
+    "resources", "catalogue", "resource_scenario_labels", "chart_start_date")
+if st.checkbox("Prepare every item for both models as CSV", value=False):
+    st.download_button(
+        "Download every item for both models (CSV)", graph.get("resources_csv"),
+        file_name="resource_needs.csv", mime="text/csv")
+st.markdown(
+    """Resource needs are the census by day times each item's use per occupied hospital, ICU and ventilated bed. Upload a catalogue in the sidebar to project a hospital's own items.""")
+
 # Recovered/Infected/Fatality table
 st.header("Projected infected and fatal individuals in the region across time")
 
@@ -1394,7 +1214,8 @@ def additional_projections_chart(i: np.ndarray, r: np.ndarray, d: np.ndarray) ->
         .interactive()
     )
 
-recov_infec = additional_projections_chart(i_D, r_D, d_D)
+graph.node("infected_chart", lambda run: additional_projections_chart(run[2], run[3], run[4]), "totals_" + primary)
+recov_infec = graph.get("infected_chart")
 
 
 def death_chart(i: np.ndarray, r: np.ndarray, d: np.ndarray) -> alt.Chart:
@@ -1414,7 +1235,8 @@ def death_chart(i: np.ndarray, r: np.ndarray, d: np.ndarray) -> alt.Chart:
         .interactive()
     )
 
-deaths = death_chart(i_D, r_D, d_D)
+graph.node("deaths_chart", lambda run: death_chart(run[2], run[3], run[4]), "totals_" + primary)
+deaths = graph.get("deaths_chart")
 
 st.altair_chart(deaths + recov_infec, use_container_width=True)
 
@@ -1426,6 +1248,12 @@ st.markdown(
     """There is a projected number of **{total_fatalities:.0f}** fatalities due to COVID-19.""".format(
         total_fatalities=total_fatalities 
     ))
+if overflow_mode:
+    ward_beds, icu_beds = models[primary].run()[5:7]
+    overflow_deaths = models[primary].run()[9]
+    st.markdown(
+        """Of these, **{overflow_deaths:.0f}** are excess deaths of patients who found every hospital or ICU bed taken (at most {ward:.0f} hospital and {icu:.0f} ICU beds occupied).""".format(
+            overflow_deaths=overflow_deaths[-1], ward=ward_beds.max(), icu=icu_beds.max()))
 
 
 
@@ -1433,6 +1261,7 @@ st.markdown(
 ##        infection_total_t=infection_total_t
 ##    )
 ##            )
+beta4, gamma2 = graph.get("beta4"), graph.get("gamma2")
 AAA=beta4*(1/gamma2)*S
 R2=AAA*(1-decay2)
 R3=AAA*(1-decay3)
@@ -19,6 +19,12 @@ from collections import namedtuple
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+from covid_model import InterventionSchedule, add_date_column
+from covid_model.jhu import case_data
+from covid_model.cache import results
+from covid_model.graph import Graph
+from covid_model.pipeline import model_handles
+
 hide_menu_style = """
         <style>
         #MainMenu {visibility: hidden;}
@@ -27,447 +33,6 @@ hide_menu_style = """
 st.markdown(hide_menu_style, unsafe_allow_html=True)
 
 
-###########################
-# Models and base functions
-###########################
-def sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n: float
-    ) -> Tuple[float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    i_n = (beta * s * i - gamma * i) + i
-    r_n = gamma * i + r
-    if s_n < 0.0:
-        s_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-
-    scale = n / (s_n + i_n + r_n)
-    return s_n * scale, i_n * scale, r_n * scale
-    
-def gen_sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
-    ) -> Generator[Tuple[float, float, float], None, None]:
-    """Simulate SIR model forward in time yielding tuples."""
-    s, i, r = (float(v) for v in (s, i, r))
-    n = s + i + r
-    for _ in range(n_days + 1):
-        yield s, i, r
-        s, i, r = sir(s, i, r, beta, gamma, n)
-
-def sim_sir(
-    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, i, r = (float(v) for v in (s, i, r))
-    n = s + i + r
-    s_v, i_v, r_v = [s], [i], [r]
-    for day in range(n_days):
-        s, i, r = sir(s, i, r, beta, gamma, n)
-        s_v.append(s)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-    
-def sim_sir_df(
-    p) -> pd.DataFrame:
-    """Simulate the SIR model forward in time.
-
-    p is a Parameters instance. for circuluar dependency reasons i can't annotate it.
-    """
-    return pd.DataFrame(
-        data=gen_sir(S, total_infections, recovered, beta, gamma, n_days),
-        columns=("Susceptible", "Infected", "Recovered"),
-    )
-
-def get_dispositions(
-    patient_state: np.ndarray, rates: Tuple[float, ...], regional_hosp_share: float = 1.0
-    ) -> Tuple[np.ndarray, ...]:
-    """Get dispositions of infected adjusted by rate and market_share."""
-    return (*(patient_state * rate * regional_hosp_share for rate in rates),)
-
-def build_admissions_df(
-    dispositions) -> pd.DataFrame:
-    """Build admissions dataframe from Parameters."""
-    days = np.array(range(0, n_days + 1))
-    data_dict = dict(
-        zip(
-            ["day", "hosp", "icu", "vent"], 
-            [days] + [disposition for disposition in dispositions],
-        )
-    )
-    projection = pd.DataFrame.from_dict(data_dict)
-    
-    # New cases
-    projection_admits = projection.iloc[:-1, :] - projection.shift(1)
-    projection_admits["day"] = range(projection_admits.shape[0])
-    return projection_admits
-
-def build_census_df(
-    projection_admits: pd.DataFrame) -> pd.DataFrame:
-    """ALOS for each category of COVID-19 case (total guesses)"""
-    #n_days = np.shape(projection_admits)[0]
-    los_dict = {
-    "hosp": hosp_los, "icu": icu_los, "vent": vent_los,
-    }
-
-    census_dict = dict()
-    for k, los in los_dict.items():
-        census = (
-            projection_admits.cumsum().iloc[:-los, :]
-            - projection_admits.cumsum().shift(los).fillna(0)
-        ).apply(np.ceil)
-        census_dict[k] = census[k]
-
-    census_df = pd.DataFrame(census_dict)
-    census_df["day"] = census_df.index
-    census_df = census_df[["day", "hosp", "icu", "vent", 
-    ]]
-    
-    # PPE for hosp/icu
-    census_df['ppe_mild_d'] = census_df['hosp'] * ppe_mild_val_lower
-    census_df['ppe_mild_u'] = census_df['hosp'] * ppe_mild_val_upper
-    census_df['ppe_severe_d'] = census_df['icu'] * ppe_severe_val_lower
-    census_df['ppe_severe_u'] = census_df['icu'] * ppe_severe_val_upper
-    census_df['ppe_mean_mild'] = census_df[["ppe_mild_d","ppe_mild_u"]].mean(axis=1)
-    census_df['ppe_mean_severe'] = census_df[["ppe_severe_d","ppe_severe_u"]].mean(axis=1)
-    
-    census_df = census_df.head(n_days-10)
-    
-    return census_df
-
-def seir(
-    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n: float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    e_n = (beta * s * i) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    r_n = gamma * i + r
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + r_n)
-    return s_n * scale, e_n * scale, i_n * scale, r_n * scale
-
-def sim_seir(
-    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
-    for day in range(n_days):
-        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-
-def gen_seir(
-    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
-    ) -> Generator[Tuple[float, float, float, float], None, None]:
-    """Simulate SIR model forward in time yielding tuples."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    for _ in range(n_days + 1):
-        yield s, e, i, r
-        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
-# phase-adjusted https://www.nature.com/articles/s41421-020-0148-0     
-   
-def sim_seir_decay(
-    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r = (float(v) for v in (s, e, i, r))
-    n = s + e + i + r
-    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
-    for day in range(n_days):
-        if start_day<=day<=int1_delta:
-            beta_decay=beta*(1-decay1)
-        elif int1_delta<=day<=int2_delta:
-            beta_decay=beta*(1-decay2)
-        elif int2_delta<=day<=end_delta:
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i, r = seir(s, e, i, r, beta_decay, gamma, alpha, n)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-    )
-# https://www.ncbi.nlm.nih.gov/pmc/articles/PMC4552173/
-
-def seird(
-    s: float, e: float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * i) + s
-    e_n = (beta * s * i) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    r_n = (1-fatal)*gamma * i + r
-    d_n = (fatal)*gamma * i +d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, r_n * scale, d_n * scale
-
-def sim_seird_decay(
-    s: float, e:float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int, fatal: float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, r, d= (float(v) for v in (s, e, i, r, d))
-    n = s + e + i + r + d
-    s_v, e_v, i_v, r_v, d_v = [s], [e], [i], [r], [d]
-    for day in range(n_days):
-        if start_day<=day<=int1_delta:
-            beta_decay=beta*(1-decay1)
-        elif int1_delta<=day<=int2_delta:
-            beta_decay=beta*(1-decay2)
-        elif int2_delta<=day<=end_delta:
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i, r,d = seird(s, e, i, r, d, beta_decay, gamma, alpha, n, fatal)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
-
-def seijcrd(
-    s: float, e: float, i: float, j:float, c:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal_hosp: float, hosp_rate:float, icu_rate:float, icu_days:float,crit_lag:float, death_days:float
-    ) -> Tuple[float, float, float, float]:
-    """The SIR model, one time step."""
-    s_n = (-beta * s * (i+j+c)) + s
-    e_n = (beta * s * (i+j+c)) - alpha * e + e
-    i_n = (alpha * e - gamma * i) + i
-    j_n = hosp_rate * i * gamma + (1-icu_rate)* c *icu_days + j
-    c_n = icu_rate * j * (1/crit_lag) - c *  (1/death_days)
-    r_n = (1-hosp_rate)*gamma * i + (1-icu_rate) * (1/crit_lag)* j + r
-    d_n = (fatal_hosp)* c * (1/crit_lag)+d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if j_n < 0.0:
-        j_n = 0.0
-    if c_n < 0.0:
-        c_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + j_n+ c_n+ r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, c_n*scale, r_n * scale, d_n * scale
-
-def sim_seijcrd_decay(
-    s: float, e:float, i: float, j:float, c: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay1:float, decay2:float, decay3: float, decay4: float, end_delta: int, fatal_hosp: float, hosp_rate: float, icu_rate: float, icu_days:float, crit_lag: float, death_days:float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, j, c, r, d= (float(v) for v in (s, e, i, c, j, r, d))
-    n = s + e + i + j+r + d
-    s_v, e_v, i_v, j_v, c_v, r_v, d_v = [s], [e], [i], [j], [c], [r], [d]
-    for day in range(n_days):
-        if 0<=day<=21:
-            beta_decay=beta*(1-decay1)
-        elif 22<=day<=28:
-            beta_decay=beta*(1-decay2)
-        elif 29<=day<=end_delta: 
-            beta_decay=beta*(1-decay3)
-        else:
-            beta_decay=beta*(1-decay4)
-        s, e, i,j, c, r,d = seijcrd(s, e, i,j, c, r, d, beta_decay, gamma, alpha, n, fatal_hosp, hosp_rate, icu_rate, icu_days, crit_lag, death_days)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        j_v.append(j)
-        c_v.append(c)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(j_v),
-        np.array(c_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
-
-# Less complicated
-
-def seijcrd2(
-    s: float, e: float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float, fatal_hosp: float, hosp_rate:float,
-    hosp_day_rate:float, l:float
-    ) -> Tuple[float, float, float, float, float,float]:
-    """The SIR model, one time step."""
-    s_n = -beta*s*(i + (l*j)) +s
-    e_n = beta*s*(i + (l*j)) - alpha * e + e
-    i_n = alpha * e - (hosp_rate + gamma) * i + i 
-    j_n = hosp_rate * i - hosp_day_rate*j +j
-    r_n = gamma * (1-fatal)*i + ((1-fatal_hosp) * hosp_day_rate * j) +r
-    d_n = gamma * (fatal)*i + ((fatal_hosp)*hosp_day_rate*j) +d
-    if s_n < 0.0:
-        s_n = 0.0
-    if e_n < 0.0:
-        e_n = 0.0
-    if i_n < 0.0:
-        i_n = 0.0
-    if j_n < 0.0:
-        j_n = 0.0
-    if r_n < 0.0:
-        r_n = 0.0
-    if d_n < 0.0:
-        d_n = 0.0
-
-    scale = n / (s_n + e_n+ i_n + j_n+ r_n + d_n)
-    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, r_n * scale, d_n * scale
-# 
-
-def sim_seijcrd_decay2(
-    s: float, e:float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
-    decay2:float, decay3: float, fatal: float, fatal_hosp: float, hosp_rate: float, hosp_day_rate:float, l:float
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,np.ndarray, np.ndarray]:
-    """Simulate the SIR model forward in time."""
-    s, e, i, j, r, d= (float(v) for v in (s, e, i, j, r, d))
-    n = s + e + i + j+r + d
-    s_v, e_v, i_v, j_v, r_v, d_v = [s], [e], [i], [j], [r], [d]
-    for day in range(n_days):
-        if 0<=day<=21:
-            beta_decay=beta
-        elif 22<=day<=28:
-            beta_decay=beta*(1-decay2)
-        else: 
-            beta_decay=beta*(1-decay3)
-        s, e, i,j, r,d = seijcrd2(s, e, i,j, r, d, beta_decay, gamma, alpha, n, fatal, fatal_hosp, hosp_rate,hosp_day_rate, l)
-        s_v.append(s)
-        e_v.append(e)
-        i_v.append(i)
-        j_v.append(j)
-        r_v.append(r)
-        d_v.append(d)
-
-    return (
-        np.array(s_v),
-        np.array(e_v),
-        np.array(i_v),
-        np.array(j_v),
-        np.array(r_v),
-        np.array(d_v)
-    )
- 
-
-# Add dates #
-def add_date_column(
-    df: pd.DataFrame, drop_day_column: bool = False, date_format: Optional[str] = None,
-    ) -> pd.DataFrame:
-    """Copies input data frame and converts "day" column to "date" column
-
-    Assumes that day=0 is today and allocates dates for each integer day.
-    Day range can must not be continous.
-    Columns will be organized as original frame with difference that date
-    columns come first.
-
-    Arguments:
-        df: The data frame to convert.
-        drop_day_column: If true, the returned data frame will not have a day column.
-        date_format: If given, converts date_time objetcts to string format specified.
-
-    Raises:
-        KeyError: if "day" column not in df
-        ValueError: if "day" column is not of type int
-    """
-    if not "day" in df:
-        raise KeyError("Input data frame for converting dates has no 'day column'.")
-    if not pd.api.types.is_integer_dtype(df.day):
-        raise KeyError("Column 'day' for dates converting data frame is not integer.")
-
-    df = df.copy()
-    # Prepare columns for sorting
-    non_date_columns = [col for col in df.columns if not col == "day"]
-
-    # Allocate (day) continous range for dates
-    n_days = int(df.day.max())
-    start = start_date
-    end = start + timedelta(days=n_days + 1)
-    # And pick dates present in frame
-    dates = pd.date_range(start=start, end=end, freq="D")[df.day.tolist()]
-
-    if date_format is not None:
-        dates = dates.strftime(date_format)
-
-    df["date"] = dates
-
-    if drop_day_column:
-        df.pop("day")
-        date_columns = ["date"]
-    else:
-        date_columns = ["day", "date"]
-
-    # sort columns
-    df = df[date_columns + non_date_columns]
-
-    return df
-
-    
-# PPE Values
-ppe_mild_val_lower = 14
-ppe_mild_val_upper = 15
-ppe_severe_val_lower = 15
-ppe_severe_val_upper = 24
-
 # List of Groups
 groups = ['hosp', 'icu', 'vent']
 
@@ -505,7 +70,6 @@ doubling_time = st.sidebar.number_input(
 
 start_date = st.sidebar.date_input(
     "Suspected first contact", first_case_date)
-start_day = 1
 
 ##relative_contact_rate = st.sidebar.number_input(
 ##    "Social distancing (% reduction in social contact) Unadjusted Model", 0, 100, value=0, step=5, format="%i")/100.0
@@ -535,6 +99,14 @@ end_delta = (end_date - start_date).days
 decay4 = st.sidebar.number_input(
     "Social distancing after end date", 0, 100, value=20 ,step=5, format="%i")/100.0
 
+# Each chosen date is the last day of the previous level
+schedule = InterventionSchedule([
+    (0, decay1, 0),
+    (int1_delta + 1, decay2, 0),
+    (int2_delta + 1, decay3, 0),
+    (end_delta + 1, decay4, 0),
+])
+
 hosp_rate = (
     st.sidebar.number_input("Hospitalization %", 0.0, 100.0, value=2.5, step=0.50, format="%f")/ 100.0)
 
@@ -687,119 +259,22 @@ lengths_of_stay = tuple(each.length_of_stay for each in (hospitalized, icu, vent
 
 
 #############
-### SIR model
-s_v, i_v, r_v = sim_sir(S-2, 1, 1 ,beta, gamma, n_days)
-susceptible_v, infected_v, recovered_v = s_v, i_v, r_v
-
-i_hospitalized_v, i_icu_v, i_ventilated_v = get_dispositions(i_v, rates, regional_hosp_share)
-
-r_hospitalized_v, r_icu_v, r_ventilated_v = get_dispositions(r_v, rates, regional_hosp_share)
-
-dispositions = (
-            i_hospitalized_v + r_hospitalized_v,
-            i_icu_v + r_icu_v,
-            i_ventilated_v + r_ventilated_v)
-
-hospitalized_v, icu_v, ventilated_v = (
-            i_hospitalized_v,
-            i_icu_v,
-            i_ventilated_v)
-
-
-##############
-### SEIR model
-gamma2=1/infectious_period
-exposed2=beta4*S*total_infections
-S2=S-exposed2-total_infections
-
-s_e, e_e, i_e, r_e = sim_seir(S-11, 1 ,10, recovered, beta3, gamma2, alpha, n_days)
-
-susceptible_e, exposed_e, infected_e, recovered_e = s_e, e_e, i_e, r_e
-
-i_hospitalized_e, i_icu_e, i_ventilated_e = get_dispositions(i_e, rates, regional_hosp_share)
-
-r_hospitalized_e, r_icu_e, r_ventilated_e = get_dispositions(r_e, rates, regional_hosp_share)
-
-dispositions_e = (
-            i_hospitalized_e + r_hospitalized_e,
-            i_icu_e + r_icu_e,
-            i_ventilated_e + r_ventilated_e)
-
-hospitalized_e, icu_e, ventilated_e = (
-            i_hospitalized_e,
-            i_icu_e,
-            i_ventilated_e)
-
-
-#####################################
-## SEIR model with phase adjusted R_0
-
-s_R, e_R, i_R, r_R = sim_seir_decay(S-2, 1 ,1, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta)
-
-susceptible_R, exposed_R, infected_R, recovered_R = s_R, e_R, i_R, r_R
-
-i_hospitalized_R, i_icu_R, i_ventilated_R = get_dispositions(i_R, rates, regional_hosp_share)
-
-r_hospitalized_R, r_icu_R, r_ventilated_R = get_dispositions(r_R, rates, regional_hosp_share)
-
-dispositions_R = (
-            i_hospitalized_R + r_hospitalized_R,
-            i_icu_R + r_icu_R,
-            i_ventilated_R + r_ventilated_R)
-
-hospitalized_R, icu_R, ventilated_R = (
-            i_hospitalized_R,
-            i_icu_R,
-            i_ventilated_R)
-
-
-####################################################################
-#### SEIR model with phase adjusted R_0 and Disease Related Fatality
-##
-##s_D, e_D, i_D, r_D, d_D = sim_seird_decay(S-2, 1, 1 , 0.0, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta, fatal)
-##
-##susceptible_D, exposed_D, infected_D, recovered_D = s_D, e_D, i_D, r_D
-##
-##i_hospitalized_D, i_icu_D, i_ventilated_D = get_dispositions(i_D, rates, regional_hosp_share)
-##
-##r_hospitalized_D, r_icu_D, r_ventilated_D = get_dispositions(r_D, rates, regional_hosp_share)
-##
-##dispositions_D = (
-##            i_hospitalized_D + r_hospitalized_D,
-##            i_icu_D + r_icu_D,
-##            i_ventilated_D + r_ventilated_D)
-##
-##hospitalized_D, icu_D, ventilated_D = (
-##            i_hospitalized_D,
-##            i_icu_D,
-##            i_ventilated_D)
-##
-##
-### Projection days
-##plot_projection_days = n_days - 10
-
-
-
-##################################################################
-## SEIJR model with phase adjusted R_0 and Disease Related Fatality 
-
-s_D, e_D, i_D, r_D, d_D = sim_seird_decay(S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2,alpha, n_days, decay1, decay2, decay3, decay4, end_delta, fatal)
-
-susceptible_D, exposed_D, infected_D, recovered_D = s_D, e_D, i_D, r_D
-
-i_hospitalized_D, i_icu_D, i_ventilated_D = get_dispositions(i_D, rates, regional_hosp_share)
-
-r_hospitalized_D, r_icu_D, r_ventilated_D = get_dispositions(r_D, rates, regional_hosp_share)
-
-dispositions_D = (
-            i_hospitalized_D + r_hospitalized_D,
-            i_icu_D + r_icu_D,
-            i_ventilated_D + r_ventilated_D)
-
-hospitalized_D, icu_D, ventilated_D = (
-            i_hospitalized_D,
-            i_icu_D,
-            i_ventilated_D)
+### Models
+# A lazy handle per model (covid_model.pipeline): runs and tables are computed,
+# or taken from the shared result cache, only when a chart shown needs them.
+graph = st.session_state.setdefault("graph", Graph(results))
+graph.begin()
+graph.update(
+    S=S, doubling_time=doubling_time, recovery_days=recovery_days, infectious_period=infectious_period,
+    incubation_period=incubation_period, relative_contact_rate=relative_contact_rate, fatal=fatal,
+    schedule=schedule, n_days=n_days, rates=rates, regional_hosp_share=regional_hosp_share,
+    hosp_los=hosp_los, icu_los=icu_los, vent_los=vent_los, integrator="euler")
+## SEIR model with phase adjusted R_0 and Disease Related Fatality; this page
+## admits from the infected and recovered compartments only
+models = model_handles(graph, ("e", "D_ir"))
+
+# Resumes from the state saved at the first changed phase of an earlier run
+s_D, e_D, i_D, r_D, d_D = models["D_ir"].run()
 
 
 # Projection days
@@ -810,106 +285,19 @@ plot_projection_days = n_days - 10
 ##
 ##hosp_day_rate=1/hosp_los
 ##
-##s_H2, e_H2, i_H2, j_H2, r_H2, d_H2 = sim_seijcrd_decay2(S-2, 1.0, 1.0, 0.0, 0.0, 0.0, beta5, gamma2,alpha, n_days,decay2,decay3, fatal, fatal_hosp, hosp_day_rate, hosp_rate, l)
+##s_H2, e_H2, i_H2, j_H2, r_H2, d_H2 = sim_seijcrd_decay2(S-2, 1.0, 1.0, 0.0, 0.0, 0.0, beta5, gamma2,alpha, n_days,
+##    InterventionSchedule([(0, 0, 0), (22, decay2, 0), (29, decay3, 0)]).contact_multipliers(n_days), fatal, fatal_hosp, hosp_day_rate, hosp_rate, l)
 ##
 
-#############
-# # SIR Model
-# # New cases
-projection_admits = build_admissions_df(dispositions)
-# # Census Table
-census_table = build_census_df(projection_admits)
-# ############################
-
-############
-# SEIR Model
-# New cases
-projection_admits_e = build_admissions_df(dispositions_e)
-# Census Table
-census_table_e = build_census_df(projection_admits_e)
-
-#############
-# SEIR Model with phase adjustment
-# New cases
-projection_admits_R = build_admissions_df(dispositions_R)
-# Census Table
-census_table_R = build_census_df(projection_admits_R)
-
 #############
 # SEIR Model with phase adjustment and Disease Fatality
-# New cases
-projection_admits_D = build_admissions_df(dispositions_D)
-# Census Table
-census_table_D = build_census_df(projection_admits_D)
+projection_admits_D, census_table_D = models["D_ir"].admissions(), models["D_ir"].census()
 
 
 ## Confirmed cases graphs
 
-url = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_US.csv'
-df = pd.read_csv(url)
-url2='https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series/time_series_covid19_confirmed_global.csv'
-df2=pd.read_csv(url2)
-is_US=df2['Country/Region']=='US'
-df_US=df2[is_US]
-
-is_NY =  df['Province_State']=='New York'
-df_NY = df[is_NY]
-is_Erie = df_NY['Admin2']=='Erie'
-df_Erie = df_NY[is_Erie]
-list(df_NY.columns)
-df_NY = df_NY.drop(['UID','iso2','iso3','code3',
- 'FIPS','Admin2','Country_Region', 'Province_State','Lat','Long_','Combined_Key','1/22/20','1/23/20','1/24/20','1/25/20','1/26/20','1/27/20',
- '1/28/20','1/29/20','1/30/20','1/31/20','2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20',
- '2/8/20','2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20','2/15/20','2/16/20','2/17/20','2/18/20',
- '2/19/20','2/20/20','2/21/20','2/22/20','2/23/20','2/24/20','2/25/20','2/26/20', '2/27/20','2/28/20','2/29/20'], axis=1)
-df_NY_all=df_NY.agg([sum])
-
-df_Erie = df_Erie.drop(['UID','iso2','iso3','code3',
- 'FIPS','Admin2', 'Lat','Long_','Combined_Key','Province_State','1/22/20','1/23/20','1/24/20','1/25/20','1/26/20','1/27/20',
- '1/28/20','1/29/20','1/30/20','1/31/20','2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20',
- '2/8/20','2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20','2/15/20','2/16/20','2/17/20','2/18/20',
- '2/19/20','2/20/20','2/21/20','2/22/20','2/23/20','2/24/20','2/25/20','2/26/20', '2/27/20','2/28/20','2/29/20'], axis=1)
-
-list(df_US.columns)
-df_US = df_US.drop(['Province/State','Lat','Country/Region',
- 'Long','1/22/20','1/23/20', '1/24/20','1/25/20','1/26/20','1/27/20','1/28/20', '1/29/20','1/30/20','1/31/20',
- '2/1/20','2/2/20','2/3/20','2/4/20','2/5/20','2/6/20','2/7/20','2/8/20', '2/9/20','2/10/20','2/11/20','2/12/20','2/13/20','2/14/20',
- '2/15/20','2/16/20', '2/17/20', '2/18/20', '2/19/20', '2/20/20', '2/21/20', '2/22/20', '2/23/20', '2/24/20', 
-'2/25/20', '2/26/20', '2/27/20','2/28/20','2/29/20'],axis=1)
-
-
-df_US['Region']='US'
-df_Erie['Region']='Erie'
-df_NY_all['Region']="NY"
-
-df_US2=pd.melt(df_US, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20'],
-                        var_name='Date',value_name='US')
-
-df_NY2=pd.melt(df_NY_all, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20'],
-                        var_name='Day2',value_name='NY')
-
-df_Erie2=pd.melt(df_Erie, id_vars=['Region'],value_vars=['3/1/20','3/2/20','3/3/20','3/4/20','3/5/20','3/6/20','3/7/20','3/8/20','3/9/20','3/10/20','3/11/20','3/12/20',
- '3/13/20','3/14/20','3/15/20','3/16/20','3/17/20','3/18/20','3/19/20','3/20/20','3/21/20','3/22/20',
- '3/23/20','3/24/20','3/25/20','3/26/20','3/27/20','3/28/20', '3/29/20', '3/30/20','3/31/20','4/1/20',
- '4/2/20','4/3/20','4/4/20','4/5/20','4/6/20','4/7/20','4/8/20', '4/9/20','4/10/20', '4/11/20','4/12/20', '4/13/20'],
-                        var_name='Day3',value_name='Erie')
-
-df_US2=df_US2.drop(['Region'], axis=1)
-df_NY2=df_NY2.drop(['Region'], axis=1)
-df_Erie2=df_Erie2.drop(['Region'], axis=1)
-
-result = pd.concat([df_US2, df_NY2, df_Erie2], axis=1, sort=False)
-result=result.drop(['Day2', 'Day3'],axis=1)
-result['day'] = np.arange(len(result))
-result['US']=(result['US']/328000000)*100
-result['NY']=(result['NY']/19450000)*100
-result['Erie']=(result['Erie']/1500000)*100
+cases_snapshot = case_data()
+result = cases_snapshot.result
 #st.dataframe(result)
 
 st.subheader("""Confirmed Cases for the US, New York, and Erie County""")
@@ -921,7 +309,7 @@ def confirmed_chart(
     
     tooltip_dict = {False: "day", True: "Date:T"}
     if as_date:
-        #projection = add_date_column(projection)
+        #projection = add_date_column(projection, start_date)
         x_kwargs = {"shorthand": "Date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -953,6 +341,9 @@ st.altair_chart(confirmed_chart(result, as_date=as_date), use_container_width=Tr
 st.markdown(
     """This chart shows the percent daily [confirmed](https://coronavirus.jhu.edu/map.html) cases per region population. These numbers are highly influenced by testing rates and testing practices in each geographic location. """
 )
+if cases_snapshot.checked_at is not None:
+    st.markdown("Case data through {:%B %d, %Y}, last checked against JHU {:%Y-%m-%d %H:%M} UTC.".format(
+        cases_snapshot.counties.dates[-1], cases_snapshot.checked_at))
 #cols = [2,4]
 #result.drop(result.columns[cols],axis=1,inplace=True)
 
@@ -975,7 +366,7 @@ def regional_admissions_chart(
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        projection_admits = add_date_column(projection_admits)
+        projection_admits = add_date_column(projection_admits, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1028,7 +419,7 @@ def regional_admissions_chart(
     
     # tooltip_dict = {False: "day", True: "date:T"}
     # if as_date:
-        # projection_admits = add_date_column(projection_admits)
+        # projection_admits = add_date_column(projection_admits, start_date)
         # x_kwargs = {"shorthand": "date:T", "title": "Date"}
     # else:
         # x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1069,7 +460,7 @@ def vertical_chart(
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        projection_admits = add_date_column(projection_admits)
+        projection_admits = add_date_column(projection_admits, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1134,13 +525,10 @@ However, parameters can be different depending on population characteristics and
 Therefore, interpreting the results can be difficult. """)
 
 
-sir = regional_admissions_chart(projection_admits, plot_projection_days, as_date=as_date)
-seir = regional_admissions_chart(projection_admits_e, plot_projection_days, as_date=as_date)
-seir_r = regional_admissions_chart(projection_admits_R, plot_projection_days, as_date=as_date)
-seir_d = regional_admissions_chart(projection_admits_D, plot_projection_days, as_date=as_date)
-
-
 if st.checkbox("Show Graph of Projected Admissions with Model Comparison of Social Distancing"):
+    # The SEIR run is only simulated once someone asks for the comparison
+    seir = regional_admissions_chart(models["e"].admissions(), plot_projection_days, as_date=as_date)
+    seir_d = regional_admissions_chart(projection_admits_D, plot_projection_days, as_date=as_date)
     st.subheader("Projected number of **daily** COVID-19 admissions: Model Comparison (Left: 0% Social Distancing, Right: Step-Wise Social Distancing)")
     st.altair_chart(
         alt.layer(seir.mark_line())
@@ -1203,7 +591,7 @@ def admitted_patients_chart(
     
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        census = add_date_column(census)
+        census = add_date_column(census, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
@@ -1278,7 +666,7 @@ def ppe_chart(
     census = census.rename(columns={'ppe_mean_mild': 'Mean PPE needs - mild cases', 'ppe_mean_severe': 'Mean PPE needs - severe cases'})
     tooltip_dict = {False: "day", True: "date:T"}
     if as_date:
-        census = add_date_column(census)
+        census = add_date_column(census, start_date)
         x_kwargs = {"shorthand": "date:T", "title": "Date"}
     else:
         x_kwargs = {"shorthand": "day", "title": "Days from initial infection"}
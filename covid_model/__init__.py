@@ -0,0 +1,45 @@
+"""COVID-19 compartmental models and hospital projections used by the Streamlit app.
+
+Importing this package draws no widgets and touches no network.
+"""
+from .hospital import (
+    DEFAULT_PPE,
+    HospitalTables,
+    PpeRates,
+    add_date_column,
+    admissions_frame,
+    build_admissions_array,
+    build_admissions_df,
+    build_census_df,
+    build_hospital_tables,
+    census_frame,
+    get_dispositions,
+    sum_dispositions,
+)
+from .models import (
+    gen_seir,
+    gen_sir,
+    seijcrd,
+    seijcrd2,
+    seir,
+    seird,
+    seird_age,
+    seird_batch,
+    seird_capacity,
+    seird_chain_binomial,
+    seird_coupled,
+    seird_update,
+    sim_seijcrd_decay,
+    sim_seijcrd_decay2,
+    sim_seir,
+    sim_seir_decay,
+    sim_seird_chain_binomial,
+    sim_seird_decay,
+    sim_seird_decay_age,
+    sim_seird_decay_batch,
+    sim_seird_decay_capacity,
+    sim_sir,
+    sim_sir_df,
+    sir,
+)
+from .schedule import InterventionSchedule, Phase
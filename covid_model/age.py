@@ -0,0 +1,111 @@
+"""Age bands, their contact matrices and rates for the age-structured SEIRD model.
+
+The model (models.sim_seird_decay_age) mixes K age bands through one
+contact matrix per setting: home, school, work and other. An intervention
+can then close one setting's block, e.g. schools, instead of scaling every
+contact alike. Hospitalization, ICU, ventilation and fatality rates vary by
+orders of magnitude across bands. Here they are spread from the app's
+population-wide rates over the bands in proportion to the age profiles of
+Ferguson et al. (2020), Imperial College COVID-19 Response Team Report 9,
+Table 1, so the overall rates still average to the sidebar values.
+
+No contact survey ships with the repo. stylized_contacts is a placeholder
+with household, school, workplace and community mixing of plausible size;
+contacts_from_csv reads survey matrices such as Prem et al. (2017) instead.
+"""
+from collections import namedtuple
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .schedule import InterventionSchedule
+
+
+AGE_BANDS = ("0-9", "10-19", "20-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80+")
+# US population by band, 2019 Census estimates
+US_AGE_SHARES = (0.121, 0.128, 0.139, 0.134, 0.123, 0.130, 0.115, 0.071, 0.039)
+# Report 9 hospitalization rate, share of those hospitalized who need
+# critical care, and infection fatality rate by band
+HOSP_PROFILE = (0.001, 0.003, 0.012, 0.032, 0.049, 0.102, 0.166, 0.243, 0.273)
+CRITICAL_SHARE = (0.050, 0.050, 0.050, 0.050, 0.063, 0.122, 0.274, 0.432, 0.709)
+FATALITY_PROFILE = (0.00002, 0.00006, 0.0003, 0.0008, 0.0015, 0.006, 0.022, 0.051, 0.093)
+
+SETTINGS = ("home", "school", "work", "other")
+
+# matrices[k, i, j] is the mean number of daily contacts a person in band i
+# has with people in band j in settings[k].
+ContactMatrices = namedtuple("ContactMatrices", ("settings", "matrices"))
+
+
+def band_rates(
+    overall: float, profile: Sequence[float], shares: Sequence[float] = US_AGE_SHARES) -> np.ndarray:
+    """Per-band rates shaped like profile that average to overall over the population shares."""
+    profile = np.asarray(profile, dtype=float)
+    return np.minimum(overall * profile / (np.asarray(shares, dtype=float) @ profile), 1.0)
+
+def age_rates(
+    rates: Tuple[float, float, float], shares: Sequence[float] = US_AGE_SHARES) -> Tuple[np.ndarray, ...]:
+    """hosp, icu and vent rates by band from population-wide ones; ventilation follows critical care."""
+    critical = np.asarray(HOSP_PROFILE) * np.asarray(CRITICAL_SHARE)
+    return tuple(band_rates(rate, profile, shares) for rate, profile in zip(rates, (HOSP_PROFILE, critical, critical)))
+
+def proportionate(
+    shares: np.ndarray, daily: float, bands: Optional[np.ndarray] = None) -> np.ndarray:
+    """daily contacts per person among bands (all by default), met in proportion to their size."""
+    shares = np.asarray(shares, dtype=float)
+    among = np.zeros(len(shares), dtype=bool)
+    among[np.arange(len(shares)) if bands is None else bands] = True
+    weights = np.where(among, shares, 0.0) / shares[among].sum()
+    return daily * np.outer(among, weights)
+
+def stylized_contacts(
+    shares: Sequence[float] = US_AGE_SHARES) -> ContactMatrices:
+    """Placeholder matrices for the nine AGE_BANDS; replace with survey data where available.
+
+    Every matrix is proportionate mixing within its group, so it is
+    reciprocal: shares[i] * C[i, j] == shares[j] * C[j, i].
+    """
+    shares = np.asarray(shares, dtype=float)
+    return ContactMatrices(SETTINGS, np.stack([
+        proportionate(shares, 3.0),
+        proportionate(shares, 8.0, [0, 1]),
+        proportionate(shares, 6.0, [2, 3, 4, 5, 6]),
+        proportionate(shares, 4.0),
+    ]))
+
+def contacts_from_csv(
+    path_or_buffer, bands: Sequence[str] = AGE_BANDS) -> ContactMatrices:
+    """Read a long table with columns setting, band, contact_band and contacts."""
+    table = pd.read_csv(path_or_buffer, dtype={"band": str, "contact_band": str})
+    settings = tuple(pd.unique(table["setting"]))
+    index = {band: k for k, band in enumerate(bands)}
+    matrices = np.zeros((len(settings), len(bands), len(bands)))
+    np.add.at(matrices, (
+        table["setting"].map(settings.index).values, table["band"].map(index).values,
+        table["contact_band"].map(index).values), table["contacts"].values)
+    return ContactMatrices(settings, matrices)
+
+def normalized(
+    contacts: ContactMatrices) -> ContactMatrices:
+    """Scale every setting so the total matrix has spectral radius one.
+
+    A per-capita beta then gives the age-structured model the same early
+    growth rate as the single-band model with that beta.
+    """
+    radius = np.abs(np.linalg.eigvals(contacts.matrices.sum(axis=0))).max()
+    return ContactMatrices(contacts.settings, contacts.matrices / radius)
+
+def setting_multipliers(
+    settings: Sequence[str], schedules: Dict[str, InterventionSchedule], n_days: int) -> np.ndarray:
+    """(n_settings, n_days) contact multiplier of each setting; settings without a schedule stay open."""
+    return np.stack([
+        schedules[setting].contact_multipliers(n_days) if setting in schedules else np.ones(n_days)
+        for setting in settings])
+
+def seed_bands(
+    population: float, exposed: float, infected: float, shares: Sequence[float] = US_AGE_SHARES
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(susceptible, exposed, infected) by band, each spread by population share."""
+    shares = np.asarray(shares, dtype=float) / np.sum(shares)
+    return (population - exposed - infected) * shares, exposed * shares, infected * shares
@@ -0,0 +1,155 @@
+"""Sequential Monte Carlo assimilation of the daily confirmed case feed.
+
+A ParticleFilter holds a population of particles, each a SEIRD state with
+its own transmission rate and reporting fraction, as NumPy arrays. Every new
+day of reported cases costs one seird_batch step for all particles, a
+vectorized weight update and, once the weights degenerate, systematic
+resampling with a small jitter of the parameters. The transmission rate
+follows a random walk on the log scale, so the filter follows changes in
+distancing without being told the schedule.
+
+Filters are kept per location in the process, so each day's feed only
+advances them by the new days; revisions of days already assimilated are
+not revisited. The posterior on the last assimilated day is the starting
+state for projections.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Hashable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import seird_batch, sim_seird_decay_batch
+from .rates import intrinsic_growth_rate, seir_beta
+
+
+MAX_FILTERS = 64
+
+# state is (5, n_particles) s, e, i, r, d on day; beta and reporting_fraction
+# are per particle, weights sum to one and history holds the (day + 1, 5)
+# weighted mean states from day 0 on.
+Posterior = namedtuple("Posterior", ("day", "state", "beta", "reporting_fraction", "weights", "history"))
+
+
+class ParticleFilter:
+    """Particles of the SEIRD model advanced and reweighted one reported day at a time."""
+
+    def __init__(
+        self, population: float, incubation_period: float, infectious_period: float, fatal: float,
+        n_particles: int = 2000, doubling_times: Tuple[float, float] = (2.0, 12.0),
+        reporting_fractions: Tuple[float, float] = (0.05, 1.0), exposed: float = 100.0, infected: float = 50.0,
+        observation_sd: float = 0.1, drift: float = 0.05, jitter: float = 0.01, seed: int = 0):
+        self.population = float(population)
+        self.alpha = 1 / incubation_period
+        self.gamma = 1 / infectious_period
+        self.fatal = fatal
+        self.observation_sd = observation_sd
+        self.drift = drift
+        self.jitter = jitter
+        self.rng = np.random.default_rng(seed)
+
+        self.state = np.repeat(
+            np.array([[population - exposed - infected], [exposed], [infected], [0.0], [0.0]]), n_particles, axis=1)
+        doubling_time = self.rng.uniform(*doubling_times, n_particles)
+        self.beta = seir_beta(intrinsic_growth_rate(doubling_time), self.alpha, infectious_period, population)
+        self.reporting_fraction = self.rng.uniform(*reporting_fractions, n_particles)
+        self.log_weights = np.zeros(n_particles)
+        self.day = 0
+        self.history = [self.state.mean(axis=1)]
+        self._lock = threading.Lock()
+
+    @property
+    def n_particles(self) -> int:
+        return self.state.shape[1]
+
+    def weights(self) -> np.ndarray:
+        weights = np.exp(self.log_weights - self.log_weights.max())
+        return weights / weights.sum()
+
+    def effective_size(self) -> float:
+        """Effective number of particles, 1 / sum(w^2)."""
+        return 1.0 / np.square(self.weights()).sum()
+
+    def assimilate(
+        self, reported: float) -> None:
+        """Advance one day and weigh the particles by the cumulative cases reported on it.
+
+        A day without a positive report is only simulated.
+        """
+        self.beta = self.beta * np.exp(self.drift * self.rng.standard_normal(self.n_particles))
+        self.state = np.array(seird_batch(*self.state, self.beta, self.gamma, self.alpha, self.population, self.fatal))
+        self.day += 1
+        if reported > 0:
+            # Log-normal error around the reported share of everyone ever infected
+            expected = np.maximum(self.reporting_fraction * self.state[2:].sum(axis=0), 1e-12)
+            self.log_weights -= 0.5 * np.square((np.log(reported) - np.log(expected)) / self.observation_sd)
+            self.log_weights -= self.log_weights.max()
+            if self.effective_size() < self.n_particles / 2:
+                self.resample()
+        self.history.append(self.state @ self.weights())
+
+    def resample(self) -> None:
+        """Systematic resampling, then jitter the copied parameters apart."""
+        positions = (self.rng.random() + np.arange(self.n_particles)) / self.n_particles
+        chosen = np.minimum(np.searchsorted(np.cumsum(self.weights()), positions), self.n_particles - 1)
+        self.state = self.state[:, chosen]
+        self.beta = self.beta[chosen] * np.exp(self.jitter * self.rng.standard_normal(self.n_particles))
+        self.reporting_fraction = np.minimum(
+            self.reporting_fraction[chosen] * np.exp(self.jitter * self.rng.standard_normal(self.n_particles)), 1.0)
+        self.log_weights = np.zeros(self.n_particles)
+
+    def catch_up(
+        self, series: np.ndarray, dates: np.ndarray, start_date) -> int:
+        """Assimilate the days of a cumulative series after the last one seen.
+
+        dates label series, and start_date is day 0. Returns the number of
+        new days assimilated.
+        """
+        days = np.asarray((pd.DatetimeIndex(dates) - pd.Timestamp(start_date)).days)
+        known = days >= 0
+        if not known.any():
+            return 0
+        reported = np.zeros(days[known].max() + 1)
+        reported[days[known]] = np.asarray(series, dtype=float)[known]
+        with self._lock:
+            first = self.day
+            for day in range(self.day + 1, len(reported)):
+                self.assimilate(reported[day])
+            return self.day - first
+
+    def posterior(self) -> Posterior:
+        with self._lock:
+            return Posterior(
+                self.day, self.state.copy(), self.beta.copy(), self.reporting_fraction.copy(), self.weights(),
+                np.array(self.history))
+
+def project(
+    posterior: Posterior, gamma: float, alpha: float, fatal: float, n_days: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(s, e, i, r, d) over the n_days after the posterior's day, which is day 0.
+
+    Every particle runs on from its state with its current transmission
+    rate; the projection is the weighted mean of their runs.
+    """
+    runs = sim_seird_decay_batch(*posterior.state, posterior.beta, gamma, alpha, n_days, np.ones(n_days), fatal)
+    return tuple(run.T @ posterior.weights for run in runs)
+
+
+_filters = OrderedDict()
+_filters_lock = threading.Lock()
+
+def particle_filter(
+    location: Hashable, start_date, population: float, incubation_period: float, infectious_period: float,
+    fatal: float, **kwargs) -> ParticleFilter:
+    """The process-wide filter for a location and model settings, created on first use."""
+    key = (location, pd.Timestamp(start_date), float(population), float(incubation_period),
+           float(infectious_period), float(fatal), tuple(sorted(kwargs.items())))
+    with _filters_lock:
+        if key in _filters:
+            _filters.move_to_end(key)
+        else:
+            _filters[key] = ParticleFilter(population, incubation_period, infectious_period, fatal, **kwargs)
+            while len(_filters) > MAX_FILTERS:
+                _filters.popitem(last=False)
+        return _filters[key]
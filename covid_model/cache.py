@@ -0,0 +1,226 @@
+"""Process-wide LRU cache of model results keyed by normalized parameters.
+
+Streamlit reruns the whole script on every widget change, so the same
+simulations and tables are asked for again and again, by the same session
+and by every visitor who keeps the defaults. Results are stored once per
+server process under a hash of their normalized arguments and evicted least
+recently used first once MODEL_CACHE_MAX_BYTES is exceeded.
+
+Cached values are shared between sessions: arrays come back read-only and
+DataFrames as copies, so no caller can change another caller's result.
+"""
+import functools
+import hashlib
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", 256 * 2 ** 20))
+
+CacheStats = namedtuple("CacheStats", ("entries", "bytes", "max_bytes", "hits", "misses"))
+
+
+def normalize(
+    value: Any) -> Hashable:
+    """Canonical, hashable form of an argument.
+
+    Floats are rounded to 12 significant digits so that e.g. 2.5 / 100 and
+    0.025 from two different widgets land on the same key. Arrays and frames
+    are reduced to a digest of their contents. Objects with a cache_key()
+    method (such as InterventionSchedule) are normalized through it.
+    Functions are keyed by their code, defaults and closure contents (see
+    function_key), so two lambdas or closures only share a key if they
+    compute the same thing; a closure over a value that has no key raises.
+    """
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return "nan" if value != value else float("{:.12g}".format(value)) + 0.0
+    if value is None or isinstance(value, (bool, str, bytes)):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (tuple, list)):
+        return (type(value).__name__, tuple(normalize(v) for v in value))
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return ("timedelta", value.total_seconds())
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value)
+        return ("ndarray", data.dtype.str, data.shape, hashlib.sha1(data.tobytes()).hexdigest())
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        columns = tuple(value.columns) if isinstance(value, pd.DataFrame) else value.name
+        return (type(value).__name__, normalize(columns), digest.hexdigest())
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((str(k), normalize(v)) for k, v in value.items())))
+    if hasattr(value, "cache_key"):
+        return (type(value).__name__, normalize(value.cache_key()))
+    if isinstance(value, functools.partial):
+        return ("partial", normalize(value.func), normalize(value.args), normalize(value.keywords))
+    if hasattr(value, "__func__"):
+        # A bound method is its function applied to its object
+        return ("method", normalize(value.__self__), normalize(value.__func__))
+    if hasattr(value, "__code__"):
+        closure = [cell.cell_contents for cell in value.__closure__ or ()]
+        return (function_key(value), normalize(value.__defaults__), normalize(value.__kwdefaults__),
+                normalize(closure))
+    if callable(value) and hasattr(value, "__qualname__"):
+        # Builtins and classes, which have no code of their own
+        owner = getattr(value, "__self__", None)
+        if owner is not None and not isinstance(owner, types.ModuleType):
+            return ("callable", value.__qualname__, normalize(owner))
+        return ("callable", getattr(value, "__module__", None), value.__qualname__)
+    raise TypeError("Cannot build a cache key from {!r}".format(type(value)))
+
+def _code_digest(
+    code) -> str:
+    """Digest of a code object's bytecode, constants (nested code included) and names."""
+    digest = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        digest.update((_code_digest(const) if hasattr(const, "co_code") else repr(const)).encode())
+    digest.update(repr(code.co_names).encode())
+    return digest.hexdigest()
+
+def function_key(
+    fn: Callable) -> Hashable:
+    """Identity of a function: module, qualified name and a digest of its bytecode.
+
+    Unlike the name alone, this changes when the function is edited and
+    tells apart lambdas and closures defined under the same name. Callables
+    without code of their own (builtins, classes, partials) are normalized.
+    """
+    if not hasattr(fn, "__code__"):
+        return normalize(fn)
+    return ("function", fn.__module__, fn.__qualname__, _code_digest(fn.__code__))
+
+def make_key(
+    *parts: Any) -> str:
+    """Hex digest identifying a normalized argument tuple."""
+    return hashlib.sha1(repr(normalize(parts)).encode()).hexdigest()
+
+def sizeof(
+    value: Any) -> int:
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) \
+            else int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+def _freeze(
+    value: Any) -> Any:
+    """value with read-only views of its arrays, so sessions cannot change each other's results.
+
+    The caller's own arrays stay writable.
+    """
+    if isinstance(value, np.ndarray):
+        value = value.view()
+        value.setflags(write=False)
+        return value
+    if isinstance(value, tuple):
+        frozen = [_freeze(v) for v in value]
+        return type(value)(*frozen) if hasattr(value, "_fields") else tuple(frozen)
+    if isinstance(value, list):
+        return [_freeze(v) for v in value]
+    return value
+
+def _thaw(
+    value: Any) -> Any:
+    """Hand out copies of mutable containers that cannot be frozen."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple) and any(isinstance(v, (pd.DataFrame, pd.Series)) for v in value):
+        return type(value)(*(_thaw(v) for v in value)) if hasattr(value, "_fields") \
+            else tuple(_thaw(v) for v in value)
+    return value
+
+
+class ResultCache:
+    """Thread-safe LRU mapping of keys to results, bounded in bytes."""
+
+    def __init__(self, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return _thaw(self._entries[key][0])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value, evicting the least recently used entries to stay in budget.
+
+        A value larger than the whole budget is not stored. The cache keeps
+        read-only views of value's arrays, which must not be changed through
+        the caller's references afterwards.
+        """
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        value = _freeze(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """The cached value for key, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+            value = _thaw(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(len(self._entries), self._bytes, self.max_bytes, self._hits, self._misses)
+
+
+# Shared by every session in the server process
+results = ResultCache()
+
+def memoized(
+    fn: Callable, cache: Optional[ResultCache] = None) -> Callable:
+    """fn, looking its results up in cache (the shared one by default) by its arguments."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = make_key(fn.__module__, fn.__qualname__, args, kwargs)
+        return (cache if cache is not None else results).get_or_compute(key, lambda: fn(*args, **kwargs))
+    return wrapper
@@ -0,0 +1,192 @@
+"""Fit doubling time, distancing levels and a reporting fraction to reported cases.
+
+Cumulative reported cases are modelled as a reporting fraction times the
+cumulative infections (i + r + d) of the step-wise distancing SEIRD model.
+Candidates are simulated together with sim_seird_decay_batch: a coarse scan
+along each parameter in turn first, then a compass search from its best
+point that evaluates all of its neighbours in one batch per iteration. The loss is the mean squared
+error of log cumulative cases over the days with reports; the reporting
+fraction minimizing it has a closed form, so it is solved for every
+candidate rather than searched over.
+"""
+from collections import namedtuple
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .models import sim_seird_decay_batch
+from .rates import intrinsic_growth_rate, seir_beta
+from .schedule import InterventionSchedule
+
+
+DOUBLING_TIME_GRID = (2.0, 12.0)
+DOUBLING_TIME_BOUNDS = (1.0, 30.0)
+REDUCTION_GRID = (0.0, 0.8)
+REDUCTION_BOUNDS = (0.0, 0.95)
+REPORTING_BOUNDS = (0.01, 1.0)
+# Passes of the coarse per-axis scan over every parameter
+SCAN_SWEEPS = 2
+# Days of reports from start_date that are fitted; every candidate is
+# simulated through the last of them, so this bounds the cost of a fit
+FIT_DAYS = 120
+
+# reductions holds every phase level of schedule, fitted or not; phases are
+# the indices of the fitted ones. fit has columns day, observed, fitted and
+# residual (log observed - log fitted) for each day with reports.
+Calibration = namedtuple(
+    "Calibration",
+    ("doubling_time", "reductions", "phases", "reporting_fraction", "loss", "schedule", "fit"))
+
+
+def fitted_phases(
+    schedule: InterventionSchedule, last_day: int) -> Tuple[int, ...]:
+    """Phases whose level the reports through last_day can tell apart.
+
+    A phase already in effect on day 0 is left as it is: with it free, the
+    doubling time and its level would be identified only through their
+    product.
+    """
+    return tuple(k for k, phase in enumerate(schedule.phases) if 0 < phase.day < last_day)
+
+def log_loss(
+    infected_total: np.ndarray, observed: np.ndarray,
+    reporting_bounds: Tuple[float, float] = REPORTING_BOUNDS) -> Tuple[np.ndarray, np.ndarray]:
+    """Loss and best reporting fraction for every candidate.
+
+    infected_total is (n_candidates, n_obs) model cumulative infections on
+    the observed days and observed the (n_obs,) positive reported totals.
+    """
+    log_model = np.log(np.maximum(infected_total, 1e-12))
+    log_observed = np.log(observed)
+    # The loss is quadratic in log(fraction), so clipping its minimizer to
+    # the bounds gives the constrained minimum
+    log_fraction = np.clip(
+        (log_observed - log_model).mean(axis=1), np.log(reporting_bounds[0]), np.log(reporting_bounds[1]))
+    residuals = log_observed - log_model - log_fraction[:, None]
+    return (residuals ** 2).mean(axis=1), np.exp(log_fraction)
+
+def simulate_reported(
+    population: float, doubling_time: np.ndarray, reductions: np.ndarray, schedule: InterventionSchedule,
+    incubation_period: float, infectious_period: float, fatal: float, days: np.ndarray,
+    exposed: float = 100.0, infected: float = 50.0) -> np.ndarray:
+    """Cumulative infections on the given days for each candidate.
+
+    doubling_time is (n_candidates,) and reductions (n_candidates, n_phases);
+    the run starts like the app's, from population - exposed - infected
+    susceptible. Returns shape (n_candidates, len(days)).
+    """
+    alpha = 1 / incubation_period
+    beta = seir_beta(intrinsic_growth_rate(doubling_time), alpha, infectious_period, population)
+    n_days = max(int(days[-1]), 1)
+    _, _, i_v, r_v, d_v = sim_seird_decay_batch(
+        population - exposed - infected, exposed, infected, 0.0, 0.0, beta, 1 / infectious_period, alpha,
+        n_days, schedule.contact_multipliers(n_days, reductions), fatal)
+    return (i_v + r_v + d_v)[:, days]
+
+def calibrate(
+    series: np.ndarray, dates: pd.DatetimeIndex, start_date, population: float, schedule: InterventionSchedule,
+    incubation_period: float, infectious_period: float, fatal: float, fit_days: Optional[int] = FIT_DAYS,
+    grid_size: int = 6, tolerance: float = 1e-3, max_iterations: int = 200) -> Calibration:
+    """Fit the doubling time and distancing levels of schedule to cumulative reported cases.
+
+    series holds cumulative cases on dates, and start_date is day 0 of the
+    model, as for the app's projections. Only reports on the first fit_days
+    days are fitted (all of them if None). grid_size is the number of values
+    per parameter in the coarse scan.
+    """
+    days = np.asarray((pd.DatetimeIndex(dates) - pd.Timestamp(start_date)).days)
+    series = np.asarray(series, dtype=float)
+    reported = (days >= 0) & (series > 0)
+    if fit_days is not None:
+        reported &= days < fit_days
+    days, observed = days[reported], series[reported]
+    phases = fitted_phases(schedule, int(days[-1]) if days.size else 0)
+    if days.size <= len(phases) + 2:
+        raise ValueError("Too few days with reported cases to calibrate")
+
+    levels = np.array([phase.reduction for phase in schedule.phases])
+
+    def evaluate(points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # points are (n, 1 + len(phases)): log doubling time, then fitted levels
+        reductions = np.repeat(levels[None, :], len(points), axis=0)
+        reductions[:, list(phases)] = points[:, 1:]
+        infected_total = simulate_reported(
+            population, np.exp(points[:, 0]), reductions, schedule, incubation_period, infectious_period,
+            fatal, days)
+        return log_loss(infected_total, observed)
+
+    # Coarse scan along one axis at a time, the others held at the best point
+    # so far, so the cost grows with the number of phases, not exponentially
+    axes = [np.linspace(*np.log(DOUBLING_TIME_GRID), grid_size)]
+    axes += [np.linspace(*REDUCTION_GRID, grid_size)] * len(phases)
+    point = np.array([axes[0][grid_size // 2]] + [np.clip(levels[k], *REDUCTION_GRID) for k in phases])
+    best = np.inf
+    for _ in range(SCAN_SWEEPS):
+        for axis, values in enumerate(axes):
+            candidates = np.repeat(point[None, :], len(values), axis=0)
+            candidates[:, axis] = values
+            losses, _ = evaluate(candidates)
+            if losses.min() < best:
+                point, best = candidates[np.argmin(losses)], losses.min()
+
+    # Compass search: try +/- step along each axis at once, halve on no progress
+    lower = np.array([np.log(DOUBLING_TIME_BOUNDS[0])] + [REDUCTION_BOUNDS[0]] * len(phases))
+    upper = np.array([np.log(DOUBLING_TIME_BOUNDS[1])] + [REDUCTION_BOUNDS[1]] * len(phases))
+    step = np.array([axis[1] - axis[0] for axis in axes]) / 2 if grid_size > 1 else (upper - lower) / 4
+    directions = np.concatenate([np.diag(step), -np.diag(step)])
+    for _ in range(max_iterations):
+        neighbours = np.clip(point + directions, lower, upper)
+        losses, _ = evaluate(neighbours)
+        if losses.min() < best:
+            point, best = neighbours[np.argmin(losses)], losses.min()
+        else:
+            directions /= 2
+            if np.abs(directions).max() < tolerance:
+                break
+
+    loss, fraction = evaluate(point[None, :])
+    doubling_time = float(np.exp(point[0]))
+    levels[list(phases)] = point[1:]
+    fitted_schedule = InterventionSchedule(
+        (phase.day, level, phase.ramp_days) for phase, level in zip(schedule.phases, levels))
+    fitted = fraction[0] * simulate_reported(
+        population, np.array([doubling_time]), levels[None, :], fitted_schedule, incubation_period,
+        infectious_period, fatal, days)[0]
+    fit = pd.DataFrame({
+        "day": days,
+        "observed": observed,
+        "fitted": fitted,
+        "residual": np.log(observed) - np.log(fitted),
+    })
+    return Calibration(doubling_time, levels, phases, float(fraction[0]), float(loss[0]), fitted_schedule, fit)
+
+def calibrate_counties(
+    store, state: str, rows: Iterable[Sequence], counties: Optional[Iterable[str]] = None, **kwargs
+    ) -> pd.DataFrame:
+    """Calibrate every county of a state in a CountyStore, e.g. for a nightly job.
+
+    rows are the (date, reduction, ramp_days) distancing phases, dated, so
+    each county's schedule starts from its own first reported case. The
+    remaining keyword arguments go to calibrate. Returns one row per county
+    with a known population and enough reports.
+    """
+    rows = list(rows)
+    records = []
+    for county in (store.counties(state) if counties is None else counties):
+        series = store.county_by_name(state, county)
+        start_date = store.first_case_date(series)
+        population = store.population(state, county)
+        if start_date is None or not population > 0:
+            continue
+        schedule = InterventionSchedule.from_dates(start_date, rows)
+        try:
+            result = calibrate(series, store.dates, start_date, population, schedule, **kwargs)
+        except ValueError:
+            continue
+        record = dict(
+            state=state, county=county, population=population, start_date=start_date,
+            doubling_time=result.doubling_time, reporting_fraction=result.reporting_fraction, loss=result.loss)
+        record.update(("reduction_{}".format(k), level) for k, level in enumerate(result.reductions))
+        records.append(record)
+    return pd.DataFrame.from_records(records)
@@ -0,0 +1,83 @@
+"""When projected census overruns hospital, ICU and ventilator capacity.
+
+Capacity is one value per category (staffed beds, ICU beds, ventilators)
+or a surge plan with a value per day. Census arrays carry days and
+categories on their last two axes, behind any leading axes (scenarios,
+hospitals, ensemble draws), and every statistic here is computed for all of
+them at once: the first day of overrun, how long that overrun lasts, the
+total days over, and the largest deficit and its day.
+"""
+from collections import namedtuple
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .hospital import CATEGORIES
+
+
+# Arrays of shape (..., len(CATEGORIES)); first_day is -1 and the rest 0
+# where census never exceeds capacity
+Breaches = namedtuple("Breaches", ("first_day", "duration", "days_over", "peak_deficit", "peak_day"))
+
+
+def surge_plan(
+    capacity: Sequence[float], steps: Sequence[Tuple[int, Sequence[float]]], n_days: int) -> np.ndarray:
+    """(n_days, 3) capacity from capacity on day 0 and (day, capacity) steps that hold from their day on."""
+    steps = sorted(steps, key=lambda step: step[0])
+    days = np.array([day for day, _ in steps], dtype=int)
+    levels = np.vstack([np.asarray(capacity, dtype=float)] + [np.asarray(level, dtype=float) for _, level in steps])
+    return levels[np.searchsorted(days, np.arange(n_days), side="right")]
+
+def surge_plan_from_csv(
+    path_or_buffer, capacity: Sequence[float], start_date, n_days: int) -> np.ndarray:
+    """surge_plan from a table with columns date and any of hosp, icu and vent; blanks keep the last value."""
+    table = pd.read_csv(path_or_buffer, parse_dates=["date"]).sort_values("date")
+    days = (table["date"] - pd.Timestamp(start_date)).dt.days.values
+    levels = table.reindex(columns=list(CATEGORIES)).astype(float)
+    levels = pd.concat([pd.DataFrame([capacity], columns=list(CATEGORIES)), levels]).ffill().values[1:]
+    return surge_plan(capacity, list(zip(days.tolist(), levels)), n_days)
+
+def find_breaches(
+    census: np.ndarray, capacity: np.ndarray) -> Breaches:
+    """Breaches of census (..., n_days, 3) over capacity broadcasting against it.
+
+    Capacity is e.g. (3,), a surge plan (n_days, 3), or (n_hospitals, 1, 3)
+    for a capacity per hospital. NaN capacity is never exceeded.
+    """
+    census = np.asarray(census, dtype=float)
+    deficit = census - np.asarray(capacity, dtype=float)
+    over = deficit > 0
+    days = np.arange(census.shape[-2])[:, None]
+    breached = over.any(axis=-2)
+    first_day = np.where(breached, over.argmax(axis=-2), -1)
+    # The first overrun ends on the first day at or under capacity after it starts
+    recovered = ~over & (days >= first_day[..., None, :])
+    end = np.where(recovered.any(axis=-2), recovered.argmax(axis=-2), census.shape[-2])
+    deficit = np.where(over, deficit, 0.0)
+    return Breaches(
+        first_day, np.where(breached, end - first_day, 0), over.sum(axis=-2), deficit.max(axis=-2),
+        np.where(breached, deficit.argmax(axis=-2), 0))
+
+def breach_table(
+    breaches: Breaches, names: Sequence[str], start_date=None, labels: Sequence[str] = CATEGORIES
+    ) -> pd.DataFrame:
+    """One row per name (the leading axis of breaches) and category, with dates if start_date is given."""
+    n_categories = len(labels)
+    frame = {
+        "name": np.repeat(np.asarray(names, dtype=object), n_categories),
+        "category": np.tile(np.asarray(labels, dtype=object), len(names)),
+    }
+    frame.update((field, np.asarray(value).reshape(-1)) for field, value in zip(Breaches._fields, breaches))
+    table = pd.DataFrame(frame)
+    if start_date is not None:
+        first = pd.Timestamp(start_date) + pd.to_timedelta(table["first_day"].clip(lower=0), "D")
+        table.insert(3, "first_date", first.dt.date.where(table["first_day"] >= 0))
+    return table
+
+def capacity_frame(
+    capacity: np.ndarray, n_days: int, names: Sequence[str] = CATEGORIES) -> pd.DataFrame:
+    """Capacity by day in columns day and names, e.g. to chart a surge plan over census."""
+    frame = pd.DataFrame(np.broadcast_to(np.asarray(capacity, dtype=float), (n_days, len(names))), columns=list(names))
+    frame.insert(0, "day", np.arange(n_days))
+    return frame
@@ -0,0 +1,124 @@
+"""Census from admissions for fixed, gamma or empirical lengths of stay.
+
+A patient admitted on day t is still in the census on day t+k with
+probability survival[k] = P(LOS > k), so census is the convolution of daily
+admissions with the survival curve. A fixed LOS of L days is the curve of L
+ones, which gives the same census as build_census_df has always reported;
+that convolution is a window sum, computed as a difference of cumulative
+sums instead of an FFT.
+"""
+import math
+from typing import Sequence, Union
+
+import numpy as np
+
+
+def point_mass_survival(
+    los: int) -> np.ndarray:
+    """Survival curve for every patient staying exactly los days."""
+    return np.ones(int(los))
+
+def pmf_survival(
+    pmf: np.ndarray) -> np.ndarray:
+    """Survival curve from a length of stay pmf, pmf[L] = P(LOS = L days)."""
+    pmf = np.asarray(pmf, dtype=float)
+    pmf = pmf / pmf.sum()
+    return np.clip(1.0 - np.cumsum(pmf), 0.0, 1.0)[:-1]
+
+def empirical_survival(
+    lengths_of_stay: np.ndarray) -> np.ndarray:
+    """Survival curve from observed lengths of stay in whole days."""
+    lengths_of_stay = np.asarray(lengths_of_stay, dtype=float)
+    lengths_of_stay = np.ceil(lengths_of_stay[~np.isnan(lengths_of_stay)]).astype(int)
+    return pmf_survival(np.bincount(lengths_of_stay, minlength=2))
+
+def _gamma_cdf(
+    x: np.ndarray, shape: float) -> np.ndarray:
+    """Regularized lower incomplete gamma P(shape, x) from its power series."""
+    x = np.asarray(x, dtype=float)
+    cdf = np.zeros_like(x)
+    positive = x > 0
+    if not positive.any():
+        return cdf
+    xp = x[positive]
+    n_terms = int(xp.max() + 10 * math.sqrt(xp.max()) + 50)
+    log_ratio = np.log(xp)[:, None] - np.log(shape + np.arange(1, n_terms))[None, :]
+    log_terms = np.concatenate([np.zeros((xp.size, 1)), np.cumsum(log_ratio, axis=1)], axis=1)
+    log_prefix = shape * np.log(xp) - xp - math.lgamma(shape + 1)
+    cdf[positive] = np.exp(log_prefix[:, None] + log_terms).sum(axis=1)
+    return np.clip(cdf, 0.0, 1.0)
+
+def gamma_survival(
+    mean: float, shape: float, max_days: int, tol: float = 1e-9) -> np.ndarray:
+    """Survival curve for a gamma LOS with the given mean (days) and shape.
+
+    Stays are rounded up to whole days; the curve is cut where it falls below
+    tol or at max_days.
+    """
+    scale = mean / shape
+    survival = 1.0 - _gamma_cdf(np.arange(max_days) / scale, shape)
+    keep = np.nonzero(survival >= tol)[0]
+    return survival[:keep[-1] + 1] if keep.size else survival[:1]
+
+def survival_curve(
+    length_of_stay: Union[int, np.ndarray]) -> np.ndarray:
+    """A whole-day LOS as a point mass; anything else is already a survival curve."""
+    if np.ndim(length_of_stay) == 0:
+        return point_mass_survival(length_of_stay)
+    return np.asarray(length_of_stay, dtype=float)
+
+def mean_length_of_stay(
+    length_of_stay: Union[int, np.ndarray]) -> float:
+    """Mean stay in days of a whole-day LOS or survival curve, the sum of the curve."""
+    return float(survival_curve(length_of_stay).sum())
+
+def window_census(
+    admits: np.ndarray, lengths_of_stay: Sequence[int]) -> np.ndarray:
+    """Census for admissions of shape (..., n_categories, n_days) and whole-day lengths of stay.
+
+    Each category's census is the sum of its last LOS days of admissions,
+    the cumulative admissions minus those LOS days earlier. lengths_of_stay
+    is one LOS per category, or an array broadcasting against the leading
+    axes too, e.g. (n_hospitals, n_categories) for a LOS per hospital.
+    """
+    total = np.cumsum(admits, axis=-1)
+    if np.ndim(lengths_of_stay) > 1:
+        los = np.maximum(np.asarray(lengths_of_stay).astype(int), 0)
+        earlier = np.broadcast_to(np.arange(admits.shape[-1]) - los[..., None], total.shape)
+        return total - np.where(
+            earlier >= 0, np.take_along_axis(total, np.maximum(earlier, 0), axis=-1), 0.0)
+    census = total.copy()
+    for k, los in enumerate(lengths_of_stay):
+        los = int(los)
+        if los <= 0:
+            census[..., k, :] = 0.0
+        elif los < admits.shape[-1]:
+            census[..., k, los:] -= total[..., k, :-los]
+    return census
+
+def convolve_census(
+    admits: np.ndarray, lengths_of_stay: Sequence[Union[int, np.ndarray]]) -> np.ndarray:
+    """Census for admissions of shape (..., n_categories, n_days).
+
+    lengths_of_stay holds one whole-day LOS or survival curve per category.
+    Whole days alone are window sums (window_census); otherwise every
+    category and every leading (e.g. ensemble) row is convolved in one FFT.
+    NaN admissions count as none. Census is rounded up as in
+    build_census_df.
+    """
+    admits = np.nan_to_num(np.asarray(admits, dtype=float))
+    if all(np.ndim(los) == 0 for los in lengths_of_stay):
+        # Window sums round off differently from the FFT; the rounding below absorbs both
+        return np.ceil(np.round(window_census(admits, lengths_of_stay), 6))
+    n_days = admits.shape[-1]
+    curves = [survival_curve(los)[:n_days] for los in lengths_of_stay]
+    kernel = np.zeros((len(curves), max(len(curve) for curve in curves)))
+    for k, curve in enumerate(curves):
+        kernel[k, :len(curve)] = curve
+
+    n_fft = 1 << (n_days + kernel.shape[1] - 2).bit_length()
+    census = np.fft.irfft(
+        np.fft.rfft(admits, n_fft, axis=-1) * np.fft.rfft(kernel, n_fft, axis=-1),
+        n_fft, axis=-1)[..., :n_days]
+    # Drop FFT round-off so exact sums are not pushed to the next integer
+    return np.ceil(np.round(census, 6))
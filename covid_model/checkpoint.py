@@ -0,0 +1,65 @@
+"""Resume step-wise distancing runs from states saved at phase boundaries.
+
+The trajectory up to a phase boundary depends only on the contact
+multipliers before it, so when a user changes a later phase (say the level
+after the end date) the run can restart from the state saved at that phase's
+first day instead of from day 0. One run per starting point and set of rates
+is kept in a ResultCache, alongside the model results, together with its
+contact vector and the states at each phase boundary.
+"""
+from collections import namedtuple
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import ResultCache, make_key, results
+from .models import sim_seird_decay
+
+
+# contact is the vector the trajectory (5, n_days+1) was simulated with, n the
+# total it is normalized to and states[k] the (s, e, i, r, d) on days[k]
+Checkpoints = namedtuple("Checkpoints", ("contact", "n", "trajectory", "days", "states"))
+
+
+def first_difference(
+    a: np.ndarray, b: np.ndarray) -> int:
+    """First day on which two contact vectors differ, or the shorter length."""
+    n_common = min(len(a), len(b))
+    differ = np.flatnonzero(a[:n_common] != b[:n_common])
+    return int(differ[0]) if differ.size else n_common
+
+def sim_seird_decay_checkpointed(
+    s: float, e: float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray, fatal: float, boundaries: Sequence[int], cache: Optional[ResultCache] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """sim_seird_decay, resumed from the latest saved boundary state still valid.
+
+    boundaries are the days to checkpoint, e.g. the schedule's phase days. A
+    saved state on day t is reused when the contact multipliers of days
+    0..t-1 are unchanged; results are identical to a run from day 0.
+    """
+    cache = cache if cache is not None else results
+    contact = np.asarray(contact, dtype=float)[:n_days]
+    key = make_key("seird_checkpoints", s, e, i, r, d, beta, gamma, alpha, fatal)
+    saved = cache.get(key)
+
+    start = 0
+    if saved is not None:
+        valid_until = min(first_difference(saved.contact, contact), n_days)
+        usable = saved.days[saved.days <= valid_until]
+        start = int(usable.max()) if usable.size else 0
+
+    if start > 0:
+        state = saved.states[np.searchsorted(saved.days, start)]
+        trajectory = np.empty((5, n_days + 1))
+        trajectory[:, :start] = saved.trajectory[:, :start]
+        trajectory[:, start:] = sim_seird_decay(
+            *state, beta, gamma, alpha, n_days - start, contact[start:], fatal, n=saved.n)
+        n = saved.n
+    else:
+        trajectory = np.array(sim_seird_decay(s, e, i, r, d, beta, gamma, alpha, n_days, contact, fatal))
+        n = float(s) + float(e) + float(i) + float(r) + float(d)
+
+    days = np.array(sorted({int(day) for day in boundaries if 0 < day <= n_days}), dtype=int)
+    cache.put(key, Checkpoints(contact.copy(), n, trajectory, days, trajectory[:, days].T.copy()))
+    return tuple(trajectory)
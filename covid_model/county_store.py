@@ -0,0 +1,239 @@
+"""Columnar store of the JHU US county case series, keyed by FIPS.
+
+The wide JHU file is converted once per version into a contiguous int32
+matrix (rows x dates) saved as .npy and memory-mapped on open, with state and
+national rollups precomputed. Indexes by FIPS, (state, county) and state make
+every series an O(1) lookup instead of a boolean scan over the DataFrame.
+"""
+import hashlib
+import os
+import shutil
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Part of every store's key, so stores written in an older layout are rebuilt
+STORE_FORMAT = 2
+
+# Store directories kept under root. Sessions and other processes may still
+# have an older version memory-mapped, so only the oldest beyond these go.
+KEEP_STORES = 3
+
+
+def parse_date_columns(
+    columns, known: Optional[Dict[str, np.datetime64]] = None
+    ) -> Tuple[np.ndarray, pd.DatetimeIndex]:
+    """Positions and dates of the JHU m/d/yy date columns, in column order.
+
+    Labels found in known (label -> date, e.g. from the previous version of
+    the file) are not parsed again, so a new day costs one label.
+    """
+    labels = pd.Index(columns).astype(str)
+    dates = np.full(len(labels), np.datetime64("NaT"), dtype="datetime64[D]")
+    todo = np.ones(len(labels), dtype=bool)
+    if known:
+        todo = ~labels.isin(list(known))
+        dates[~todo] = [known[label] for label in labels[~todo]]
+    dates[todo] = pd.to_datetime(labels[todo], format="%m/%d/%y", errors="coerce").values.astype("datetime64[D]")
+    positions = np.nonzero(~np.isnat(dates))[0]
+    return positions, pd.DatetimeIndex(dates[positions])
+
+def build_county_store(
+    df: pd.DataFrame, directory: str, populations: Optional[pd.Series] = None,
+    previous: Optional["CountyStore"] = None) -> None:
+    """Write the store for a JHU US confirmed (or deaths) frame to directory.
+
+    populations, if given, is indexed by JHU UID. With the store of the
+    previous version only the date columns added since are parsed; values are
+    still copied in full so JHU's corrections to past days are picked up.
+    """
+    os.makedirs(directory, exist_ok=True)
+    positions, dates = parse_date_columns(df.columns, previous.date_labels() if previous is not None else None)
+    cases = np.ascontiguousarray(df.iloc[:, positions].fillna(0).to_numpy(dtype=np.int32))
+
+    state = df["Province_State"].astype(str).to_numpy(dtype=str)
+    county = df["Admin2"].fillna("").astype(str).to_numpy(dtype=str)
+    fips = df["FIPS"].fillna(-1).to_numpy(dtype=np.int64)
+    lat = df["Lat"].to_numpy(dtype=float) if "Lat" in df else np.full(len(df), np.nan)
+    lon = df["Long_"].to_numpy(dtype=float) if "Long_" in df else np.full(len(df), np.nan)
+    if populations is not None:
+        population = df["UID"].map(populations).to_numpy(dtype=float)
+    else:
+        population = np.full(len(df), np.nan)
+
+    # State rollups: sort rows by state once and sum each contiguous block
+    state_names, state_rows = np.unique(state, return_inverse=True)
+    order = np.argsort(state_rows, kind="stable")
+    starts = np.searchsorted(state_rows[order], np.arange(len(state_names)))
+    state_cases = np.add.reduceat(cases[order].astype(np.int64), starts, axis=0)
+    state_population = np.add.reduceat(np.nan_to_num(population[order]), starts)
+
+    np.save(os.path.join(directory, "cases.npy"), cases)
+    np.save(os.path.join(directory, "state_cases.npy"), state_cases)
+    np.savez(
+        os.path.join(directory, "index.npz"),
+        dates=dates.values.astype("datetime64[D]"),
+        labels=np.array([str(label) for label in df.columns[positions]]),
+        fips=fips,
+        state=state,
+        county=county,
+        population=population,
+        lat=lat,
+        lon=lon,
+        state_names=state_names,
+        state_population=state_population,
+    )
+
+
+class CountyStore:
+    """Read-only, memory-mapped view of a directory written by build_county_store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.cases = np.load(os.path.join(directory, "cases.npy"), mmap_mode="r")
+        self.state_cases = np.load(os.path.join(directory, "state_cases.npy"), mmap_mode="r")
+        with np.load(os.path.join(directory, "index.npz")) as index:
+            self.dates = pd.DatetimeIndex(index["dates"])
+            self.labels = index["labels"].tolist()
+            self.fips = index["fips"]
+            self.state_of = index["state"].tolist()
+            self.county_of = index["county"].tolist()
+            self.population_of = index["population"]
+            # Centroids; 0, 0 is what JHU gives for rows that have none
+            self.lat = np.where(index["lat"] == 0, np.nan, index["lat"])
+            self.lon = np.where(index["lon"] == 0, np.nan, index["lon"])
+            self.state_names = index["state_names"].tolist()
+            self.state_population = index["state_population"]
+        self.national_cases = np.asarray(self.state_cases).sum(axis=0)
+
+        self._by_fips = {f: row for row, f in enumerate(self.fips.tolist()) if f >= 0}
+        self._by_name = {(s, c): row for row, (s, c) in enumerate(zip(self.state_of, self.county_of))}
+        self._by_state = {s: k for k, s in enumerate(self.state_names)}
+        # Row indexes of every row of a state, so rows(state) is a lookup
+        self._state_rows = {}
+        for row, s in enumerate(self.state_of):
+            self._state_rows.setdefault(s, []).append(row)
+        self._state_rows = {s: np.array(rows) for s, rows in self._state_rows.items()}
+        self._counties = {}
+        for s, c, f in zip(self.state_of, self.county_of, self.fips.tolist()):
+            # Skip JHU's "Unassigned" / "Out of <state>" rows, which have no county FIPS
+            if c and 0 < f < 80000:
+                self._counties.setdefault(s, []).append(c)
+
+    def cache_key(self):
+        return self.directory
+
+    def date_labels(self) -> Dict[str, np.datetime64]:
+        """Source column label -> date, for parsing the next version incrementally."""
+        return dict(zip(self.labels, self.dates.values.astype("datetime64[D]")))
+
+    def window(self, start=None, end=None) -> slice:
+        """Column slice for the dates from start through end (either may be None)."""
+        first = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        last = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return slice(int(first), int(last))
+
+    def states(self) -> List[str]:
+        return [s for s in self.state_names if s in self._counties]
+
+    def counties(self, state: str) -> List[str]:
+        return sorted(self._counties.get(state, []))
+
+    def row(self, state: str, county: str) -> int:
+        return self._by_name[(state, county)]
+
+    def rows(self, state: Optional[str] = None, county: Optional[str] = None) -> np.ndarray:
+        """Row indexes of a county, of every row of a state, or (no arguments) of all rows."""
+        if county is not None:
+            return np.array([self._by_name[(state, county)]])
+        if state is not None:
+            return self._state_rows.get(state, np.zeros(0, dtype=int)).copy()
+        return np.arange(len(self.state_of))
+
+    def is_county(self) -> np.ndarray:
+        """Mask of the rows that are counties, not JHU's "Unassigned" / "Out of <state>" rows."""
+        return (self.fips > 0) & (self.fips < 80000) & (np.asarray(self.county_of) != "")
+
+    def county(self, fips: int) -> np.ndarray:
+        """Cumulative cases for one county by FIPS."""
+        return self.cases[self._by_fips[int(fips)]]
+
+    def county_by_name(self, state: str, county: str) -> np.ndarray:
+        return self.cases[self._by_name[(state, county)]]
+
+    def state(self, state: str) -> np.ndarray:
+        """Cumulative cases summed over every row of the state."""
+        return self.state_cases[self._by_state[state]]
+
+    def national(self) -> np.ndarray:
+        return self.national_cases
+
+    def population(self, state: Optional[str] = None, county: Optional[str] = None) -> float:
+        """Population of a county, a state, or (no arguments) the nation; NaN if unknown."""
+        if county is not None:
+            return float(self.population_of[self._by_name[(state, county)]])
+        if state is not None:
+            return float(self.state_population[self._by_state[state]])
+        return float(self.state_population.sum())
+
+    def first_case_date(self, series: np.ndarray) -> Optional[pd.Timestamp]:
+        """Date of the first reported case in a series, None if there is none."""
+        reported = np.nonzero(np.asarray(series) > 0)[0]
+        return self.dates[reported[0]] if reported.size else None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _previous_store(
+    root: str) -> Optional[CountyStore]:
+    """Any complete store left under root by an earlier version or process."""
+    if not os.path.isdir(root):
+        return None
+    for name in os.listdir(root):
+        if os.path.exists(os.path.join(root, name, "index.npz")) and not name.endswith(".tmp"):
+            try:
+                return CountyStore(os.path.join(root, name))
+            except (OSError, KeyError, ValueError):
+                continue
+    return None
+
+def _remove_old_stores(
+    root: str, keep: int) -> None:
+    """Remove all but the keep most recently opened directories under root."""
+    paths = [os.path.join(root, name) for name in os.listdir(root)]
+    paths = sorted((path for path in paths if os.path.isdir(path)), key=os.path.getmtime, reverse=True)
+    for path in paths[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+def open_county_store(
+    root: str, version: str, load_frame: Callable[[], pd.DataFrame],
+    load_populations: Optional[Callable[[], Optional[pd.Series]]] = None
+    ) -> CountyStore:
+    """The CountyStore for this version of the source file, shared process-wide.
+
+    The store is built under root on first use of a version (calling
+    load_frame and load_populations only then). Versions other than the
+    KEEP_STORES most recently opened are removed.
+    """
+    key = hashlib.sha1("{}:{}".format(STORE_FORMAT, version).encode()).hexdigest()[:16]
+    with _stores_lock:
+        if key in _stores:
+            return _stores[key]
+        directory = os.path.join(root, key)
+        if not os.path.exists(os.path.join(directory, "index.npz")):
+            tmp_directory = directory + ".tmp"
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            populations = load_populations() if load_populations is not None else None
+            previous = next(iter(_stores.values()), None) or _previous_store(root)
+            build_county_store(load_frame(), tmp_directory, populations, previous)
+            os.replace(tmp_directory, directory)
+        # Marks the version as the most recently opened one
+        os.utime(directory)
+        _remove_old_stores(root, KEEP_STORES)
+        _stores.clear()
+        _stores[key] = CountyStore(directory)
+        return _stores[key]
@@ -0,0 +1,92 @@
+"""Incremental recomputation over an explicit dependency graph.
+
+Inputs are set by name; nodes are functions of inputs and other nodes. A
+node's fingerprint is a hash of its name, its function (module, name and
+bytecode) and its dependencies' fingerprints, so after a rerun only the nodes downstream of a changed input
+are recomputed and everything else is returned as it was. Nodes are computed
+on demand by get, never ahead of time.
+
+Keep one Graph per session (e.g. in st.session_state) so values carry over
+between reruns. Nodes marked shared are also looked up in, and stored to, a
+ResultCache, where other sessions with the same upstream inputs find them.
+"""
+from typing import Any, Callable, Optional
+
+from .cache import ResultCache, function_key, make_key
+
+
+class Graph:
+    """Named inputs and nodes, each node recomputed only when its inputs change."""
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache
+        self._inputs = {}
+        self._nodes = {}
+        self._values = {}
+        self._fingerprints = {}
+        # Nodes recomputed since the last call to begin()
+        self.computed = []
+
+    def begin(self) -> None:
+        """Start a new pass, e.g. at the top of a Streamlit rerun."""
+        self.computed = []
+
+    def set(self, name: str, value: Any) -> None:
+        """Set an input; nodes downstream are invalidated only if it changed."""
+        fingerprint = make_key("input", name, value)
+        if name in self._inputs and self._inputs[name][0] == fingerprint:
+            return
+        self._inputs[name] = (fingerprint, value)
+        self._fingerprints = {}
+
+    def update(self, **inputs: Any) -> None:
+        for name, value in inputs.items():
+            self.set(name, value)
+
+    def node(self, name: str, fn: Callable, *deps: str, shared: bool = False) -> None:
+        """Define (or redefine, on every rerun) node name = fn(*deps)."""
+        if name in self._inputs:
+            raise ValueError("{} is already an input".format(name))
+        identity = function_key(fn)
+        if self._nodes.get(name, (None, None, None, None))[1:] != (deps, shared, identity):
+            self._fingerprints = {}
+        self._nodes[name] = (fn, deps, shared, identity)
+
+    def fingerprint(self, name: str) -> str:
+        if name in self._inputs:
+            return self._inputs[name][0]
+        if name not in self._fingerprints:
+            if name not in self._nodes:
+                raise KeyError("No input or node named {}".format(name))
+            _, deps, _, identity = self._nodes[name]
+            self._fingerprints[name] = make_key("node", name, identity, [self.fingerprint(dep) for dep in deps])
+        return self._fingerprints[name]
+
+    def get(self, name: str) -> Any:
+        """The current value of an input or node, computing what is out of date."""
+        if name in self._inputs:
+            return self._inputs[name][1]
+        fingerprint = self.fingerprint(name)
+        held = self._values.get(name)
+        if held is not None and held[0] == fingerprint:
+            return held[1]
+
+        fn, deps, shared, _ = self._nodes[name]
+        compute = lambda: fn(*(self.get(dep) for dep in deps))
+        if shared and self.cache is not None:
+            missing = object()
+            value = self.cache.get(fingerprint, missing)
+            if value is missing:
+                value = compute()
+                self.cache.put(fingerprint, value)
+                self.computed.append(name)
+        else:
+            value = compute()
+            self.computed.append(name)
+        self._values[name] = (fingerprint, value)
+        return value
+
+    def is_current(self, name: str) -> bool:
+        """Whether get(name) would return without computing anything for name."""
+        held = self._values.get(name)
+        return name in self._inputs or (held is not None and held[0] == self.fingerprint(name))
@@ -0,0 +1,173 @@
+"""Hospital dispositions, admissions and census tables.
+
+Tables are built as arrays, with days and then categories on the last two
+axes behind any leading axes (models, ensemble draws), so one call covers
+every model or draw; the DataFrames the charts read are made from them last.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .census import convolve_census
+
+# PPE Values
+PpeRates = namedtuple("PpeRates", ("mild_lower", "mild_upper", "severe_lower", "severe_upper"))
+DEFAULT_PPE = PpeRates(14, 15, 15, 24)
+
+CATEGORIES = ("hosp", "icu", "vent")
+PPE_COLUMNS = ("ppe_mild_d", "ppe_mild_u", "ppe_severe_d", "ppe_severe_u", "ppe_mean_mild", "ppe_mean_severe")
+
+# admits and census are (..., n_days, len(CATEGORIES)), ppe (..., n_days, len(PPE_COLUMNS))
+HospitalTables = namedtuple("HospitalTables", ("admits", "census", "ppe"))
+
+
+def get_dispositions(
+    patient_state: np.ndarray, rates: Tuple[float, ...], regional_hosp_share: float = 1.0
+    ) -> Tuple[np.ndarray, ...]:
+    """Get dispositions of infected adjusted by rate and market_share.
+
+    A rate may be an array with one rate per age band for a patient_state of
+    shape (n_bands, n_days); its dispositions are summed over the bands.
+    """
+    return (*(
+        patient_state * rate * regional_hosp_share if np.ndim(rate) == 0
+        else (patient_state * np.asarray(rate)[:, None]).sum(axis=0) * regional_hosp_share
+        for rate in rates),)
+
+def sum_dispositions(
+    compartments: Tuple[np.ndarray, ...], rates: Tuple[float, ...], regional_hosp_share: float = 1.0
+    ) -> Tuple[np.ndarray, ...]:
+    """Dispositions of everyone ever infected, summed over e.g. (infected, recovered, fatal)."""
+    return tuple(
+        sum(parts) for parts in zip(*(get_dispositions(c, rates, regional_hosp_share) for c in compartments)))
+
+def build_admissions_df(
+    dispositions, n_days: int) -> pd.DataFrame:
+    """Build admissions dataframe from Parameters."""
+    return admissions_frame(build_admissions_array(np.array(dispositions, dtype=float)[:, :n_days + 1]).T)
+
+def admissions_frame(
+    admits: np.ndarray) -> pd.DataFrame:
+    """Admissions table from (n_days, 3) hosp/icu/vent admissions.
+
+    As the table has always had, day 0 (no prior day) and a last day
+    n_days are NaN.
+    """
+    frame = {"day": np.arange(len(admits) + 1)}
+    for k, category in enumerate(CATEGORIES):
+        frame[category] = np.concatenate([[np.nan], admits[1:, k], [np.nan]])
+    return pd.DataFrame(frame)
+
+def build_census_df(
+    projection_admits: pd.DataFrame, lengths_of_stay: Tuple[int, int, int], n_days: int,
+    ppe: PpeRates = DEFAULT_PPE) -> pd.DataFrame:
+    """ALOS for each category of COVID-19 case (total guesses)
+
+    lengths_of_stay are the hosp, icu and vent lengths of stay, each in whole
+    days or as a survival curve from covid_model.census.
+    """
+    census = convolve_census(projection_admits[["hosp", "icu", "vent"]].values.T, lengths_of_stay)
+    return census_frame(projection_admits["day"].values, census, n_days, ppe)
+
+def census_frame(
+    days: np.ndarray, census: Tuple[np.ndarray, np.ndarray, np.ndarray], n_days: int,
+    ppe: PpeRates = DEFAULT_PPE) -> pd.DataFrame:
+    """Census table with PPE needs from hosp, icu and vent census by day."""
+    census = np.stack(census, axis=-1)
+    frame = {"day": days}
+    frame.update(zip(CATEGORIES, census.T))
+    frame.update(zip(PPE_COLUMNS, (census @ ppe_matrix(ppe)).T))
+    census_df = pd.DataFrame(frame)
+    census_df = census_df.head(n_days-10)
+    
+    return census_df
+
+def ppe_matrix(
+    ppe: PpeRates = DEFAULT_PPE) -> np.ndarray:
+    """(3, 6) map from hosp/icu/vent census to the PPE_COLUMNS; PPE for hosp/icu."""
+    return np.array([
+        [ppe.mild_lower, ppe.mild_upper, 0, 0, (ppe.mild_lower + ppe.mild_upper) / 2, 0],
+        [0, 0, ppe.severe_lower, ppe.severe_upper, 0, (ppe.severe_lower + ppe.severe_upper) / 2],
+        [0, 0, 0, 0, 0, 0],
+    ], dtype=float)
+
+def build_hospital_tables(
+    dispositions: np.ndarray, lengths_of_stay: Tuple[Union[int, np.ndarray], ...], ppe: PpeRates = DEFAULT_PPE
+    ) -> HospitalTables:
+    """Admissions, census and PPE from cumulative dispositions of shape (..., 3, n_days+1).
+
+    The leading axes are e.g. models or ensemble draws. Admissions are a
+    difference along days, census window sums (or convolutions for
+    survival curves) and PPE one product with ppe_matrix.
+    """
+    admits = build_admissions_array(np.asarray(dispositions, dtype=float))
+    census = np.swapaxes(convolve_census(admits, lengths_of_stay), -1, -2)
+    return HospitalTables(np.swapaxes(admits, -1, -2), census, census @ ppe_matrix(ppe))
+
+
+# Add dates #
+def add_date_column(
+    df: pd.DataFrame, start_date, drop_day_column: bool = False, date_format: Optional[str] = None,
+    ) -> pd.DataFrame:
+    """Copies input data frame and converts "day" column to "date" column
+
+    Assumes that day=0 is today and allocates dates for each integer day.
+    Day range can must not be continous.
+    Columns will be organized as original frame with difference that date
+    columns come first.
+
+    Arguments:
+        df: The data frame to convert.
+        start_date: The date of day 0.
+        drop_day_column: If true, the returned data frame will not have a day column.
+        date_format: If given, converts date_time objetcts to string format specified.
+
+    Raises:
+        KeyError: if "day" column not in df
+        ValueError: if "day" column is not of type int
+    """
+    if not "day" in df:
+        raise KeyError("Input data frame for converting dates has no 'day column'.")
+    if not pd.api.types.is_integer_dtype(df.day):
+        raise KeyError("Column 'day' for dates converting data frame is not integer.")
+
+    df = df.copy()
+    # Prepare columns for sorting
+    non_date_columns = [col for col in df.columns if not col == "day"]
+
+    # Allocate (day) continous range for dates
+    n_days = int(df.day.max()) if len(df) else 0
+    start = pd.Timestamp(start_date)
+    end = start + timedelta(days=n_days + 1)
+    # And pick dates present in frame
+    dates = pd.date_range(start=start, end=end, freq="D")[df.day.tolist()]
+
+    if date_format is not None:
+        dates = dates.strftime(date_format)
+
+    df["date"] = dates
+
+    if drop_day_column:
+        df.pop("day")
+        date_columns = ["date"]
+    else:
+        date_columns = ["day", "date"]
+
+    # sort columns
+    df = df[date_columns + non_date_columns]
+
+    return df
+
+def build_admissions_array(
+    dispositions: np.ndarray) -> np.ndarray:
+    """Daily admissions from cumulative dispositions along the last axis.
+
+    Array counterpart of build_admissions_df for any leading shape, e.g.
+    (n_draws, n_days+1). Day 0 has no prior day and is reported as 0.
+    """
+    admits = np.zeros(dispositions.shape[:-1] + (dispositions.shape[-1] - 1,))
+    admits[..., 1:] = np.diff(dispositions[..., :-1], axis=-1)
+    return admits
@@ -0,0 +1,151 @@
+"""Runge-Kutta integration of the SEIRD equations with sub-daily steps.
+
+The kernels in covid_model.models take one forward Euler step per day and
+clamp negative compartments to zero, which loses accuracy (and, once
+gamma * 1 day approaches 1, stability) when the infectious period is short.
+Here the same right-hand side is integrated either with classic RK4 at a
+fixed number of steps per day or with the adaptive Dormand-Prince 5(4)
+embedded pair. The daily contact multiplier holds through each day, and
+the output is sampled once a day, as the Euler kernels give it.
+
+Every function takes scalars for one run or arrays of shape (n_scenarios,)
+for a batch; a batch shares its step sizes, chosen for the hardest
+scenario. SEIR is SEIRD without deaths and goes through the same equations.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from .models import sim_seir_decay, sim_seird_decay, sim_seird_decay_batch
+
+
+# "euler" is the original daily step of models.sim_seird_decay
+INTEGRATORS = ("euler", "rk4", "dopri5")
+
+# Dormand-Prince steps (accepted and rejected) allowed in one day before
+# giving up; smooth runs take a handful
+MAX_STEPS_PER_DAY = 10000
+
+# Dormand-Prince 5(4) tableau: stage coefficients, 5th order weights and
+# the difference between the 5th and embedded 4th order weights
+DOPRI_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+)
+DOPRI_B = (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84)
+DOPRI_E = (71 / 57600, 0.0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+
+
+def seird_rhs(
+    y: np.ndarray, beta: np.ndarray, gamma: np.ndarray, alpha: np.ndarray, fatal: np.ndarray) -> np.ndarray:
+    """Time derivative of the (5, n_scenarios) SEIRD state; beta is per person as in `seird`."""
+    s, e, i = y[0], y[1], y[2]
+    exposures = beta * s * i
+    onsets = alpha * e
+    removals = gamma * i
+    return np.stack([-exposures, exposures - onsets, onsets - removals, (1 - fatal) * removals, fatal * removals])
+
+def rk4_day(
+    y: np.ndarray, beta, gamma, alpha, fatal, steps: int) -> np.ndarray:
+    """Advance y one day in steps equal RK4 steps."""
+    h = 1.0 / steps
+    for _ in range(steps):
+        k1 = seird_rhs(y, beta, gamma, alpha, fatal)
+        k2 = seird_rhs(y + 0.5 * h * k1, beta, gamma, alpha, fatal)
+        k3 = seird_rhs(y + 0.5 * h * k2, beta, gamma, alpha, fatal)
+        k4 = seird_rhs(y + h * k3, beta, gamma, alpha, fatal)
+        y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return y
+
+def dopri5_day(
+    y: np.ndarray, beta, gamma, alpha, fatal, h: float, rtol: float, atol: float,
+    max_steps: int = MAX_STEPS_PER_DAY) -> Tuple[np.ndarray, float, int]:
+    """Advance y one day with adaptive Dormand-Prince steps starting from step size h.
+
+    Returns the new state, the step size to start the next day with and
+    the number of steps taken (accepted and rejected). Raises
+    FloatingPointError if the error estimate is not finite (e.g. a period
+    of zero makes a rate infinite) or the day takes more than max_steps.
+    """
+    t, steps = 0.0, 0
+    k1 = seird_rhs(y, beta, gamma, alpha, fatal)
+    while t < 1.0:
+        step = min(h, 1.0 - t)
+        k = [k1]
+        for a in DOPRI_A[1:]:
+            k.append(seird_rhs(y + step * sum(a_j * k_j for a_j, k_j in zip(a, k)), beta, gamma, alpha, fatal))
+        y_new = y + step * sum(b * k_j for b, k_j in zip(DOPRI_B, k))
+        k.append(seird_rhs(y_new, beta, gamma, alpha, fatal))
+        error = step * sum(c * k_j for c, k_j in zip(DOPRI_E, k))
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        # RMS over compartments, worst over scenarios
+        norm = np.sqrt(np.mean(np.square(error / scale), axis=0)).max()
+        if not np.isfinite(norm):
+            raise FloatingPointError("Dormand-Prince error estimate is not finite; are all periods positive?")
+        steps += 1
+        if steps > max_steps:
+            raise FloatingPointError("Dormand-Prince took more than {} steps in one day".format(max_steps))
+        if norm <= 1.0:
+            t += step
+            y, k1 = y_new, k[-1]
+        h = step * min(5.0, max(0.2, 0.9 * norm ** -0.2)) if norm > 0 else step * 5.0
+    return y, h, steps
+
+def sim_seird_ode(
+    s, e, i, r, d, beta, gamma, alpha, n_days: int, contact: np.ndarray, fatal, method: str = "rk4",
+    steps_per_day: int = 4, rtol: float = 1e-6, atol: float = 1e-6
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SEIRD equations with method, sampled once a day.
+
+    Arguments are as for `sim_seird_decay` (scalars) or
+    `sim_seird_decay_batch` (arrays of shape (n_scenarios,) and contact of
+    shape (n_days,) or (n_scenarios, n_days)), and so is the shape of the
+    result. method is one of INTEGRATORS; steps_per_day applies to rk4 and
+    rtol / atol (in people) to dopri5.
+    """
+    batch = np.ndim(contact) == 2 or any(np.ndim(v) > 0 for v in (s, e, i, r, d, beta, gamma, alpha, fatal))
+    if method == "euler":
+        if batch:
+            return sim_seird_decay_batch(s, e, i, r, d, beta, gamma, alpha, n_days, contact, fatal)
+        return sim_seird_decay(s, e, i, r, d, beta, gamma, alpha, n_days, contact, fatal)
+    if method not in INTEGRATORS:
+        raise ValueError("Unknown integrator {!r}, expected one of {}".format(method, INTEGRATORS))
+
+    contact = np.atleast_2d(np.asarray(contact, dtype=float))
+    s, e, i, r, d, beta, gamma, alpha, fatal, _ = (
+        np.array(v, dtype=float) for v in np.broadcast_arrays(
+            s, e, i, r, d, beta, gamma, alpha, fatal, contact[:, 0]))
+    beta_decay = np.ascontiguousarray((beta[:, None] * contact[:, :n_days]).T)
+
+    y = np.stack([s, e, i, r, d])
+    runs = np.empty((n_days + 1,) + y.shape)
+    runs[0] = y
+    h = 1.0 / steps_per_day
+    for day in range(n_days):
+        if method == "rk4":
+            y = rk4_day(y, beta_decay[day], gamma, alpha, fatal, steps_per_day)
+        else:
+            y, h, _ = dopri5_day(y, beta_decay[day], gamma, alpha, fatal, h, rtol, atol)
+        runs[day + 1] = y
+
+    runs = runs.transpose(1, 2, 0)
+    return tuple(runs) if batch else tuple(run[0] for run in runs)
+
+def sim_seir_ode(
+    s, e, i, r, beta, gamma, alpha, n_days: int, contact: np.ndarray, method: str = "rk4",
+    steps_per_day: int = 4, rtol: float = 1e-6, atol: float = 1e-6
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SEIR equations with method, sampled once a day.
+
+    As `sim_seird_ode` with no one dying; "euler" is `sim_seir_decay` for
+    one run.
+    """
+    batch = np.ndim(contact) == 2 or any(np.ndim(v) > 0 for v in (s, e, i, r, beta, gamma, alpha))
+    if method == "euler" and not batch:
+        return sim_seir_decay(s, e, i, r, beta, gamma, alpha, n_days, contact)
+    return sim_seird_ode(
+        s, e, i, r, 0.0, beta, gamma, alpha, n_days, contact, 0.0, method, steps_per_day, rtol, atol)[:4]
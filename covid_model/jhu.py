@@ -0,0 +1,171 @@
+"""JHU CSSE confirmed case time series for US counties, states and the nation.
+
+JHU_TIME_SERIES_URL (an http(s) URL or a local directory) and JHU_CACHE_DIR
+override where the files come from and where the local copies are kept;
+JHU_LOOKUP_URL points at the UID lookup table that supplies populations.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import requests
+
+from .county_store import CountyStore, open_county_store
+from .store import open_store
+
+
+logger = logging.getLogger(__name__)
+
+
+JHU_TIME_SERIES_URL = os.environ.get(
+    "JHU_TIME_SERIES_URL",
+    'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series')
+JHU_CACHE_DIR = os.environ.get("JHU_CACHE_DIR", os.path.join("data", "jhu"))
+JHU_TTL = float(os.environ.get("JHU_TTL", 3600))
+JHU_LOOKUP_URL = os.environ.get(
+    "JHU_LOOKUP_URL",
+    JHU_TIME_SERIES_URL.rstrip('/').rsplit('/', 1)[0] + '/UID_ISO_FIPS_LookUp_Table.csv')
+
+CONFIRMED_US_URL = JHU_TIME_SERIES_URL.rstrip('/') + '/time_series_covid19_confirmed_US.csv'
+
+# One consistent, fully processed version of the case data; checked_at is the
+# UTC time of the last successful revalidation of the source file
+CaseData = namedtuple("CaseData", ("counties", "result", "checked_at"))
+
+
+def confirmed_us() -> pd.DataFrame:
+    """The US county file, from the local copy when there is one."""
+    return open_store(CONFIRMED_US_URL, JHU_CACHE_DIR, JHU_TTL).frame()
+
+def populations() -> Optional[pd.Series]:
+    """Population by JHU UID, or None if the lookup table is unavailable."""
+    try:
+        lookup = open_store(JHU_LOOKUP_URL, JHU_CACHE_DIR, JHU_TTL).frame()
+    except (requests.RequestException, OSError) as error:
+        logger.warning("No population lookup table (%s); county populations are unknown", error)
+        return None
+    return lookup.set_index("UID")["Population"]
+
+def county_store() -> CountyStore:
+    """Memory-mapped county store for the current US county file.
+
+    It is rebuilt only when a new version of the file has been downloaded.
+    """
+    source = open_store(CONFIRMED_US_URL, JHU_CACHE_DIR, JHU_TTL)
+    return open_county_store(
+        os.path.join(JHU_CACHE_DIR, "counties"), source.version(), source.frame, populations)
+
+
+def confirmed_cases_frame(
+    store: CountyStore, start: Optional[datetime] = datetime(2020, 3, 1),
+    end: Optional[datetime] = None) -> pd.DataFrame:
+    """Percent of each region's population confirmed, by day from start to end.
+
+    The US, New York and Erie County series are read from the county store's
+    national and state rollups and county index; end=None runs to the latest
+    day in the data.
+    """
+    window = store.window(start, end)
+    result = pd.DataFrame({
+        'Date': store.dates[window],
+        'US': store.national()[window],
+        'NY': store.state('New York')[window],
+        'Erie': store.county_by_name('New York', 'Erie')[window],
+    })
+    result['day'] = np.arange(len(result))
+    result['US']=(result['US']/328000000)*100
+    result['NY']=(result['NY']/19450000)*100
+    result['Erie']=(result['Erie']/1500000)*100
+
+    return result
+
+
+class CaseDataRefresher:
+    """Keeps a processed CaseData snapshot current from a background thread.
+
+    Downloading, building the county store and the confirmed cases frame all
+    happen in the thread; a new snapshot is published by replacing one
+    reference, so a session sees either the old version or the new one,
+    never a mix. Only the very first snapshot is built on the request path.
+    """
+
+    def __init__(self, interval: float = JHU_TTL):
+        self.interval = interval
+        self._snapshot = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _build(self) -> CaseData:
+        source = open_store(CONFIRMED_US_URL, JHU_CACHE_DIR, JHU_TTL)
+        self._version = source.version()
+        counties = county_store()
+        return CaseData(counties, confirmed_cases_frame(counties), _checked_at(source.checked_at()))
+
+    def refresh(self) -> CaseData:
+        """Revalidate the US county file now and publish a new snapshot if it changed."""
+        with self._lock:
+            source = open_store(CONFIRMED_US_URL, JHU_CACHE_DIR, JHU_TTL)
+            source.refresh()
+            # The copy can also change under us, e.g. through the store's own
+            # revalidation, so compare versions rather than trusting refresh()
+            if self._snapshot is None or source.version() != self._version:
+                self._snapshot = self._build()
+            else:
+                self._snapshot = self._snapshot._replace(checked_at=_checked_at(source.checked_at()))
+            return self._snapshot
+
+    def _delay(self) -> float:
+        """Seconds until the current snapshot is due for revalidation."""
+        checked_at = self._snapshot.checked_at if self._snapshot is not None else None
+        if checked_at is None:
+            return 0.0
+        age = time.time() - checked_at.timestamp()
+        return min(max(self.interval - age, 0.0), self.interval)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._delay()):
+            try:
+                self.refresh()
+            except Exception:
+                logger.warning("Refreshing case data failed", exc_info=True)
+                self._stop.wait(min(self.interval, 60.0))
+
+    def start(self) -> None:
+        """Start the background thread unless it is already running."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="case-data-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> CaseData:
+        """The current snapshot, built from the local copy if there is none yet."""
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build()
+        self.start()
+        return self._snapshot
+
+def _checked_at(
+    epoch_seconds: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc) if epoch_seconds is not None else None
+
+_refresher = CaseDataRefresher()
+
+def case_data() -> CaseData:
+    """The process-wide case data snapshot, kept current in the background."""
+    return _refresher.snapshot()
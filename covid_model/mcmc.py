@@ -0,0 +1,145 @@
+"""Posterior samples of the step-wise SEIRD model's parameters given reported cases.
+
+The sampler is the affine-invariant ensemble "stretch move" of Goodman and
+Weare (2010) in its parallel form: the walkers are split in two halves and
+each half moves using the other, so each half-step scores all of its
+walkers in one call of the log posterior. That call is a single
+sim_seird_decay_batch run, not a loop over sim_seird_decay.
+
+The sampled parameters are the doubling time, the levels of the phases the
+reports cover (see calibration.fitted_phases), the reporting fraction and
+the scale of the log-normal error on cumulative cases, under flat priors
+within the calibration bounds. Cumulative cases carry no information on the
+fatality or hospitalization rates, so those keep their prior distributions.
+"""
+from collections import namedtuple
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .calibration import (
+    DOUBLING_TIME_BOUNDS, FIT_DAYS, REDUCTION_BOUNDS, REPORTING_BOUNDS, calibrate, simulate_reported)
+from .schedule import InterventionSchedule
+
+
+SIGMA_BOUNDS = (1e-3, 2.0)
+
+# samples is (n_steps, n_walkers, len(names)) in the units of names;
+# phases are the indices of the schedule phases sampled as reduction_<k>.
+Chain = namedtuple("Chain", ("names", "samples", "log_prob", "acceptance", "schedule", "phases"))
+
+
+def stretch_sampler(
+    log_prob: Callable[[np.ndarray], np.ndarray], walkers: np.ndarray, n_steps: int, a: float = 2.0,
+    seed: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Affine-invariant ensemble MCMC with a batched log density.
+
+    log_prob maps an (m, n_dim) array of points to their (m,) log
+    densities. walkers is the (n_walkers, n_dim) starting ensemble. Returns
+    the chain (n_steps, n_walkers, n_dim), its log densities and the
+    fraction of proposals accepted.
+    """
+    rng = np.random.default_rng(seed)
+    walkers = np.array(walkers, dtype=float)
+    n_walkers, n_dim = walkers.shape
+    current = log_prob(walkers)
+    chain = np.empty((n_steps, n_walkers, n_dim))
+    log_probs = np.empty((n_steps, n_walkers))
+    halves = (np.arange(n_walkers // 2), np.arange(n_walkers // 2, n_walkers))
+    accepted = 0
+    for step in range(n_steps):
+        for moving, other in (halves, halves[::-1]):
+            # Stretch factors z with density proportional to 1/sqrt(z) on [1/a, a]
+            z = ((a - 1) * rng.random(len(moving)) + 1) ** 2 / a
+            partners = walkers[rng.choice(other, len(moving))]
+            proposal = partners + z[:, None] * (walkers[moving] - partners)
+            proposed = log_prob(proposal)
+            with np.errstate(invalid="ignore"):
+                accept = np.log(rng.random(len(moving))) < (n_dim - 1) * np.log(z) + proposed - current[moving]
+            walkers[moving[accept]] = proposal[accept]
+            current[moving[accept]] = proposed[accept]
+            accepted += int(accept.sum())
+        chain[step] = walkers
+        log_probs[step] = current
+    return chain, log_probs, accepted / (n_steps * n_walkers)
+
+def sample_posterior(
+    series: np.ndarray, dates: np.ndarray, start_date, population: float, schedule: InterventionSchedule,
+    incubation_period: float, infectious_period: float, fatal: float, fit_days: Optional[int] = FIT_DAYS,
+    n_walkers: int = 128, n_steps: int = 500, seed: int = 0) -> Chain:
+    """Sample the parameters of schedule's model given cumulative cases on dates.
+
+    The walkers start in a small ball around the calibrate() fit. The
+    arguments are as for calibrate; n_walkers * n_steps is the number of
+    model evaluations.
+    """
+    fit = calibrate(
+        series, dates, start_date, population, schedule, incubation_period, infectious_period, fatal, fit_days)
+    days, observed = fit.fit["day"].values, fit.fit["observed"].values
+    phases = fit.phases
+    levels = np.array([phase.reduction for phase in schedule.phases])
+
+    # Sampled coordinates: log doubling time, levels, log reporting fraction, log sigma
+    lower = np.array([np.log(DOUBLING_TIME_BOUNDS[0])] + [REDUCTION_BOUNDS[0]] * len(phases)
+                     + [np.log(REPORTING_BOUNDS[0]), np.log(SIGMA_BOUNDS[0])])
+    upper = np.array([np.log(DOUBLING_TIME_BOUNDS[1])] + [REDUCTION_BOUNDS[1]] * len(phases)
+                     + [np.log(REPORTING_BOUNDS[1]), np.log(SIGMA_BOUNDS[1])])
+    log_observed = np.log(observed)
+
+    def log_prob(points: np.ndarray) -> np.ndarray:
+        result = np.full(len(points), -np.inf)
+        inside = np.all((points >= lower) & (points <= upper), axis=1)
+        if not inside.any():
+            return result
+        points = points[inside]
+        reductions = np.repeat(levels[None, :], len(points), axis=0)
+        reductions[:, list(phases)] = points[:, 1:1 + len(phases)]
+        infected_total = simulate_reported(
+            population, np.exp(points[:, 0]), reductions, schedule, incubation_period, infectious_period, fatal,
+            days)
+        log_sigma = points[:, -1]
+        residuals = log_observed - np.log(np.maximum(infected_total, 1e-12)) - points[:, -2, None]
+        result[inside] = (
+            -len(days) * log_sigma - 0.5 * np.square(residuals).sum(axis=1) / np.exp(2 * log_sigma))
+        return result
+
+    start = np.concatenate([
+        [np.log(fit.doubling_time)], fit.reductions[list(phases)],
+        [np.log(fit.reporting_fraction), np.log(max(np.sqrt(fit.loss), SIGMA_BOUNDS[0] * 10))]])
+    rng = np.random.default_rng(seed)
+    walkers = np.clip(start + 1e-3 * rng.standard_normal((n_walkers, len(start))), lower, upper)
+    chain, log_probs, acceptance = stretch_sampler(log_prob, walkers, n_steps, seed=seed)
+
+    samples = chain.copy()
+    samples[..., 0] = np.exp(chain[..., 0])
+    samples[..., -2:] = np.exp(chain[..., -2:])
+    names = (("doubling_time",) + tuple("reduction_{}".format(k) for k in phases)
+             + ("reporting_fraction", "sigma"))
+    return Chain(names, samples, log_probs, acceptance, schedule, phases)
+
+def posterior_draws(
+    chain: Chain, n_draws: int, burn: float = 0.5, seed: Optional[int] = None
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """n_draws samples from the chain after discarding the first burn fraction of steps.
+
+    Returns the sampled parameters by name and the (n_draws, n_phases)
+    reductions for every phase of chain.schedule, the unsampled ones at
+    their schedule level.
+    """
+    kept = chain.samples[int(burn * len(chain.samples)):].reshape(-1, len(chain.names))
+    rng = np.random.default_rng(seed)
+    picked = kept[rng.integers(len(kept), size=n_draws)]
+    draws = dict(zip(chain.names, picked.T))
+    reductions = np.repeat(
+        np.array([[phase.reduction for phase in chain.schedule.phases]]), n_draws, axis=0)
+    for k in chain.phases:
+        reductions[:, k] = draws["reduction_{}".format(k)]
+    return draws, reductions
+
+def credible_intervals(
+    samples: Dict[str, np.ndarray], percentiles: Sequence[float] = (2.5, 50, 97.5)) -> pd.DataFrame:
+    """Percentiles of each sampled parameter, one row per parameter."""
+    return pd.DataFrame(
+        {"p{:g}".format(p): [np.percentile(values, p) for values in samples.values()] for p in percentiles},
+        index=pd.Index(list(samples), name="parameter"))
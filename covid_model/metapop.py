@@ -0,0 +1,248 @@
+"""Metapopulation SEIRD over every US county, coupled by a mobility matrix.
+
+Each county is a patch with its own SEIRD compartments. Residents of patch i
+make a share M[i, j] of their contacts in patch j (rows of M sum to one), so
+the force of infection on them is
+
+    beta * contact * sum_j M[i, j] * (M.T @ I)[j] / (M.T @ N)[j]
+
+with M.T @ I and M.T @ N the infected and the people present in each patch.
+M is sparse (the home county plus a few neighbours), which makes a day two
+sparse matrix-vector products plus the usual SEIRD update over arrays, and a
+200-day run over ~3,200 counties a fraction of a second. Results roll up to
+states and the nation through a sparse aggregation matrix.
+
+SparseMatrix is a minimal compressed-sparse-row matrix on NumPy alone.
+Mobility comes from a commuting flow table (mobility_from_flows) or, without
+one, from a gravity model over county centroids (gravity_mobility).
+"""
+from collections import namedtuple
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .models import seird_coupled
+
+# One row per patch and one column per day 0..n_days for s, e, i, r and d;
+# rows are the CountyStore rows of the patches and state their state names.
+MetapopRun = namedtuple("MetapopRun", ("rows", "state", "s", "e", "i", "r", "d"))
+
+# Share of infections reported as confirmed cases, for seeding the counties
+REPORTING_FRACTION = 0.2
+
+
+class SparseMatrix:
+    """Compressed sparse row matrix with the products the engine needs."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape: Tuple[int, int]):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=float)
+        self.shape = (int(shape[0]), int(shape[1]))
+        self._nonempty = self.indptr[:-1] < self.indptr[1:]
+        self._starts = self.indptr[:-1][self._nonempty]
+
+    @classmethod
+    def from_triplets(
+        cls, rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: Tuple[int, int]) -> "SparseMatrix":
+        """Build from (row, column, value) entries; duplicate entries are summed."""
+        rows, cols, values = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64), np.asarray(values)
+        order = np.lexsort((cols, rows))
+        rows, cols, values = rows[order], cols[order], values[order].astype(float)
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        values = np.bincount(np.cumsum(first) - 1, weights=values) if len(rows) else values
+        rows, cols = rows[first], cols[first]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=shape[0]))])
+        return cls(indptr, cols, values, shape)
+
+    @property
+    def nnz(self) -> int:
+        return self.data.size
+
+    def row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def transpose(self) -> "SparseMatrix":
+        return SparseMatrix.from_triplets(self.indices, self.row_ids(), self.data, self.shape[::-1])
+
+    def dot(self, x: np.ndarray) -> np.ndarray:
+        """self @ x for x of shape (n_cols,) or (n_cols, k)."""
+        x = np.asarray(x, dtype=float)
+        out = np.zeros((self.shape[0],) + x.shape[1:])
+        if self.nnz:
+            products = self.data.reshape((-1,) + (1,) * (x.ndim - 1)) * x[self.indices]
+            out[self._nonempty] = np.add.reduceat(products, self._starts, axis=0)
+        return out
+
+    def row_sums(self) -> np.ndarray:
+        return self.dot(np.ones(self.shape[1]))
+
+def mobility_from_flows(
+    n_patches: int, origins: np.ndarray, destinations: np.ndarray, flows: np.ndarray) -> SparseMatrix:
+    """Row-normalized mobility from commuting counts between patches.
+
+    origins and destinations are patch indexes (home and work) and flows the
+    number of commuters; flows within a patch should be included, as they
+    are in the Census county-to-county commuting tables. Patches without
+    any flow keep all their contacts at home.
+    """
+    origins, destinations, flows = (np.asarray(a) for a in (origins, destinations, flows))
+    totals = np.bincount(origins, weights=flows, minlength=n_patches)
+    alone = np.flatnonzero(totals <= 0)
+    return SparseMatrix.from_triplets(
+        np.concatenate([origins, alone]), np.concatenate([destinations, alone]),
+        np.concatenate([flows / np.maximum(totals[origins], 1e-300), np.ones(len(alone))]),
+        (n_patches, n_patches))
+
+def gravity_mobility(
+    lat: np.ndarray, lon: np.ndarray, population: np.ndarray, neighbours: int = 8, travel: float = 0.05,
+    exponent: float = 2.0, chunk: int = 512) -> SparseMatrix:
+    """Mobility from a gravity model over patch centroids.
+
+    Each patch keeps 1 - travel of its contacts at home and spreads travel
+    over its nearest neighbours in proportion to population / distance **
+    exponent. Patches without coordinates keep every contact at home.
+    """
+    lat, lon, population = (np.asarray(a, dtype=float) for a in (lat, lon, population))
+    n = len(lat)
+    located = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    k = min(neighbours, len(located) - 1)
+    rows, cols, values = [np.arange(n)], [np.arange(n)], [np.where(np.isin(np.arange(n), located), 1 - travel, 1.0)]
+    if k > 0:
+        phi, lam = np.radians(lat[located]), np.radians(lon[located])
+        for start in range(0, len(located), chunk):
+            block = slice(start, start + chunk)
+            # Haversine distance (km) from the block's patches to every located patch
+            a = (np.sin((phi[block, None] - phi[None, :]) / 2) ** 2
+                 + np.cos(phi[block, None]) * np.cos(phi[None, :]) * np.sin((lam[block, None] - lam[None, :]) / 2) ** 2)
+            distance = 2 * 6371.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+            distance[np.arange(distance.shape[0]), np.arange(start, start + distance.shape[0])] = np.inf
+            nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+            near_distance = np.maximum(np.take_along_axis(distance, nearest, axis=1), 1.0)
+            weight = population[located][nearest] / near_distance ** exponent
+            weight = travel * weight / np.maximum(weight.sum(axis=1, keepdims=True), 1e-300)
+            rows.append(np.repeat(located[block], k))
+            cols.append(located[nearest].ravel())
+            values.append(weight.ravel())
+    return SparseMatrix.from_triplets(np.concatenate(rows), np.concatenate(cols), np.concatenate(values), (n, n))
+
+def aggregation(
+    groups: Sequence, names: Optional[Sequence] = None) -> Tuple[SparseMatrix, list]:
+    """(n_groups, n_patches) 0/1 matrix summing patches by group, and the group names."""
+    names, codes = np.unique(np.asarray(groups), return_inverse=True) if names is None else (
+        np.asarray(names), np.searchsorted(np.asarray(names), np.asarray(groups)))
+    return SparseMatrix.from_triplets(codes, np.arange(len(codes)), np.ones(len(codes)), (len(names), len(codes))), \
+        names.tolist()
+
+def sim_seird_metapop(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, beta: Union[float, np.ndarray],
+    gamma: float, alpha: float, n_days: int, contact: np.ndarray, fatal: float, mobility: SparseMatrix
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate every patch forward together.
+
+    s..d are (n_patches,) with positive totals; beta is the per-capita
+    contact rate (e.g. seir_beta with population 1), a scalar or per patch;
+    contact is (n_days,) or (n_patches, n_days). Returns five arrays of
+    shape (n_patches, n_days+1).
+    """
+    s, e, i, r, d = (np.array(v, dtype=float) for v in (s, e, i, r, d))
+    n = s + e + i + r + d
+    contact = np.asarray(contact, dtype=float)
+    contact = np.broadcast_to(contact if contact.ndim == 2 else contact[None, :], (len(s), contact.shape[-1]))
+    beta_decay = np.ascontiguousarray((np.asarray(beta, dtype=float)[..., None] * contact[:, :n_days]).T)
+    arriving = mobility.transpose()
+    present = np.maximum(arriving.dot(n), 1e-300)
+
+    s_v, e_v, i_v, r_v, d_v = (np.empty((n_days + 1, len(s))) for _ in range(5))
+    s_v[0], e_v[0], i_v[0], r_v[0], d_v[0] = s, e, i, r, d
+    for day in range(n_days):
+        force = beta_decay[day] * mobility.dot(arriving.dot(i) / present)
+        s, e, i, r, d = seird_coupled(s, e, i, r, d, force, gamma, alpha, n, fatal)
+        s_v[day + 1] = s
+        e_v[day + 1] = e
+        i_v[day + 1] = i
+        r_v[day + 1] = r
+        d_v[day + 1] = d
+
+    return s_v.T, e_v.T, i_v.T, r_v.T, d_v.T
+
+def seed_from_cases(
+    store, rows: np.ndarray, date, reporting_fraction: float, infectious_period: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(exposed, infected, recovered, population) per patch from cases reported through date.
+
+    Cases reported within the last infectious period are taken as infected,
+    earlier ones as recovered, each scaled up by the reporting fraction, and
+    as many people again as infected are taken to be exposed.
+    """
+    last = store.window(None, date).stop - 1
+    recent = max(last - int(round(infectious_period)), -1)
+    cases = np.asarray(store.cases[rows], dtype=float)
+    through = cases[:, last] if last >= 0 else np.zeros(len(rows))
+    before = cases[:, recent] if recent >= 0 else np.zeros(len(rows))
+    population = np.asarray(store.population_of[rows], dtype=float)
+    infected = np.maximum(through - before, 0.0) / reporting_fraction
+    recovered = before / reporting_fraction
+    exposed = infected.copy()
+    # Never more people in E, I and R than live in the patch
+    scale = np.minimum(1.0, 0.5 * population / np.maximum(exposed + infected + recovered, 1e-300))
+    return exposed * scale, infected * scale, recovered * scale, population
+
+def county_rows(
+    store) -> np.ndarray:
+    """Store rows simulated as patches: the counties with a known population."""
+    return np.flatnonzero(store.is_county() & (np.nan_to_num(store.population_of) > 0))
+
+def county_mobility(
+    store, **kwargs) -> SparseMatrix:
+    """gravity_mobility between the county_rows of a store; kwargs as for gravity_mobility."""
+    rows = county_rows(store)
+    return gravity_mobility(store.lat[rows], store.lon[rows], store.population_of[rows], **kwargs)
+
+def county_metapop(
+    store, start_date, beta: float, gamma: float, alpha: float, n_days: int, contact: np.ndarray, fatal: float,
+    mobility: Optional[SparseMatrix] = None, reporting_fraction: float = REPORTING_FRACTION) -> MetapopRun:
+    """Every county of a CountyStore with a known population, seeded from its cases on start_date.
+
+    beta is per capita; without mobility the counties are coupled by
+    county_mobility. A start_date before any reported case seeds 100 exposed
+    and 50 infected people, as the single-location SEIRD model does, in the
+    county that reported first.
+    """
+    rows = county_rows(store)
+    exposed, infected, recovered, population = seed_from_cases(
+        store, rows, start_date, reporting_fraction, 1 / gamma)
+    if not (exposed + infected + recovered).any():
+        cases = np.asarray(store.cases[rows])
+        reported = cases.any(axis=0)
+        if reported.any():
+            first = np.argmax(cases[:, np.argmax(reported)])
+            exposed[first], infected[first] = min(100.0, population[first] / 4), min(50.0, population[first] / 4)
+    if mobility is None:
+        mobility = county_mobility(store)
+    s_v, e_v, i_v, r_v, d_v = sim_seird_metapop(
+        population - exposed - infected - recovered, exposed, infected, recovered, np.zeros(len(rows)),
+        beta, gamma, alpha, n_days, contact, fatal, mobility)
+    return MetapopRun(rows, np.asarray(store.state_of)[rows], s_v, e_v, i_v, r_v, d_v)
+
+def rollup(
+    run: MetapopRun, groups: Optional[Sequence] = None) -> Tuple[list, Tuple[np.ndarray, ...]]:
+    """Group names and summed (s, e, i, r, d), each (n_groups, n_days+1); by state by default."""
+    matrix, names = aggregation(run.state if groups is None else groups)
+    return names, tuple(matrix.dot(compartment) for compartment in (run.s, run.e, run.i, run.r, run.d))
+
+def location_totals(
+    run: MetapopRun, rows: np.ndarray, population: Optional[float] = None) -> Tuple[np.ndarray, ...]:
+    """(s, e, i, r, d) summed over the patches among the given store rows.
+
+    With population, the sums are rescaled to that many people, so a
+    location's own population figure overrides its counties' census total.
+    """
+    selected = np.isin(run.rows, rows)
+    totals = tuple(compartment[selected].sum(axis=0) for compartment in (run.s, run.e, run.i, run.r, run.d))
+    if population is None:
+        return totals
+    counted = sum(compartment[0] for compartment in totals)
+    scale = population / counted if counted > 0 else 0.0
+    return tuple(compartment * scale for compartment in totals)
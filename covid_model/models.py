@@ -0,0 +1,567 @@
+"""Compartmental models, one time step and simulated forward in time.
+
+Every function here takes all of its inputs as arguments, so the models can
+run outside Streamlit and from several threads or processes at once.
+"""
+from typing import Generator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def sir(
+    s: float, i: float, r: float, beta: float, gamma: float, n: float
+    ) -> Tuple[float, float, float]:
+    """The SIR model, one time step."""
+    s_n = (-beta * s * i) + s
+    i_n = (beta * s * i - gamma * i) + i
+    r_n = gamma * i + r
+    if s_n < 0.0:
+        s_n = 0.0
+    if i_n < 0.0:
+        i_n = 0.0
+    if r_n < 0.0:
+        r_n = 0.0
+
+    scale = n / (s_n + i_n + r_n)
+    return s_n * scale, i_n * scale, r_n * scale
+    
+def gen_sir(
+    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
+    ) -> Generator[Tuple[float, float, float], None, None]:
+    """Simulate SIR model forward in time yielding tuples."""
+    s, i, r = (float(v) for v in (s, i, r))
+    n = s + i + r
+    for _ in range(n_days + 1):
+        yield s, i, r
+        s, i, r = sir(s, i, r, beta, gamma, n)
+
+def sim_sir(
+    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time."""
+    s, i, r = (float(v) for v in (s, i, r))
+    n = s + i + r
+    s_v, i_v, r_v = [s], [i], [r]
+    for day in range(n_days):
+        s, i, r = sir(s, i, r, beta, gamma, n)
+        s_v.append(s)
+        i_v.append(i)
+        r_v.append(r)
+
+    return (
+        np.array(s_v),
+        np.array(i_v),
+        np.array(r_v),
+    )
+    
+def sim_sir_df(
+    s: float, i: float, r: float, beta: float, gamma: float, n_days: int
+    ) -> pd.DataFrame:
+    """Simulate the SIR model forward in time."""
+    return pd.DataFrame(
+        data=gen_sir(s, i, r, beta, gamma, n_days),
+        columns=("Susceptible", "Infected", "Recovered"),
+    )
+
+def seir(
+    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n: float
+    ) -> Tuple[float, float, float, float]:
+    """The SIR model, one time step."""
+    s_n = (-beta * s * i) + s
+    e_n = (beta * s * i) - alpha * e + e
+    i_n = (alpha * e - gamma * i) + i
+    r_n = gamma * i + r
+    if s_n < 0.0:
+        s_n = 0.0
+    if e_n < 0.0:
+        e_n = 0.0
+    if i_n < 0.0:
+        i_n = 0.0
+    if r_n < 0.0:
+        r_n = 0.0
+
+    scale = n / (s_n + e_n+ i_n + r_n)
+    return s_n * scale, e_n * scale, i_n * scale, r_n * scale
+
+def sim_seir(
+    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time."""
+    s, e, i, r = (float(v) for v in (s, e, i, r))
+    n = s + e + i + r
+    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
+    for day in range(n_days):
+        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
+        s_v.append(s)
+        e_v.append(e)
+        i_v.append(i)
+        r_v.append(r)
+
+    return (
+        np.array(s_v),
+        np.array(e_v),
+        np.array(i_v),
+        np.array(r_v),
+    )
+
+def gen_seir(
+    s: float, e: float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int
+    ) -> Generator[Tuple[float, float, float, float], None, None]:
+    """Simulate SIR model forward in time yielding tuples."""
+    s, e, i, r = (float(v) for v in (s, e, i, r))
+    n = s + e + i + r
+    for _ in range(n_days + 1):
+        yield s, e, i, r
+        s, e, i, r = seir(s, e, i, r, beta, gamma, alpha, n)
+# phase-adjusted https://www.nature.com/articles/s41421-020-0148-0     
+   
+def sim_seir_decay(
+    s: float, e:float, i: float, r: float, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time.
+
+    contact is the daily contact multiplier from InterventionSchedule.contact_multipliers.
+    """
+    s, e, i, r = (float(v) for v in (s, e, i, r))
+    n = s + e + i + r
+    s_v, e_v, i_v, r_v = [s], [e], [i], [r]
+    for day in range(n_days):
+        s, e, i, r = seir(s, e, i, r, beta*contact[day], gamma, alpha, n)
+        s_v.append(s)
+        e_v.append(e)
+        i_v.append(i)
+        r_v.append(r)
+
+    return (
+        np.array(s_v),
+        np.array(e_v),
+        np.array(i_v),
+        np.array(r_v),
+    )
+# https://www.ncbi.nlm.nih.gov/pmc/articles/PMC4552173/
+
+def seird(
+    s: float, e: float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float
+    ) -> Tuple[float, float, float, float]:
+    """The SIR model, one time step."""
+    s_n = (-beta * s * i) + s
+    e_n = (beta * s * i) - alpha * e + e
+    i_n = (alpha * e - gamma * i) + i
+    r_n = (1-fatal)*gamma * i + r
+    d_n = (fatal)*gamma * i +d
+    if s_n < 0.0:
+        s_n = 0.0
+    if e_n < 0.0:
+        e_n = 0.0
+    if i_n < 0.0:
+        i_n = 0.0
+    if r_n < 0.0:
+        r_n = 0.0
+    if d_n < 0.0:
+        d_n = 0.0
+
+    scale = n / (s_n + e_n+ i_n + r_n + d_n)
+    return s_n * scale, e_n * scale, i_n * scale, r_n * scale, d_n * scale
+
+def sim_seird_decay(
+    s: float, e:float, i: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray, fatal: float, n: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time.
+
+    contact is the daily contact multiplier from InterventionSchedule.contact_multipliers.
+    n is the total the compartments are kept at, s+e+i+r+d by default; pass
+    the original run's total when resuming it from a saved state.
+    """
+    s, e, i, r, d= (float(v) for v in (s, e, i, r, d))
+    if n is None:
+        n = s + e + i + r + d
+    s_v, e_v, i_v, r_v, d_v = [s], [e], [i], [r], [d]
+    for day in range(n_days):
+        s, e, i, r,d = seird(s, e, i, r, d, beta*contact[day], gamma, alpha, n, fatal)
+        s_v.append(s)
+        e_v.append(e)
+        i_v.append(i)
+        r_v.append(r)
+        d_v.append(d)
+
+    return (
+        np.array(s_v),
+        np.array(e_v),
+        np.array(i_v),
+        np.array(r_v),
+        np.array(d_v)
+    )
+
+def seird_batch(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+    alpha: np.ndarray, n: np.ndarray, fatal: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The SEIRD model, one time step, for every scenario at once.
+
+    Same update as `seird`, with each argument an array of shape (n_scenarios,).
+    """
+    return seird_update(s, e, i, r, d, beta * s * i, alpha * e, gamma, n, fatal)[:5]
+
+def seird_update(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, exposures: np.ndarray,
+    onsets: np.ndarray, gamma, n: np.ndarray, fatal, excess=0.0
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The SEIRD update shared by the array kernels, given the step's new exposures and onsets.
+
+    excess are deaths among the infectious on top of fatal. Compartments are
+    clamped at zero and rescaled to n, as `seird` does; returns them and
+    the factor they were rescaled by.
+    """
+    s_n = -exposures + s
+    e_n = exposures - onsets + e
+    i_n = (onsets - gamma * i) + i - excess
+    r_n = (1-fatal)*gamma * i + r
+    d_n = (fatal)*gamma * i +d + excess
+    s_n = np.maximum(s_n, 0.0)
+    e_n = np.maximum(e_n, 0.0)
+    i_n = np.maximum(i_n, 0.0)
+    r_n = np.maximum(r_n, 0.0)
+    d_n = np.maximum(d_n, 0.0)
+
+    scale = n / (s_n + e_n+ i_n + r_n + d_n)
+    return s_n * scale, e_n * scale, i_n * scale, r_n * scale, d_n * scale, scale
+
+def seird_coupled(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, force: np.ndarray, gamma: float,
+    alpha: float, n: np.ndarray, fatal: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The SEIRD model, one time step, for every patch of a metapopulation.
+
+    Same update as `seird_batch` with the new exposures beta * s * i replaced
+    by force * s, force being each patch's per-capita force of infection.
+    """
+    return seird_update(s, e, i, r, d, force * s, alpha * e, gamma, n, fatal)[:5]
+
+def sim_seird_decay_batch(
+    s, e, i, r, d, beta, gamma, alpha, n_days: int, contact: np.ndarray, fatal
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate many SEIRD scenarios forward in time together.
+
+    Every argument except n_days and contact may be a scalar or an array of
+    shape (n_scenarios,); scalars are shared by all scenarios.  contact is a
+    daily contact multiplier of shape (n_days,) or (n_scenarios, n_days).
+    Returns five arrays of shape (n_scenarios, n_days+1) matching
+    `sim_seird_decay` row by row.
+    """
+    contact = np.atleast_2d(np.asarray(contact, dtype=float))
+    s, e, i, r, d, beta, gamma, alpha, fatal, _ = (
+        np.array(v, dtype=float) for v in np.broadcast_arrays(
+            s, e, i, r, d, beta, gamma, alpha, fatal, contact[:, 0]))
+    n = s + e + i + r + d
+
+    # Contact rate for each day and scenario
+    beta_decay = np.ascontiguousarray((beta[:, None] * contact[:, :n_days]).T)
+
+    # Day-major storage keeps each step's writes contiguous
+    s_v, e_v, i_v, r_v, d_v = (np.empty((n_days + 1, s.shape[0])) for _ in range(5))
+    s_v[0], e_v[0], i_v[0], r_v[0], d_v[0] = s, e, i, r, d
+    for day in range(n_days):
+        s, e, i, r, d = seird_batch(s, e, i, r, d, beta_decay[day], gamma, alpha, n, fatal)
+        s_v[day + 1] = s
+        e_v[day + 1] = e
+        i_v[day + 1] = i
+        r_v[day + 1] = r
+        d_v[day + 1] = d
+
+    return s_v.T, e_v.T, i_v.T, r_v.T, d_v.T
+
+def seird_capacity(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, beds: np.ndarray, beta: np.ndarray,
+    gamma: np.ndarray, alpha: np.ndarray, n: np.ndarray, fatal: np.ndarray, rates: np.ndarray, discharge: np.ndarray,
+    capacity: np.ndarray, excess_fatal: np.ndarray
+    ) -> Tuple[np.ndarray, ...]:
+    """The SEIRD model, one time step, filling hospital and ICU beds within the step.
+
+    Same update as `seird_batch`; beds, rates, discharge (1 / LOS), capacity
+    and excess_fatal are (2, n_scenarios) for hospital and ICU. Each day's
+    onsets need beds at the rates and are admitted while beds are free;
+    the rest die at excess_fatal on top of fatal, all scenarios at once.
+    Also returns the occupied beds, the admissions and the excess deaths of
+    the step.
+    """
+    onsets = alpha * e
+    occupied = beds * (1 - discharge)
+    need = rates * onsets
+    admitted = np.minimum(need, np.maximum(capacity - occupied, 0.0))
+    denied = need - admitted
+    # ICU patients are among the hospital ones, so each patient without a bed
+    # is counted once: at the ICU fatality if denied ICU, else the ward one
+    denied_ward = np.maximum(np.minimum(denied[0] - denied[1], need[0] - need[1]), 0.0)
+    excess = np.minimum(excess_fatal[1] * denied[1] + excess_fatal[0] * denied_ward, onsets)
+    *state, scale = seird_update(s, e, i, r, d, beta * s * i, onsets, gamma, n, fatal, excess)
+    return (*state, occupied + admitted, admitted, excess * scale)
+
+def sim_seird_decay_capacity(
+    s, e, i, r, d, beta, gamma, alpha, n_days: int, contact: np.ndarray, fatal, rates: Tuple, lengths_of_stay: Tuple,
+    capacity: np.ndarray, fatal_hosp, overflow_fatal: Tuple
+    ) -> Tuple[np.ndarray, ...]:
+    """Simulate SEIRD with limited hospital and ICU beds and overflow mortality.
+
+    Arguments are as for `sim_seird_decay_batch`, plus hospital and ICU
+    pairs: rates of onsets needing a bed, mean lengths of stay (days) and
+    overflow_fatal, the fatality of patients who find no bed, in place of
+    fatal_hosp in a bed. capacity has shape (2,), (n_days, 2) for a surge
+    plan or (n_scenarios, n_days, 2). Returns s, e, i, r, d, the occupied
+    hospital and ICU beds, cumulative hospital and ICU admissions and
+    cumulative excess deaths, each (n_days+1,) or (n_scenarios, n_days+1)
+    for a batch. With enough beds the run is that of `sim_seird_decay_batch`.
+    """
+    capacity = np.asarray(capacity, dtype=float)
+    batch = np.ndim(contact) == 2 or capacity.ndim == 3 or any(
+        np.ndim(v) > 0 for v in (s, e, i, r, d, beta, gamma, alpha, fatal, fatal_hosp, *rates, *overflow_fatal))
+    contact = np.atleast_2d(np.asarray(contact, dtype=float))
+    s, e, i, r, d, beta, gamma, alpha, fatal, fatal_hosp, rate_hosp, rate_icu, fatal_hosp_out, fatal_icu_out, _ = (
+        np.array(v, dtype=float) for v in np.broadcast_arrays(
+            s, e, i, r, d, beta, gamma, alpha, fatal, fatal_hosp, *rates, *overflow_fatal,
+            capacity[:, 0, 0] if capacity.ndim == 3 else contact[:, 0]))
+    n = s + e + i + r + d
+    rates = np.stack([rate_hosp, rate_icu])
+    discharge = 1 / np.asarray(lengths_of_stay, dtype=float)[:, None]
+    excess_fatal = np.maximum(np.stack([fatal_hosp_out, fatal_icu_out]) - fatal_hosp, 0.0)
+
+    beta_decay = np.ascontiguousarray((beta[:, None] * contact[:, :n_days]).T)
+    # Day-major (n_days, 2, n_scenarios)
+    if capacity.ndim == 1:
+        capacity = np.tile(capacity, (n_days, 1))
+    capacity = np.broadcast_to(
+        capacity[:, :n_days].transpose(1, 2, 0) if capacity.ndim == 3 else capacity[:n_days, :, None],
+        (n_days, 2, s.shape[0]))
+
+    beds = np.zeros((2, s.shape[0]))
+    runs = np.empty((10, n_days + 1, s.shape[0]))
+    runs[:, 0] = s, e, i, r, d, beds[0], beds[1], beds[0], beds[1], beds[0]
+    for day in range(n_days):
+        s, e, i, r, d, beds, admitted, excess = seird_capacity(
+            s, e, i, r, d, beds, beta_decay[day], gamma, alpha, n, fatal, rates, discharge, capacity[day],
+            excess_fatal)
+        runs[:5, day + 1] = s, e, i, r, d
+        runs[5:7, day + 1] = beds
+        runs[7:, day + 1] = runs[7:, day] + (admitted[0], admitted[1], excess)
+
+    runs = runs.transpose(0, 2, 1)
+    return tuple(runs) if batch else tuple(run[0] for run in runs)
+
+def seird_chain_binomial(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, beta: float, gamma: float,
+    alpha: float, fatal: float, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The SEIRD model, one time step, as a chain binomial over whole people.
+
+    Every replicate (element of the integer arrays s..d) draws its
+    transitions: each susceptible is infected with probability beta * i,
+    each exposed becomes infectious with probability alpha and each
+    infectious is removed with probability gamma, dying with probability
+    fatal. The expected step is the `seird` update, and people are never
+    created or lost, so no rescaling to the population is needed.
+    """
+    exposures = rng.binomial(s, np.minimum(beta * i, 1.0))
+    onsets = rng.binomial(e, min(alpha, 1.0))
+    removals = rng.binomial(i, min(gamma, 1.0))
+    deaths = rng.binomial(removals, fatal)
+    return s - exposures, e + exposures - onsets, i + onsets - removals, r + removals - deaths, d + deaths
+
+def sim_seird_chain_binomial(
+    s: int, e: int, i: int, r: int, d: int, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray, fatal: float, n_replicates: int, rng: np.random.Generator
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate replicates of the stochastic SEIRD model forward in time.
+
+    Arguments are as for `sim_seird_decay`, with s..d whole people. Returns
+    five integer arrays of shape (n_replicates, n_days+1) whose mean
+    approaches the `sim_seird_decay` run.
+    """
+    state = [np.full(n_replicates, int(round(v)), dtype=np.int64) for v in (s, e, i, r, d)]
+    runs = np.empty((5, n_days + 1, n_replicates), dtype=np.int64)
+    runs[:, 0] = state
+    for day in range(n_days):
+        state = seird_chain_binomial(*state, beta * contact[day], gamma, alpha, fatal, rng)
+        runs[:, day + 1] = state
+
+    return tuple(run.T for run in runs)
+
+def seird_age(
+    s: np.ndarray, e: np.ndarray, i: np.ndarray, r: np.ndarray, d: np.ndarray, beta: np.ndarray,
+    contacts: np.ndarray, gamma: float, alpha: float, n: np.ndarray, fatal: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The age-structured SEIRD model, one time step, for every scenario at once.
+
+    Compartments are (n_scenarios, n_bands); beta is the per-capita contact
+    rate of each scenario and contacts the (n_bands, n_bands) contact
+    matrix, so the force of infection on every band and scenario is one
+    matrix product. fatal may differ by band.
+    """
+    exposures = beta[:, None] * s * ((i / n) @ contacts.T)
+    return seird_update(s, e, i, r, d, exposures, alpha * e, gamma, n, fatal)[:5]
+
+def sim_seird_decay_age(
+    s, e, i, r, d, beta, gamma: float, alpha: float, n_days: int, contact: np.ndarray, matrices: np.ndarray,
+    fatal, setting_contact: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the age-structured SEIRD model forward in time.
+
+    s..d are (n_bands,) or (n_scenarios, n_bands) and beta a scalar or
+    (n_scenarios,). matrices are the (n_settings, n_bands, n_bands) contact
+    matrices of each setting (home, school, ...). contact is the overall
+    daily multiplier, (n_days,) or (n_scenarios, n_days), and
+    setting_contact an (n_settings, n_days) multiplier of each setting's
+    block on top of it. fatal is a scalar or one rate per band. Returns
+    five arrays of shape (n_bands, n_days+1), or (n_scenarios, n_bands,
+    n_days+1) for a batch.
+    """
+    batch = np.ndim(s) == 2 or np.ndim(beta) == 1 or np.ndim(contact) == 2
+    s, e, i, r, d = (np.atleast_2d(np.asarray(v, dtype=float)) for v in (s, e, i, r, d))
+    contact = np.atleast_2d(np.asarray(contact, dtype=float))
+    n_scenarios = max(s.shape[0], np.size(beta), contact.shape[0])
+    s, e, i, r, d = (np.array(np.broadcast_to(v, (n_scenarios, s.shape[1]))) for v in (s, e, i, r, d))
+    beta = np.broadcast_to(np.asarray(beta, dtype=float), (n_scenarios,))
+    contact = np.broadcast_to(contact[:, :n_days], (n_scenarios, n_days))
+    matrices = np.asarray(matrices, dtype=float)
+    if setting_contact is None:
+        setting_contact = np.ones((len(matrices), n_days))
+    fatal = np.asarray(fatal, dtype=float)
+    n = s + e + i + r + d
+
+    # The day's contact matrix, its setting blocks scaled by the schedule
+    daily = np.tensordot(np.asarray(setting_contact, dtype=float)[:, :n_days].T, matrices, axes=1)
+    beta_decay = np.ascontiguousarray((beta[:, None] * contact).T)
+
+    shape = (n_days + 1,) + s.shape
+    s_v, e_v, i_v, r_v, d_v = (np.empty(shape) for _ in range(5))
+    s_v[0], e_v[0], i_v[0], r_v[0], d_v[0] = s, e, i, r, d
+    for day in range(n_days):
+        s, e, i, r, d = seird_age(s, e, i, r, d, beta_decay[day], daily[day], gamma, alpha, n, fatal)
+        s_v[day + 1] = s
+        e_v[day + 1] = e
+        i_v[day + 1] = i
+        r_v[day + 1] = r
+        d_v[day + 1] = d
+
+    runs = tuple(np.moveaxis(v, 0, -1) for v in (s_v, e_v, i_v, r_v, d_v))
+    return runs if batch else tuple(v[0] for v in runs)
+
+def seijcrd(
+    s: float, e: float, i: float, j:float, c:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal_hosp: float, hosp_rate:float, icu_rate:float, icu_days:float,crit_lag:float, death_days:float
+    ) -> Tuple[float, float, float, float]:
+    """The SIR model, one time step."""
+    s_n = (-beta * s * (i+j+c)) + s
+    e_n = (beta * s * (i+j+c)) - alpha * e + e
+    i_n = (alpha * e - gamma * i) + i
+    j_n = hosp_rate * i * gamma + (1-icu_rate)* c *icu_days + j
+    c_n = icu_rate * j * (1/crit_lag) - c *  (1/death_days)
+    r_n = (1-hosp_rate)*gamma * i + (1-icu_rate) * (1/crit_lag)* j + r
+    d_n = (fatal_hosp)* c * (1/crit_lag)+d
+    if s_n < 0.0:
+        s_n = 0.0
+    if e_n < 0.0:
+        e_n = 0.0
+    if i_n < 0.0:
+        i_n = 0.0
+    if j_n < 0.0:
+        j_n = 0.0
+    if c_n < 0.0:
+        c_n = 0.0
+    if r_n < 0.0:
+        r_n = 0.0
+    if d_n < 0.0:
+        d_n = 0.0
+
+    scale = n / (s_n + e_n+ i_n + j_n+ c_n+ r_n + d_n)
+    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, c_n*scale, r_n * scale, d_n * scale
+
+def sim_seijcrd_decay(
+    s: float, e:float, i: float, j:float, c: float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray, fatal_hosp: float, hosp_rate: float, icu_rate: float, icu_days:float, crit_lag: float, death_days:float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time.
+
+    contact is the daily contact multiplier from InterventionSchedule.contact_multipliers.
+    """
+    s, e, i, j, c, r, d= (float(v) for v in (s, e, i, j, c, r, d))
+    n = s + e + i + j + c + r + d
+    s_v, e_v, i_v, j_v, c_v, r_v, d_v = [s], [e], [i], [j], [c], [r], [d]
+    for day in range(n_days):
+        s, e, i,j, c, r,d = seijcrd(s, e, i,j, c, r, d, beta*contact[day], gamma, alpha, n, fatal_hosp, hosp_rate, icu_rate, icu_days, crit_lag, death_days)
+        s_v.append(s)
+        e_v.append(e)
+        i_v.append(i)
+        j_v.append(j)
+        c_v.append(c)
+        r_v.append(r)
+        d_v.append(d)
+
+    return (
+        np.array(s_v),
+        np.array(e_v),
+        np.array(i_v),
+        np.array(j_v),
+        np.array(c_v),
+        np.array(r_v),
+        np.array(d_v)
+    )
+
+# Less complicated
+
+def seijcrd2(
+    s: float, e: float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n: float, fatal: float, fatal_hosp: float, hosp_rate:float,
+    hosp_day_rate:float, l:float
+    ) -> Tuple[float, float, float, float, float,float]:
+    """The SIR model, one time step."""
+    s_n = -beta*s*(i + (l*j)) +s
+    e_n = beta*s*(i + (l*j)) - alpha * e + e
+    i_n = alpha * e - (hosp_rate + gamma) * i + i 
+    j_n = hosp_rate * i - hosp_day_rate*j +j
+    r_n = gamma * (1-fatal)*i + ((1-fatal_hosp) * hosp_day_rate * j) +r
+    d_n = gamma * (fatal)*i + ((fatal_hosp)*hosp_day_rate*j) +d
+    if s_n < 0.0:
+        s_n = 0.0
+    if e_n < 0.0:
+        e_n = 0.0
+    if i_n < 0.0:
+        i_n = 0.0
+    if j_n < 0.0:
+        j_n = 0.0
+    if r_n < 0.0:
+        r_n = 0.0
+    if d_n < 0.0:
+        d_n = 0.0
+
+    scale = n / (s_n + e_n+ i_n + j_n+ r_n + d_n)
+    return s_n * scale, e_n * scale, i_n * scale, j_n* scale, r_n * scale, d_n * scale
+# 
+
+def sim_seijcrd_decay2(
+    s: float, e:float, i: float, j:float, r: float, d: float, beta: float, gamma: float, alpha: float, n_days: int,
+    contact: np.ndarray, fatal: float, fatal_hosp: float, hosp_rate: float, hosp_day_rate:float, l:float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray,np.ndarray, np.ndarray]:
+    """Simulate the SIR model forward in time.
+
+    contact is the daily contact multiplier from InterventionSchedule.contact_multipliers.
+    """
+    s, e, i, j, r, d= (float(v) for v in (s, e, i, j, r, d))
+    n = s + e + i + j+r + d
+    s_v, e_v, i_v, j_v, r_v, d_v = [s], [e], [i], [j], [r], [d]
+    for day in range(n_days):
+        s, e, i,j, r,d = seijcrd2(s, e, i,j, r, d, beta*contact[day], gamma, alpha, n, fatal, fatal_hosp, hosp_rate,hosp_day_rate, l)
+        s_v.append(s)
+        e_v.append(e)
+        i_v.append(i)
+        j_v.append(j)
+        r_v.append(r)
+        d_v.append(d)
+
+    return (
+        np.array(s_v),
+        np.array(e_v),
+        np.array(i_v),
+        np.array(j_v),
+        np.array(r_v),
+        np.array(d_v)
+    )
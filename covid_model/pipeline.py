@@ -0,0 +1,287 @@
+"""Registered models and lazy handles onto their runs and tables in a Graph.
+
+Each registered model declares graph nodes for its run, dispositions,
+admissions and census. Declaring nodes costs nothing: a model is simulated
+and tabulated only when a handle is asked for something a page actually
+shows, so adding a variant to the registry does not slow down every page
+load.
+
+The nodes read these graph inputs: S, doubling_time, recovery_days,
+infectious_period, incubation_period, relative_contact_rate, fatal,
+schedule, n_days, integrator (one of integrators.INTEGRATORS), rates,
+regional_hosp_share and hosp_los / icu_los / vent_los (whole days or
+survival curves); the assimilated model also reads
+assimilated, a covid_model.assimilation.Posterior, and the metapopulation
+model counties (the CountyStore), start_date, reporting_fraction (the share
+of infections confirmed, for seeding) and location_rows (the store rows of
+the chosen location), rescaled to S. The age-structured model reads age_shares,
+age_contacts (a covid_model.age.ContactMatrices) and setting_schedules (an
+InterventionSchedule per closed setting, e.g. school). Resource projections
+read catalogue, a covid_model.resources.ResourceCatalogue, and per-hospital
+tables system, a covid_model.system.HealthSystem, with counties and
+location_rows. The capacity-constrained model reads capacity_plan (a
+covid_model.capacity surge plan, (n_days, 3)), fatal_hosp and
+overflow_fatal (the hospital and ICU fatality without a bed).
+"""
+from collections import OrderedDict, namedtuple
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .age import FATALITY_PROFILE, age_rates, band_rates, seed_bands, setting_multipliers
+from .assimilation import project
+from .census import convolve_census, mean_length_of_stay
+from .checkpoint import sim_seird_decay_checkpointed
+from .graph import Graph
+from .hospital import CATEGORIES, admissions_frame, build_admissions_array, census_frame, sum_dispositions
+from .integrators import sim_seir_ode, sim_seird_ode
+from .metapop import county_metapop, county_mobility, location_totals
+from .models import sim_seir, sim_seird_decay_age, sim_seird_decay_capacity, sim_sir
+from .rates import intrinsic_growth_rate, seir_beta, sir_beta
+from .resources import project_resources
+from .system import build_system_tables, region_weights
+
+# simulate(*inputs) returns the run's compartments; ever_infected selects the
+# infected, recovered (and fatal) ones that hospital dispositions are drawn from
+# at the hosp/icu/vent rates named by rates (one per age band for age models).
+# Models that fill beds themselves name the run's occupied hosp and icu beds
+# and cumulative hosp and icu admissions with beds; their tables come from those
+ModelSpec = namedtuple("ModelSpec", ("key", "label", "simulate", "inputs", "ever_infected", "rates", "beds"))
+
+_models = OrderedDict()
+
+
+def register_model(
+    key: str, label: str, simulate: Callable, inputs: Sequence[str], ever_infected: slice,
+    rates: str = "rates", beds: Optional[slice] = None) -> None:
+    """Add (or replace) a model; inputs name the graph inputs or nodes simulate takes."""
+    _models[key] = ModelSpec(key, label, simulate, tuple(inputs), ever_infected, rates, beds)
+
+def registered_models() -> Dict[str, ModelSpec]:
+    return OrderedDict(_models)
+
+def add_rate_nodes(
+    graph: Graph) -> None:
+    """Derived rates and the daily contact multipliers the registered models read."""
+    graph.node("intrinsic_growth_rate", intrinsic_growth_rate, "doubling_time")
+    # mean recovery rate, gamma, (in 1/days).
+    graph.node("gamma", lambda recovery_days: 1 / recovery_days, "recovery_days")
+    graph.node("gamma2", lambda infectious_period: 1 / infectious_period, "infectious_period")
+    graph.node("alpha", lambda incubation_period: 1 / incubation_period, "incubation_period")
+    # Contact rate, beta
+    graph.node("beta", sir_beta, "intrinsic_growth_rate", "gamma", "S", "relative_contact_rate")
+    # Contact rate, beta for SEIR with phase adjusted R0
+    graph.node("beta3", seir_beta, "intrinsic_growth_rate", "alpha", "infectious_period", "S",
+               "relative_contact_rate")
+    ## converting beta to intrinsic growth rate calculation
+    graph.node("beta4", seir_beta, "intrinsic_growth_rate", "alpha", "infectious_period", "S")
+    graph.node("contact", lambda schedule, n_days: schedule.contact_multipliers(n_days), "schedule", "n_days")
+    graph.node("no_distancing", lambda n_days: np.ones(n_days), "n_days")
+    # Per-capita contact rate, for models that divide by each group's own population
+    graph.node("beta_per_capita",
+        lambda intrinsic_growth_rate, alpha, infectious_period: seir_beta(
+            intrinsic_growth_rate, alpha, infectious_period, 1.0),
+        "intrinsic_growth_rate", "alpha", "infectious_period")
+
+def add_age_nodes(
+    graph: Graph) -> None:
+    """Per-band rates and per-setting contact multipliers for the age-structured model."""
+    graph.node("age_rates", age_rates, "rates", "age_shares")
+    graph.node("age_fatal", lambda fatal, age_shares: band_rates(fatal, FATALITY_PROFILE, age_shares),
+               "fatal", "age_shares")
+    graph.node("setting_contact",
+        lambda age_contacts, setting_schedules, n_days: setting_multipliers(
+            age_contacts.settings, setting_schedules, n_days),
+        "age_contacts", "setting_schedules", "n_days")
+
+def add_metapop_nodes(
+    graph: Graph) -> None:
+    """The national metapopulation run every location's model M sums its counties from.
+
+    The run does not depend on the location, so it is computed once per
+    set of parameters and shared by every location and session.
+    """
+    graph.node("mobility", county_mobility, "counties", shared=True)
+    graph.node("metapop", county_metapop, "counties", "start_date", "beta_per_capita", "gamma2", "alpha", "n_days",
+               "contact", "fatal", "mobility", "reporting_fraction", shared=True)
+
+def census_column(
+    admits: np.ndarray, length_of_stay, category: str) -> np.ndarray:
+    """Census for one of hosp/icu/vent, so each column reruns only for its own LOS."""
+    k = CATEGORIES.index(category)
+    return convolve_census(admits[k:k + 1], [length_of_stay])[0]
+
+def bed_dispositions(
+    admitted: np.ndarray, rates) -> np.ndarray:
+    """Cumulative hosp/icu/vent dispositions from a run's cumulative hosp and icu admissions.
+
+    Ventilated patients are the vent rate's part of those admitted to ICU.
+    """
+    vent_share = rates[2] / rates[1] if rates[1] > 0 else 0.0
+    return np.stack([admitted[0], admitted[1], admitted[1] * vent_share])
+
+
+class ModelHandle:
+    """One registered model in a graph; nothing runs until a method is called."""
+
+    def __init__(self, graph: Graph, spec: ModelSpec):
+        self.graph = graph
+        self.spec = spec
+        key = spec.key
+        graph.node("run_" + key, spec.simulate, *spec.inputs, shared=True)
+        graph.node("totals_" + key,
+            lambda run: tuple(v if np.ndim(v) == 1 else np.sum(v, axis=0) for v in run), "run_" + key)
+        # Cumulative hosp/icu/vent dispositions, (3, n_days+1)
+        if spec.beds is None:
+            graph.node("dispositions_" + key,
+                lambda run, rates, share: np.stack(sum_dispositions(run[spec.ever_infected], rates, share)),
+                "run_" + key, spec.rates, "regional_hosp_share", shared=True)
+        else:
+            graph.node("dispositions_" + key,
+                lambda run, rates: bed_dispositions(run[spec.beds][2:], rates),
+                "run_" + key, spec.rates, shared=True)
+        # New cases, (3, n_days); tables become DataFrames only for the charts
+        graph.node("admits_array_" + key, build_admissions_array, "dispositions_" + key, shared=True)
+        graph.node("admits_" + key, lambda admits: admissions_frame(admits.T), "admits_array_" + key, shared=True)
+        # Census Table; beds the model fills itself are its hosp and icu
+        # census, rounded up as convolve_census does
+        for category in CATEGORIES:
+            if spec.beds is not None and category != "vent":
+                graph.node("census_{}_{}".format(key, category),
+                    lambda run, k=CATEGORIES.index(category): np.ceil(np.round(run[spec.beds][k][:-1], 6)),
+                    "run_" + key, shared=True)
+                continue
+            graph.node("census_{}_{}".format(key, category),
+                lambda admits, los, category=category: census_column(admits, los, category),
+                "admits_array_" + key, category + "_los", shared=True)
+        graph.node("census_" + key,
+            lambda hosp, icu, vent, n_days: census_frame(np.arange(len(hosp)), (hosp, icu, vent), n_days),
+            *("census_{}_{}".format(key, category) for category in CATEGORIES), "n_days", shared=True)
+        # (n_days, 3), the census the resource catalogue burns through
+        graph.node("census_array_" + key, lambda *census: np.stack(census, axis=-1),
+            *("census_{}_{}".format(key, category) for category in CATEGORIES))
+
+    @property
+    def key(self) -> str:
+        return self.spec.key
+
+    @property
+    def label(self) -> str:
+        return self.spec.label
+
+    def run(self):
+        """The simulated compartments, e.g. (s, e, i, r, d)."""
+        return self.graph.get("run_" + self.key)
+
+    def totals(self):
+        """The compartments summed over age bands; the run itself for models without them."""
+        return self.graph.get("totals_" + self.key)
+
+    def admissions(self) -> pd.DataFrame:
+        return self.graph.get("admits_" + self.key)
+
+    def census(self) -> pd.DataFrame:
+        return self.graph.get("census_" + self.key)
+
+    def census_array(self) -> np.ndarray:
+        return self.graph.get("census_array_" + self.key)
+
+def add_resource_nodes(
+    graph: Graph, keys: Sequence[str]) -> None:
+    """Node resources: every catalogue item for the models keys, (len(keys), n_days, n_items).
+
+    The models' census arrays are stacked so all of them are projected in
+    one product with the catalogue's rates.
+    """
+    graph.node("resources",
+        lambda catalogue, *census: project_resources(np.stack(census), catalogue),
+        "catalogue", *("census_array_" + key for key in keys))
+
+def add_system_nodes(
+    graph: Graph, key: str) -> None:
+    """Node system_tables_<key>: model key's tables for every hospital of the system.
+
+    The location's dispositions are spread over the system's regions by
+    population, then shared out to the hospitals by their market shares.
+    """
+    graph.node("region_weights", region_weights, "system", "counties", "location_rows")
+    graph.node("system_tables_" + key,
+        lambda dispositions, weights, system: build_system_tables(weights[:, None, None] * dispositions, system),
+        "dispositions_" + key, "region_weights", "system", shared=True)
+
+def model_handles(
+    graph: Graph, keys: Optional[Iterable[str]] = None) -> Dict[str, ModelHandle]:
+    """Declare the rate nodes and a handle for each registered model (all by default)."""
+    add_rate_nodes(graph)
+    add_metapop_nodes(graph)
+    add_age_nodes(graph)
+    keys = list(_models) if keys is None else keys
+    return OrderedDict((key, ModelHandle(graph, _models[key])) for key in keys)
+
+
+### SIR model
+register_model(
+    "v", "SIR", lambda S, beta, gamma, n_days: sim_sir(S-2, 1, 1 ,beta, gamma, n_days),
+    ("S", "beta", "gamma", "n_days"), slice(1, 3))
+### SEIR model
+register_model(
+    "e", "SEIR",
+    lambda S, beta3, gamma2, alpha, n_days, integrator: sim_seir(
+        S-11, 1 ,10, 0.0, beta3, gamma2, alpha, n_days) if integrator == "euler" else sim_seir_ode(
+        S-11, 1 ,10, 0.0, beta3, gamma2, alpha, n_days, np.ones(n_days), integrator),
+    ("S", "beta3", "gamma2", "alpha", "n_days", "integrator"), slice(2, 4))
+## SEIR model with phase adjusted R_0
+register_model(
+    "R", "SEIR with phase adjusted R0",
+    lambda S, beta4, gamma2, alpha, n_days, contact, integrator: sim_seir_ode(
+        S-2, 1 ,1, 0.0, beta4, gamma2, alpha, n_days, contact, integrator),
+    ("S", "beta4", "gamma2", "alpha", "n_days", "contact", "integrator"), slice(2, 4))
+## SEIR model with phase adjusted R_0 and Disease Related Fatality; the
+## step-wise run resumes from the state saved at the first changed phase
+register_model(
+    "D", "SEIRD with step-wise social distancing",
+    lambda S, beta4, gamma2, alpha, n_days, contact, fatal, schedule, integrator: sim_seird_decay_checkpointed(
+        S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2, alpha, n_days, contact, fatal,
+        [phase.day for phase in schedule.phases]) if integrator == "euler" else sim_seird_ode(
+        S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2, alpha, n_days, contact, fatal, integrator),
+    ("S", "beta4", "gamma2", "alpha", "n_days", "contact", "fatal", "schedule", "integrator"), slice(2, 5))
+## The same run admitting from the infected and recovered compartments only,
+## as appnew.py shows it
+register_model("D_ir", _models["D"].label, _models["D"].simulate, _models["D"].inputs, slice(2, 4))
+register_model(
+    "D2", "SEIRD without social distancing",
+    lambda S, beta4, gamma2, alpha, n_days, no_distancing, fatal, integrator: sim_seird_ode(
+        S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2, alpha, n_days, no_distancing, fatal, integrator),
+    ("S", "beta4", "gamma2", "alpha", "n_days", "no_distancing", "fatal", "integrator"), slice(2, 5))
+## SEIRD model run on from the particle filter's posterior over the case feed
+register_model(
+    "F", "SEIRD from the assimilated case feed",
+    lambda assimilated, gamma2, alpha, fatal, n_days: project(assimilated, gamma2, alpha, fatal, n_days),
+    ("assimilated", "gamma2", "alpha", "fatal", "n_days"), slice(2, 5))
+## SEIRD model of every county coupled by mobility, summed over the location
+register_model(
+    "M", "SEIRD metapopulation of all US counties",
+    lambda metapop, location_rows, S: location_totals(metapop, location_rows, S),
+    ("metapop", "location_rows", "S"), slice(2, 5))
+## SEIRD model by age band, with school and workplace contacts closed separately
+register_model(
+    "A", "Age-structured SEIRD",
+    lambda S, age_shares, beta_per_capita, gamma2, alpha, n_days, contact, age_contacts, age_fatal, setting_contact:
+        sim_seird_decay_age(
+            *seed_bands(S, 100.0, 50.0, age_shares), 0.0, 0.0, beta_per_capita, gamma2, alpha, n_days, contact,
+            age_contacts.matrices, age_fatal, setting_contact),
+    ("S", "age_shares", "beta_per_capita", "gamma2", "alpha", "n_days", "contact", "age_contacts", "age_fatal",
+     "setting_contact"), slice(2, 5), rates="age_rates")
+## SEIRD model with hospital and ICU beds filled within the step; patients
+## who find every bed taken die at the overflow fatality
+register_model(
+    "C", "SEIRD with hospital capacity and overflow mortality",
+    lambda S, beta4, gamma2, alpha, n_days, contact, fatal, rates, regional_hosp_share, hosp_los, icu_los,
+           capacity_plan, fatal_hosp, overflow_fatal: sim_seird_decay_capacity(
+        S-150, 100.0, 50.0 , 0.0, 0.0, beta4, gamma2, alpha, n_days, contact, fatal,
+        tuple(rate * regional_hosp_share for rate in rates[:2]),
+        (mean_length_of_stay(hosp_los), mean_length_of_stay(icu_los)), capacity_plan[:, :2], fatal_hosp,
+        overflow_fatal),
+    ("S", "beta4", "gamma2", "alpha", "n_days", "contact", "fatal", "rates", "regional_hosp_share", "hosp_los",
+     "icu_los", "capacity_plan", "fatal_hosp", "overflow_fatal"), slice(2, 5), beds=slice(5, 9))
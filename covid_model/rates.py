@@ -0,0 +1,23 @@
+"""Transmission and transition rates derived from the sidebar parameters."""
+
+
+def intrinsic_growth_rate(
+    doubling_time: float) -> float:
+    """Daily growth rate for a doubling time in days."""
+    return 2 ** (1 / doubling_time) - 1
+
+def sir_beta(
+    growth_rate: float, gamma: float, population: float, relative_contact_rate: float = 0.0) -> float:
+    """SIR contact rate: {rate based on doubling time} / {initial S}."""
+    return (growth_rate + gamma) / population * (1 - relative_contact_rate)
+
+def seir_beta(
+    growth_rate: float, alpha: float, infectious_period: float, population: float,
+    relative_contact_rate: float = 0.0) -> float:
+    """SEIR contact rate from the intrinsic growth rate.
+
+    https://www.sciencedirect.com/science/article/pii/S2468042719300491
+    """
+    return (
+        (alpha + growth_rate) * (growth_rate + (1 / infectious_period))
+    ) / (alpha * population) * (1 - relative_contact_rate)
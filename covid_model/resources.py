@@ -0,0 +1,93 @@
+"""Resource needs (PPE, staff, beds) projected from the hosp, icu and vent census.
+
+A ResourceCatalogue holds one row of burn rates per item: how much of it an
+occupied hospital, ICU and ventilated bed uses per day. Projecting every
+item for every day and scenario is then a single product of the census
+array with the transposed rate matrix, so hundreds of items cost no more
+than a handful. The default catalogue is the PPE table the app has always
+shown; catalogue_from_csv reads a hospital's own.
+"""
+from collections import namedtuple
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .hospital import CATEGORIES, DEFAULT_PPE, PpeRates, ppe_matrix
+
+
+PPE_ITEMS = (
+    "PPE sets - mild cases, lower", "PPE sets - mild cases, upper",
+    "PPE sets - severe cases, lower", "PPE sets - severe cases, upper",
+    "Mean PPE needs - mild cases", "Mean PPE needs - severe cases")
+
+# rates[k, j] is the daily use of items[k] per occupied bed of CATEGORIES[j]
+ResourceCatalogue = namedtuple("ResourceCatalogue", ("items", "units", "rates"))
+
+# Rows of the CSV export formatted at a time
+EXPORT_BLOCK = 2000
+
+
+def ppe_catalogue(
+    ppe: PpeRates = DEFAULT_PPE) -> ResourceCatalogue:
+    """The census table's six PPE columns as a catalogue."""
+    return ResourceCatalogue(PPE_ITEMS, ("sets",) * len(PPE_ITEMS), ppe_matrix(ppe).T)
+
+def catalogue_from_csv(
+    path_or_buffer) -> ResourceCatalogue:
+    """Read a table with columns item, unit (optional) and hosp, icu and vent burn rates.
+
+    Rates are per occupied bed per day; a missing care level column uses
+    none of any item.
+    """
+    table = pd.read_csv(path_or_buffer)
+    if "item" not in table:
+        raise ValueError("Resource catalogue has no 'item' column")
+    units = table["unit"].fillna("").astype(str) if "unit" in table else pd.Series("", index=table.index)
+    rates = np.column_stack([
+        pd.to_numeric(table[category]).fillna(0.0).values if category in table else np.zeros(len(table))
+        for category in CATEGORIES])
+    return ResourceCatalogue(tuple(table["item"].astype(str)), tuple(units), rates.astype(float))
+
+def project_resources(
+    census: np.ndarray, catalogue: ResourceCatalogue) -> np.ndarray:
+    """Daily use of every item from census of shape (..., n_days, 3), as (..., n_days, n_items)."""
+    return np.asarray(census, dtype=float) @ catalogue.rates.T
+
+def item_labels(
+    catalogue: ResourceCatalogue) -> Sequence[str]:
+    """Column titles: the item, followed by its unit in parentheses if it has one."""
+    return [
+        "{} ({})".format(item, unit) if unit else item for item, unit in zip(catalogue.items, catalogue.units)]
+
+def iter_resources_csv(
+    projection: np.ndarray, catalogue: ResourceCatalogue, scenarios: Sequence[str],
+    start_date=None, block: int = EXPORT_BLOCK) -> Iterator[str]:
+    """CSV text of a (n_scenarios, n_days, n_items) projection, a block of rows at a time.
+
+    One row per scenario and day, with a column per item; the header comes
+    with the first block. With a start_date, each row also gets its date.
+    """
+    n_scenarios, n_days, n_items = projection.shape
+    rows = projection.reshape(-1, n_items)
+    scenario = np.repeat(np.asarray(scenarios, dtype=object), n_days)
+    day = np.tile(np.arange(n_days), n_scenarios)
+    labels = item_labels(catalogue)
+    for start in range(0, len(rows), block):
+        stop = start + block
+        frame = pd.DataFrame(rows[start:stop], columns=labels)
+        if start_date is not None:
+            frame.insert(0, "date", (pd.Timestamp(start_date) + pd.to_timedelta(day[start:stop], "D")).date)
+        frame.insert(0, "day", day[start:stop])
+        frame.insert(0, "scenario", scenario[start:stop])
+        yield frame.to_csv(index=False, header=start == 0, float_format="%.1f")
+
+def write_resources_csv(
+    path_or_buffer, projection: np.ndarray, catalogue: ResourceCatalogue, scenarios: Sequence[str],
+    start_date=None, block: int = EXPORT_BLOCK) -> None:
+    """Write iter_resources_csv to a path or open text buffer without holding the whole file."""
+    if hasattr(path_or_buffer, "write"):
+        path_or_buffer.writelines(iter_resources_csv(projection, catalogue, scenarios, start_date, block))
+        return
+    with open(path_or_buffer, "w", newline="") as out:
+        out.writelines(iter_resources_csv(projection, catalogue, scenarios, start_date, block))
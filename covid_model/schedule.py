@@ -0,0 +1,67 @@
+"""Social distancing schedules compiled to a daily contact multiplier."""
+from collections import namedtuple
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+Phase = namedtuple("Phase", ("day", "reduction", "ramp_days"))
+
+class InterventionSchedule:
+    """Social distancing phases compiled to a daily contact multiplier.
+
+    Each Phase starts on `day` (days from the start date) and holds `reduction`
+    (fraction of contact removed) until the next phase begins. A phase with
+    ramp_days > 0 moves linearly from the previous level to its own over that
+    many days. Days before the first phase have no reduction.
+    """
+
+    def __init__(self, phases):
+        self.phases = tuple(sorted(
+            (Phase(int(day), float(reduction), int(ramp_days)) for day, reduction, ramp_days in phases),
+            key=lambda phase: phase.day))
+
+    def cache_key(self):
+        return self.phases
+
+    @classmethod
+    def from_dates(cls, start_date, rows) -> "InterventionSchedule":
+        """Build from (date, reduction, ramp_days) rows, dated relative to start_date."""
+        return cls(
+            ((pd.Timestamp(when) - pd.Timestamp(start_date)).days, reduction, ramp_days)
+            for when, reduction, ramp_days in rows)
+
+    @classmethod
+    def from_csv(cls, path_or_buffer, start_date) -> "InterventionSchedule":
+        """Read a schedule file with columns date, reduction (%) and optional ramp_days."""
+        table = pd.read_csv(path_or_buffer, parse_dates=["date"])
+        ramp_days = table["ramp_days"].fillna(0) if "ramp_days" in table else np.zeros(len(table))
+        return cls.from_dates(start_date, zip(table["date"], table["reduction"] / 100.0, ramp_days))
+
+    def weights(self, n_days: int) -> np.ndarray:
+        """(n_days, n_phases) matrix mapping phase reductions to daily reductions."""
+        days = np.arange(n_days)
+        weights = np.zeros((n_days, len(self.phases)))
+        for k, phase in enumerate(self.phases):
+            end = self.phases[k + 1].day if k + 1 < len(self.phases) else n_days
+            active = (days >= phase.day) & (days < end)
+            if phase.ramp_days > 0:
+                blend = np.clip((days - phase.day) / phase.ramp_days, 0.0, 1.0)
+            else:
+                blend = np.ones(n_days)
+            weights[active, k] = blend[active]
+            if k > 0:
+                weights[active, k - 1] += 1.0 - blend[active]
+        return weights
+
+    def contact_multipliers(self, n_days: int, reductions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Daily contact multiplier (1 - reduction), read by index in the kernels.
+
+        reductions overrides the phase levels; an (n_scenarios, n_phases) array
+        compiles a whole sweep to shape (n_scenarios, n_days) in one product.
+        """
+        if reductions is None:
+            reductions = [phase.reduction for phase in self.phases]
+        return 1.0 - np.asarray(reductions, dtype=float) @ self.weights(n_days).T
+
@@ -0,0 +1,197 @@
+"""Local, compressed copies of remote CSV files with conditional revalidation.
+
+A CsvStore keeps the last good download on disk as .npz plus a small JSON
+file with its ETag / Last-Modified headers. Reads are served from memory or
+disk; once the copy is older than the TTL it is revalidated in a background
+thread with If-None-Match / If-Modified-Since, so a Streamlit rerun never
+waits on the network unless there is no local copy at all. The source may
+be an http(s) URL or a local path (or file:// URL), which makes a directory
+or a local HTTP server a drop-in stand-in for testing.
+"""
+import email.utils
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600.0
+
+
+def write_frame(
+    df: pd.DataFrame, path: str) -> None:
+    """Save a DataFrame as compressed .npz, replacing path atomically."""
+    arrays = {"columns": np.array([str(col) for col in df.columns])}
+    for k, col in enumerate(df.columns):
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            arrays["col_{}".format(k)] = np.asarray(values)
+        else:
+            # Text columns are stored as fixed-width strings plus a missing mask
+            missing = np.asarray(values.isna())
+            arrays["na_{}".format(k)] = missing
+            arrays["col_{}".format(k)] = np.asarray(values.where(~missing, "").astype(str), dtype=str)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+def read_frame(
+    path: str) -> pd.DataFrame:
+    """Load a DataFrame saved by write_frame."""
+    with np.load(path, allow_pickle=False) as npz:
+        columns = list(npz["columns"])
+        data = {}
+        for k, col in enumerate(columns):
+            values = npz["col_{}".format(k)]
+            if "na_{}".format(k) in npz:
+                values = values.astype(object)
+                values[npz["na_{}".format(k)]] = np.nan
+            data[col] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+class CsvStore:
+    """One remote CSV file mirrored to cache_dir."""
+
+    def __init__(self, source: str, cache_dir: str, ttl: float = DEFAULT_TTL, timeout: float = 30.0):
+        self.source = source
+        self.ttl = ttl
+        self.timeout = timeout
+        name = os.path.splitext(os.path.basename(source.rstrip("/")))[0]
+        self.path = os.path.join(cache_dir, name + ".npz")
+        self.meta_path = os.path.join(cache_dir, name + ".json")
+        self._frame = None
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def _read_meta(self) -> Dict[str, Optional[str]]:
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: Dict[str, Optional[str]]) -> None:
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _fetch(self, meta: Dict[str, Optional[str]]) -> Tuple[Optional[bytes], Dict[str, Optional[str]]]:
+        """Conditional download; returns (None, headers) when unchanged."""
+        if self.source.startswith(("http://", "https://")):
+            headers = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            response = requests.get(self.source, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return None, meta
+            response.raise_for_status()
+            return response.content, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+
+        path = self.source[len("file://"):] if self.source.startswith("file://") else self.source
+        last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+        if last_modified == meta.get("last_modified"):
+            return None, meta
+        with open(path, "rb") as f:
+            return f.read(), {"etag": None, "last_modified": last_modified}
+
+    def checked_at(self) -> Optional[float]:
+        """Epoch seconds of the last successful download or revalidation."""
+        return self._read_meta().get("checked_at")
+
+    def is_stale(self) -> bool:
+        checked_at = self.checked_at()
+        return checked_at is None or time.time() - checked_at > self.ttl
+
+    def refresh(self) -> bool:
+        """Revalidate now; returns True if a new version was stored.
+
+        Network errors keep the local copy and are only raised when there is
+        no local copy to fall back on.
+        """
+        with self._lock:
+            # Without a local copy there is nothing to revalidate against
+            meta = self._read_meta() if os.path.exists(self.path) else {}
+            try:
+                content, headers = self._fetch(meta)
+            except (requests.RequestException, OSError) as error:
+                if not os.path.exists(self.path):
+                    raise
+                logger.warning("Could not revalidate %s (%s); serving the local copy", self.source, error)
+                return False
+
+            changed = content is not None
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if changed:
+                frame = pd.read_csv(io.BytesIO(content))
+                write_frame(frame, self.path)
+                self._frame = frame
+            meta = dict(headers, checked_at=time.time())
+            self._write_meta(meta)
+            return changed
+
+    def refresh_async(self) -> None:
+        """Start a background revalidation unless one is already running."""
+        with self._thread_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh_quietly, daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.warning("Background refresh of %s failed", self.source, exc_info=True)
+
+    def version(self) -> str:
+        """Identifies the local copy; changes whenever a new one is stored.
+
+        Like frame, downloads a first copy synchronously and schedules a
+        background revalidation once the copy is stale.
+        """
+        if not os.path.exists(self.path):
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_async()
+        return "{}:{}".format(self.source, os.stat(self.path).st_mtime_ns)
+
+    def frame(self) -> pd.DataFrame:
+        """The current copy, fetched synchronously only if none exists yet."""
+        if self._frame is None and os.path.exists(self.path):
+            self._frame = read_frame(self.path)
+        if self._frame is None:
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_async()
+        return self._frame
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def open_store(
+    source: str, cache_dir: str, ttl: float = DEFAULT_TTL) -> CsvStore:
+    """The process-wide CsvStore for source, shared by every session."""
+    with _stores_lock:
+        key = (source, os.path.abspath(cache_dir))
+        if key not in _stores:
+            _stores[key] = CsvStore(source, cache_dir, ttl)
+        return _stores[key]
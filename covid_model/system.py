@@ -0,0 +1,101 @@
+"""Admissions and census for each hospital of a health system.
+
+A system's hospitals draw patients from overlapping regions (counties). Its
+HealthSystem holds a hospital x region market share matrix: shares[h, r]
+is the part of region r's hospital patients that hospital h admits, so a
+column sums to at most one and the rest go to hospitals outside the system.
+The regions' cumulative dispositions become every hospital's in one product
+with that matrix, and census follows from each hospital's own whole-day
+lengths of stay, so tables for fifty facilities cost about what one region's
+do. This replaces a single regional_hosp_share for the whole system.
+"""
+from collections import namedtuple
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .census import window_census
+from .hospital import CATEGORIES, DEFAULT_PPE, HospitalTables, PpeRates, build_admissions_array, ppe_matrix
+
+
+# shares is (n_hospitals, n_regions), lengths_of_stay (n_hospitals, 3) whole
+# days of hosp, icu and vent stay at each hospital and capacity
+# (n_hospitals, 3) its beds, ICU beds and ventilators, NaN where not given;
+# regions are FIPS codes
+HealthSystem = namedtuple("HealthSystem", ("hospitals", "regions", "shares", "lengths_of_stay", "capacity"))
+
+LOS_COLUMNS = tuple(category + "_los" for category in CATEGORIES)
+CAPACITY_COLUMNS = tuple(category + "_capacity" for category in CATEGORIES)
+
+
+def system_from_csv(
+    path_or_buffer, lengths_of_stay: Tuple[int, int, int]) -> HealthSystem:
+    """Read a long table with columns hospital, region (county FIPS) and share.
+
+    Optional hosp_los, icu_los and vent_los columns give a hospital's own
+    lengths of stay in whole days (its first value counts); lengths_of_stay
+    fills in the rest. Optional hosp_capacity, icu_capacity and
+    vent_capacity columns give its beds, ICU beds and ventilators.
+    """
+    table = pd.read_csv(path_or_buffer)
+    missing = [column for column in ("hospital", "region", "share") if column not in table]
+    if missing:
+        raise ValueError("Health system table has no {} column".format(", ".join(missing)))
+    hospitals = tuple(pd.unique(table["hospital"].astype(str)))
+    regions = pd.unique(table["region"].astype(int))
+    shares = np.zeros((len(hospitals), len(regions)))
+    np.add.at(shares, (
+        table["hospital"].astype(str).map(hospitals.index).values,
+        table["region"].astype(int).map({region: k for k, region in enumerate(regions)}).values),
+        table["share"].astype(float).values)
+    if np.any(shares < 0) or np.any(shares.sum(axis=0) > 1 + 1e-9):
+        raise ValueError("Market shares must be non-negative and sum to at most one per region")
+
+    by_hospital = table.groupby(table["hospital"].astype(str), sort=False)
+    los = np.tile(np.asarray(lengths_of_stay, dtype=float), (len(hospitals), 1))
+    capacity = np.full((len(hospitals), len(CATEGORIES)), np.nan)
+    for k, (los_column, capacity_column) in enumerate(zip(LOS_COLUMNS, CAPACITY_COLUMNS)):
+        if los_column in table:
+            los[:, k] = by_hospital[los_column].first().reindex(hospitals).fillna(lengths_of_stay[k]).values
+        if capacity_column in table:
+            capacity[:, k] = by_hospital[capacity_column].first().reindex(hospitals).values
+    return HealthSystem(hospitals, regions, shares, los.astype(int), capacity)
+
+def region_weights(
+    system: HealthSystem, store, rows: np.ndarray) -> np.ndarray:
+    """Each region's share of the population of the store rows (e.g. a location); 0 outside them."""
+    population = np.nan_to_num(np.asarray(store.population_of, dtype=float)[rows])
+    index = {fips: k for k, fips in enumerate(np.asarray(store.fips)[rows].tolist())}
+    total = population.sum()
+    return np.array([
+        population[index[region]] / total if region in index and total > 0 else 0.0
+        for region in system.regions.tolist()])
+
+def hospital_dispositions(
+    dispositions: np.ndarray, shares: np.ndarray) -> np.ndarray:
+    """Dispositions of shape (..., n_regions, 3, n_days+1) shared out as (..., n_hospitals, 3, n_days+1)."""
+    return np.einsum("hr,...rct->...hct", shares, dispositions)
+
+def build_system_tables(
+    dispositions: np.ndarray, system: HealthSystem, ppe: PpeRates = DEFAULT_PPE) -> HospitalTables:
+    """Admissions, census and PPE for every hospital from regional cumulative dispositions.
+
+    dispositions has shape (..., n_regions, 3, n_days+1); the tables have
+    the hospitals on the axis before days and categories, as in
+    build_hospital_tables.
+    """
+    admits = build_admissions_array(hospital_dispositions(np.asarray(dispositions, dtype=float), system.shares))
+    # Rounded up as convolve_census does
+    census = np.swapaxes(np.ceil(np.round(window_census(admits, system.lengths_of_stay), 6)), -1, -2)
+    return HospitalTables(np.swapaxes(admits, -1, -2), census, census @ ppe_matrix(ppe))
+
+def peak_census(
+    tables: HospitalTables, hospitals: Sequence[str], n_days: int) -> pd.DataFrame:
+    """Each hospital's highest census, and the day it comes, by category over the first n_days."""
+    census = tables.census[..., :n_days, :]
+    frame = {"hospital": list(hospitals)}
+    for k, category in enumerate(CATEGORIES):
+        frame[category + "_peak"] = census[..., k].max(axis=-1)
+        frame[category + "_peak_day"] = census[..., k].argmax(axis=-1)
+    return pd.DataFrame(frame)
@@ -0,0 +1,163 @@
+"""Monte Carlo uncertainty bands for SEIRD admissions and census.
+
+Parameters are drawn from user-specified distributions and every draw is
+simulated in one call to sim_seird_decay_batch, so thousands of trajectories
+cost about as much as a few scalar runs.
+
+For small populations the chain binomial ensemble instead keeps the
+parameters fixed and runs replicates of the stochastic model, which counts
+whole patients and shows the chance that an outbreak fizzles out.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .census import convolve_census
+from .hospital import build_hospital_tables
+from .integrators import sim_seird_ode
+from .models import sim_seird_chain_binomial
+from .schedule import InterventionSchedule
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Replicates per random stream; results depend on the seed, not on the workers
+REPLICATE_BLOCK = 1000
+
+# kind is "fixed" (mode only), "uniform" (low, high) or "triangular" (low, mode, high)
+Distribution = namedtuple("Distribution", ("kind", "low", "mode", "high"))
+
+Ensemble = namedtuple("Ensemble", ("admits", "census"))
+
+
+def around(
+    value: float, spread: float, kind: str = "triangular", upper: Optional[float] = None
+    ) -> Distribution:
+    """Distribution centred on value, +/- spread as a fraction of value.
+
+    The range is clipped to [0, upper] so rates and periods stay valid.
+    """
+    if spread <= 0.0:
+        return Distribution("fixed", value, value, value)
+    low = max(value * (1 - spread), 0.0)
+    high = value * (1 + spread)
+    if upper is not None:
+        high = min(high, upper)
+    return Distribution(kind, low, value, high)
+
+def draw(
+    distribution: Distribution, n_draws: int, rng: np.random.Generator) -> np.ndarray:
+    """Draw n_draws values from a Distribution."""
+    kind, low, mode, high = distribution
+    if kind == "fixed" or low == high:
+        return np.full(n_draws, float(mode))
+    if kind == "uniform":
+        return rng.uniform(low, high, n_draws)
+    if kind == "triangular":
+        return rng.triangular(low, mode, high, n_draws)
+    raise ValueError("Unknown distribution kind: {}".format(kind))
+
+def sample_parameters(
+    distributions: Dict[str, Distribution], n_draws: int, seed: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+    """Draw every named parameter, each as an array of shape (n_draws,)."""
+    rng = np.random.default_rng(seed)
+    return {name: draw(distribution, n_draws, rng) for name, distribution in distributions.items()}
+
+def run_seird_ensemble(
+    population: float, exposed: float, infected: float, samples: Dict[str, np.ndarray],
+    schedule: InterventionSchedule, reductions: np.ndarray, n_days: int,
+    lengths_of_stay: Tuple[Union[int, np.ndarray], ...], integrator: str = "euler", regional_hosp_share: float = 1.0
+    ) -> Ensemble:
+    """Simulate every draw of the step-wise distancing SEIRD model at once.
+
+    samples holds arrays for doubling_time, incubation_period,
+    infectious_period, fatal, hosp_rate, icu_rate and vent_rate;
+    reductions is (n_draws, n_phases) for the schedule's phases and
+    lengths_of_stay are whole days or survival curves for hosp/icu/vent and
+    integrator one of integrators.INTEGRATORS; admissions are the rates times
+    regional_hosp_share, as for `build_admissions_df`. Returns
+    admissions and census of shape (n_draws, n_days, 3) for hosp/icu/vent.
+    """
+    intrinsic_growth_rate = 2 ** (1 / samples["doubling_time"]) - 1
+    alpha = 1 / samples["incubation_period"]
+    gamma = 1 / samples["infectious_period"]
+    beta = (alpha + intrinsic_growth_rate) * (intrinsic_growth_rate + gamma) / (alpha * population)
+
+    _, _, i_v, r_v, d_v = sim_seird_ode(
+        population - exposed - infected, exposed, infected, 0.0, 0.0, beta, gamma, alpha, n_days,
+        schedule.contact_multipliers(n_days, reductions), samples["fatal"], integrator)
+    infected_total = i_v + r_v + d_v
+
+    rates = np.stack([samples["hosp_rate"], samples["icu_rate"], samples["vent_rate"]], axis=-1) * regional_hosp_share
+    tables = build_hospital_tables(infected_total[:, None, :] * rates[:, :, None], lengths_of_stay)
+    return Ensemble(tables.admits, tables.census)
+
+def chain_binomial_admissions(
+    population: int, exposed: int, infected: int, beta: float, gamma: float, alpha: float, fatal: float,
+    contact: np.ndarray, rates: Tuple[float, float, float], regional_hosp_share: float, n_days: int,
+    n_replicates: int, rng: np.random.Generator) -> np.ndarray:
+    """(n_replicates, 3, n_days) whole hosp/icu/vent admissions of stochastic SEIRD replicates.
+
+    Each person who becomes infectious is admitted to each category with its
+    rate times the regional share, drawn per day as for `build_admissions_df`
+    (day 0 has no admissions).
+    """
+    _, _, i_v, r_v, d_v = sim_seird_chain_binomial(
+        population - exposed - infected, exposed, infected, 0, 0, beta, gamma, alpha, n_days, contact, fatal,
+        n_replicates, rng)
+    onsets = np.diff((i_v + r_v + d_v)[:, :n_days], axis=-1)
+    admits = np.zeros((n_replicates, len(rates), n_days))
+    admits[:, :, 1:] = rng.binomial(
+        onsets[:, None, :], np.minimum(np.asarray(rates)[:, None] * regional_hosp_share, 1.0))
+    return admits
+
+def run_chain_binomial_ensemble(
+    population: int, exposed: int, infected: int, beta: float, gamma: float, alpha: float, fatal: float,
+    contact: np.ndarray, rates: Tuple[float, float, float], n_days: int,
+    lengths_of_stay: Tuple[Union[int, np.ndarray], ...], n_replicates: int = 10000,
+    regional_hosp_share: float = 1.0, seed: int = 0, workers: Optional[int] = None) -> Ensemble:
+    """Admissions and census of replicates of the chain binomial SEIRD model.
+
+    The parameters are as for the step-wise distancing model (beta per
+    person, contact from the schedule). Replicates run in blocks of
+    REPLICATE_BLOCK, each block on its own stream spawned from seed and
+    handed to a pool of workers threads. Returns admissions and census of
+    shape (n_replicates, n_days, 3) for hosp/icu/vent.
+    """
+    sizes = [min(REPLICATE_BLOCK, n_replicates - start) for start in range(0, n_replicates, REPLICATE_BLOCK)]
+    streams = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(sizes))]
+    with ThreadPoolExecutor(workers) as pool:
+        blocks = list(pool.map(
+            lambda size, rng: chain_binomial_admissions(
+                population, exposed, infected, beta, gamma, alpha, fatal, contact, rates, regional_hosp_share,
+                n_days, size, rng),
+            sizes, streams))
+    admits = np.concatenate(blocks)
+    census = convolve_census(admits, lengths_of_stay)
+    return Ensemble(admits.transpose(0, 2, 1), census.transpose(0, 2, 1))
+
+def percentile_bands(
+    values: np.ndarray, names: Tuple[str, ...]) -> pd.DataFrame:
+    """Long table of p5/p25/p50/p75/p95 across draws for a (n_draws, n_days, k) array.
+
+    Columns are day, key (one of names) and one column per percentile.
+    """
+    # One sort plus linear interpolation (np.percentile's default) is several
+    # times faster than np.percentile's multi-point partition on large ensembles
+    ordered = np.sort(values, axis=0)
+    position = np.asarray(PERCENTILES) / 100.0 * (values.shape[0] - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, values.shape[0] - 1)
+    fraction = (position - lower)[:, None, None]
+    bands = ordered[lower] * (1 - fraction) + ordered[upper] * fraction
+    n_days = values.shape[1]
+    table = pd.DataFrame({
+        "day": np.tile(np.arange(n_days), len(names)),
+        "key": np.repeat(names, n_days),
+    })
+    for p, band in zip(PERCENTILES, bands):
+        table["p{}".format(p)] = band.T.ravel()
+    return table
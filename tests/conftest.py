@@ -0,0 +1,76 @@
+import os
+import sys
+
+# The tests import covid_model from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from covid_model import InterventionSchedule
+from covid_model.calibration import simulate_reported
+
+
+# Constants and helpers shared by several test modules; import them with
+# `from conftest import ...`
+POPULATION = 1000000.0
+
+# Length of the model runs and the schedule they follow
+N_DAYS = 120
+
+# Length of the synthetic dispositions the hospital tables are built from
+HOSPITAL_DAYS = 60
+
+RATES = (0.025, 0.0075, 0.005)
+
+# First day of the synthetic case feeds
+START = pd.Timestamp("2020-03-01")
+
+DATES = ["3/1/20", "3/2/20", "3/3/20", "3/4/20"]
+
+
+def contact():
+    return InterventionSchedule([(0, 0.0, 0), (18, 0.15, 0), (25, 0.40, 0), (76, 0.20, 0)]).contact_multipliers(N_DAYS)
+
+def inputs(graph):
+    graph.update(
+        S=1000000.0, doubling_time=4.0, recovery_days=14.0, infectious_period=3.0, incubation_period=5.2,
+        relative_contact_rate=0.3, fatal=0.01, schedule=InterventionSchedule([(0, 0.0, 0), (20, 0.3, 0)]),
+        n_days=120, rates=RATES, regional_hosp_share=1.0, hosp_los=7, icu_los=9, vent_los=10, integrator="euler")
+    return graph
+
+def synthetic(n_phases, doubling_time=3.5, fraction=0.2, noise=0.0):
+    """Reported cases from a known run, and a schedule with the same phases at a guessed level."""
+    phase_days = [0] + [15 + 12 * k for k in range(n_phases)]
+    truth = [0.0] + list(np.linspace(0.5, 0.3, n_phases))
+    schedule = InterventionSchedule([(day, level, 0) for day, level in zip(phase_days, truth)])
+    days = np.arange(1, phase_days[-1] + 20)
+    cases = fraction * simulate_reported(
+        POPULATION, np.array([doubling_time]), np.array([truth]), schedule, 5.2, 3.0, 0.01, days)[0]
+    cases *= np.exp(np.random.default_rng(n_phases).normal(0.0, noise, len(cases)))
+    guess = InterventionSchedule([(day, 0.2 if day else 0.0, 0) for day in phase_days])
+    return cases, START + pd.to_timedelta(days, "D"), guess, truth
+
+def dispositions(n_models=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.uniform(0, 50, size=(n_models, 3, HOSPITAL_DAYS + 1)), axis=-1)
+
+def jhu_frame(extra_day=False):
+    """A small JHU US confirmed file: two states, an unassigned row and a county without population."""
+    rows = [
+        (84036029, "New York", "Erie", 36029.0, 42.7, -78.7, [0, 1, 3, 7]),
+        (84036061, "New York", "New York", 36061.0, 40.7, -73.9, [2, 5, 9, 20]),
+        (84090036, "New York", "Unassigned", 90036.0, 0.0, 0.0, [0, 0, 1, 1]),
+        (84006037, "California", "Los Angeles", 6037.0, 34.3, -118.2, [1, 1, 2, 4]),
+        (84006075, "California", "San Francisco", np.nan, 37.7, -122.4, [0, 0, 0, 0]),
+    ]
+    frame = pd.DataFrame({
+        "UID": [row[0] for row in rows], "Province_State": [row[1] for row in rows],
+        "Admin2": [row[2] for row in rows], "FIPS": [row[3] for row in rows],
+        "Lat": [row[4] for row in rows], "Long_": [row[5] for row in rows], "Combined_Key": "",
+    })
+    for k, label in enumerate(DATES):
+        frame[label] = [row[6][k] for row in rows]
+    if extra_day:
+        frame["3/5/20"] = frame["3/4/20"] + 1
+    return frame
@@ -0,0 +1,61 @@
+import numpy as np
+
+from covid_model import InterventionSchedule, sim_seird_decay
+from covid_model.age import (
+    US_AGE_SHARES, age_rates, band_rates, normalized, proportionate, seed_bands, setting_multipliers,
+    stylized_contacts)
+from covid_model.models import sim_seird_decay_age
+from covid_model.rates import intrinsic_growth_rate, seir_beta
+
+
+POPULATION = 1000000.0
+N_DAYS = 120
+SHARES = np.asarray(US_AGE_SHARES) / np.sum(US_AGE_SHARES)
+
+
+def test_proportionate_mixing_reduces_to_the_single_band_model():
+    contact = InterventionSchedule([(0, 0.0, 0), (20, 0.4, 0)]).contact_multipliers(N_DAYS)
+    beta = seir_beta(intrinsic_growth_rate(4.0), 1 / 5.2, 3.0, 1.0)
+    # One setting with every band meeting the others in proportion to their size has spectral radius one
+    matrices = proportionate(SHARES, 1.0)[None]
+    by_band = sim_seird_decay_age(
+        *seed_bands(POPULATION, 100.0, 50.0), 0.0, 0.0, beta, 1 / 3.0, 1 / 5.2, N_DAYS, contact, matrices, 0.01)
+    single = sim_seird_decay(POPULATION - 150, 100.0, 50.0, 0.0, 0.0, beta / POPULATION, 1 / 3.0, 1 / 5.2, N_DAYS,
+                             contact, 0.01)
+    for bands, total in zip(by_band, single):
+        assert bands.shape == (len(SHARES), N_DAYS + 1)
+        np.testing.assert_allclose(bands.sum(axis=0), total, rtol=1e-9)
+        # Every band keeps the same share of each compartment
+        np.testing.assert_allclose(bands, np.outer(SHARES, total), rtol=1e-9, atol=1e-9)
+
+def test_batch_matches_single_scenarios():
+    contacts = normalized(stylized_contacts())
+    closures = setting_multipliers(
+        contacts.settings, {"school": InterventionSchedule([(0, 0.0, 0), (15, 0.9, 0)])}, N_DAYS)
+    seeds = seed_bands(POPULATION, 100.0, 50.0)
+    fatal = band_rates(0.01, [0.0001, 0.0001, 0.001, 0.002, 0.004, 0.01, 0.03, 0.06, 0.1])
+    betas = np.array([0.3, 0.5])
+    batch = sim_seird_decay_age(*seeds, 0.0, 0.0, betas, 1 / 3.0, 1 / 5.2, N_DAYS, np.ones(N_DAYS),
+                                contacts.matrices, fatal, closures)
+    for k, beta in enumerate(betas):
+        single = sim_seird_decay_age(*seeds, 0.0, 0.0, beta, 1 / 3.0, 1 / 5.2, N_DAYS, np.ones(N_DAYS),
+                                     contacts.matrices, fatal, closures)
+        for got, expected in zip(batch, single):
+            np.testing.assert_allclose(got[k], expected, rtol=1e-12)
+    np.testing.assert_allclose(sum(batch).sum(axis=1), POPULATION)
+
+def test_band_rates_average_to_the_overall_rate():
+    hosp, icu, vent = age_rates((0.025, 0.0075, 0.005))
+    np.testing.assert_allclose([SHARES @ hosp, SHARES @ icu, SHARES @ vent], [0.025, 0.0075, 0.005], rtol=1e-3)
+    assert np.all(np.diff(hosp) >= 0)
+    assert band_rates(0.9, [0.0, 1.0], [0.5, 0.5]).max() == 1.0
+
+def test_contact_matrices_are_reciprocal_and_normalized():
+    contacts = stylized_contacts()
+    for matrix in contacts.matrices:
+        np.testing.assert_allclose(SHARES[:, None] * matrix, (SHARES[:, None] * matrix).T, atol=1e-12)
+    total = normalized(contacts).matrices.sum(axis=0)
+    np.testing.assert_allclose(np.abs(np.linalg.eigvals(total)).max(), 1.0)
+    closures = setting_multipliers(contacts.settings, {"work": InterventionSchedule([(0, 0.5, 0)])}, 10)
+    np.testing.assert_allclose(closures[contacts.settings.index("work")], 0.5)
+    np.testing.assert_allclose(np.delete(closures, contacts.settings.index("work"), axis=0), 1.0)
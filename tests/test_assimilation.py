@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from covid_model import assimilation
+from covid_model.assimilation import ParticleFilter, particle_filter, project
+from covid_model.calibration import simulate_reported
+from covid_model.schedule import InterventionSchedule
+
+
+START = pd.Timestamp("2020-03-01")
+POPULATION = 1000000.0
+SETTINGS = (5.2, 3.0, 0.01)
+
+
+def reported_cases(n_days=40, doubling_time=4.0, fraction=0.3):
+    days = np.arange(1, n_days + 1)
+    cases = fraction * simulate_reported(
+        POPULATION, np.array([doubling_time]), np.zeros((1, 1)), InterventionSchedule([(0, 0.0, 0)]), *SETTINGS,
+        days)[0]
+    return np.round(cases), START + pd.to_timedelta(days, "D")
+
+
+def test_posterior_follows_the_reports():
+    cases, dates = reported_cases()
+    particles = ParticleFilter(POPULATION, *SETTINGS, n_particles=4000)
+    assert particles.catch_up(cases, dates, START) == 40
+    posterior = particles.posterior()
+    assert posterior.day == 40 and posterior.history.shape == (41, 5)
+    np.testing.assert_allclose(posterior.weights.sum(), 1.0)
+    expected = posterior.weights @ (posterior.reporting_fraction * posterior.state[2:].sum(axis=0))
+    assert abs(expected / cases[-1] - 1) < 0.15
+    # Compartments still add up to the population
+    np.testing.assert_allclose(posterior.state.sum(axis=0), POPULATION)
+
+def test_new_days_continue_where_the_last_feed_stopped():
+    cases, dates = reported_cases()
+    whole = ParticleFilter(POPULATION, *SETTINGS, n_particles=500, seed=3)
+    whole.catch_up(cases, dates, START)
+    split = ParticleFilter(POPULATION, *SETTINGS, n_particles=500, seed=3)
+    assert split.catch_up(cases[:25], dates[:25], START) == 25
+    assert split.catch_up(cases, dates, START) == 15
+    assert split.catch_up(cases, dates, START) == 0
+    for got, expected in zip(split.posterior(), whole.posterior()):
+        np.testing.assert_array_equal(got, expected)
+
+def test_resampling_keeps_the_particles_and_resets_the_weights():
+    particles = ParticleFilter(POPULATION, *SETTINGS, n_particles=300)
+    particles.log_weights = np.log(np.linspace(1e-6, 1.0, 300))
+    assert particles.effective_size() < 300
+    particles.resample()
+    assert particles.n_particles == 300 and np.isclose(particles.effective_size(), 300)
+    assert particles.reporting_fraction.max() <= 1.0
+
+def test_projection_starts_from_the_last_assimilated_day():
+    cases, dates = reported_cases(20)
+    particles = ParticleFilter(POPULATION, *SETTINGS, n_particles=500)
+    particles.catch_up(cases, dates, START)
+    posterior = particles.posterior()
+    gamma, alpha = 1 / SETTINGS[1], 1 / SETTINGS[0]
+    run = np.array(project(posterior, gamma, alpha, SETTINGS[2], 60))
+    assert run.shape == (5, 61)
+    np.testing.assert_allclose(run[:, 0], posterior.history[-1])
+    np.testing.assert_allclose(run.sum(axis=0), POPULATION)
+    # A horizon shorter than the assimilated history still projects forward
+    assert posterior.day > 10
+    short = np.array(project(posterior, gamma, alpha, SETTINGS[2], 10))
+    np.testing.assert_allclose(short, run[:, :11])
+    assert short[4, -1] > posterior.history[-1, 4]
+
+def test_filters_are_shared_per_location(monkeypatch):
+    monkeypatch.setattr(assimilation, "_filters", assimilation.OrderedDict())
+    monkeypatch.setattr(assimilation, "MAX_FILTERS", 2)
+    first = particle_filter("Erie", START, POPULATION, *SETTINGS, n_particles=10)
+    assert particle_filter("Erie", START, POPULATION, *SETTINGS, n_particles=10) is first
+    particle_filter("Kings", START, POPULATION, *SETTINGS, n_particles=10)
+    particle_filter("Queens", START, POPULATION, *SETTINGS, n_particles=10)
+    assert particle_filter("Erie", START, POPULATION, *SETTINGS, n_particles=10) is not first
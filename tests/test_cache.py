@@ -0,0 +1,84 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model.cache import ResultCache, make_key, memoized, normalize
+
+
+def test_equal_arguments_share_a_key():
+    assert make_key(2.5 / 100, {"b": 1, "a": np.arange(3)}) == make_key(0.025, {"a": np.arange(3), "b": 1})
+    assert make_key(np.arange(3)) != make_key(np.arange(3.0))
+    assert make_key(float("nan")) == make_key(np.nan)
+    assert make_key(pd.Series([1, 2])) != make_key(pd.Series([1, 3]))
+
+def test_closures_and_lambdas_are_keyed_by_what_they_compute():
+    def scaled(k):
+        return lambda x: x * k
+
+    assert make_key(scaled(1)) == make_key(scaled(1))
+    assert make_key(scaled(1)) != make_key(scaled(2))
+    assert make_key(lambda x: x + 1) != make_key(lambda x: x - 1)
+    assert make_key(functools.partial(max, 1)) != make_key(functools.partial(max, 2))
+    assert normalize(np.sum) == normalize(np.sum) != normalize(np.prod)
+    assert normalize(len) == ("callable", "builtins", "len")
+    with pytest.raises(TypeError):
+        make_key(scaled(object()))
+
+def test_bound_methods_include_their_object():
+    class Rate:
+        def __init__(self, value):
+            self.value = value
+
+        def cache_key(self):
+            return self.value
+
+        def times(self, x):
+            return x * self.value
+
+    assert make_key(Rate(1).times) == make_key(Rate(1).times)
+    assert make_key(Rate(1).times) != make_key(Rate(2).times)
+
+def test_cached_arrays_are_read_only_for_other_callers_only():
+    cache = ResultCache()
+    mine = (np.arange(5.0), [np.ones(2)])
+    cache.put("k", mine)
+    assert mine[0].flags.writeable and mine[1][0].flags.writeable
+    shared = cache.get("k")
+    with pytest.raises(ValueError):
+        shared[0][0] = 1.0
+    with pytest.raises(ValueError):
+        shared[1][0][0] = 1.0
+
+def test_frames_come_back_as_copies():
+    cache = ResultCache()
+    cache.put("k", pd.DataFrame({"a": [1, 2]}))
+    frame = cache.get("k")
+    frame["a"] = 0
+    assert cache.get("k")["a"].tolist() == [1, 2]
+
+def test_least_recently_used_entries_are_evicted_first():
+    item = np.zeros(100)
+    cache = ResultCache(max_bytes=3 * (item.nbytes + 112))
+    for key in "abc":
+        cache.put(key, item.copy())
+    cache.get("a")
+    cache.put("d", item.copy())
+    assert "b" not in cache and all(key in cache for key in "acd")
+    cache.put("huge", np.zeros(10000))
+    assert "huge" not in cache
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes, stats.hits) == (3, 3 * (item.nbytes + 112), 1)
+
+def test_memoized_computes_once_per_arguments():
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return np.array([x * x])
+
+    cached = memoized(square, ResultCache())
+    assert cached(3)[0] == cached(3)[0] == 9
+    assert cached(4)[0] == 16
+    assert calls == [3, 4]
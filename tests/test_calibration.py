@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model import InterventionSchedule, calibration
+from covid_model.calibration import FIT_DAYS, SCAN_SWEEPS, calibrate, fitted_phases, simulate_reported
+from conftest import POPULATION, START, synthetic
+
+
+def counted(monkeypatch):
+    """Number of candidates in each batch calibrate simulates."""
+    batches = []
+
+    def simulate(population, doubling_time, *args, **kwargs):
+        batches.append(len(doubling_time))
+        return simulate_reported(population, doubling_time, *args, **kwargs)
+
+    monkeypatch.setattr(calibration, "simulate_reported", simulate)
+    return batches
+
+
+def test_known_parameters_are_recovered():
+    cases, dates, guess, truth = synthetic(2)
+    result = calibrate(cases, dates, START, POPULATION, guess, 5.2, 3.0, 0.01)
+    assert result.phases == (1, 2)
+    assert abs(result.doubling_time - 3.5) < 0.05
+    np.testing.assert_allclose(result.reductions, truth, atol=0.01)
+    assert abs(result.reporting_fraction - 0.2) < 0.01
+    assert result.loss < 1e-4
+    np.testing.assert_allclose(result.fit["fitted"], cases, rtol=0.02)
+
+@pytest.mark.parametrize("n_phases", [1, 2, 3, 4])
+def test_coarse_scan_grows_linearly_with_the_phases(monkeypatch, n_phases):
+    batches = counted(monkeypatch)
+    cases, dates, guess, _ = synthetic(n_phases, noise=0.05)
+    grid_size = 7
+    calibrate(cases, dates, START, POPULATION, guess, 5.2, 3.0, 0.01, grid_size=grid_size)
+    # The scan's batches have grid_size candidates, the compass search's two per parameter
+    n_parameters = 1 + n_phases
+    assert batches.count(grid_size) == SCAN_SWEEPS * n_parameters
+    assert max(batches) == max(grid_size, 2 * n_parameters)
+
+def test_phases_the_reports_cannot_inform_are_left_alone():
+    schedule = InterventionSchedule([(0, 0.1, 0), (10, 0.3, 0), (60, 0.5, 0)])
+    assert fitted_phases(schedule, 40) == (1,)
+    cases, dates, _, _ = synthetic(1)
+    with pytest.raises(ValueError):
+        calibrate(cases[:2], dates[:2], START, POPULATION, schedule, 5.2, 3.0, 0.01)
+
+def test_a_long_feed_is_fitted_over_the_window_only(monkeypatch):
+    cases, dates, guess, _ = synthetic(2)
+    # Three years more of reports, unlike anything the model would give
+    later = dates[-1] + pd.to_timedelta(np.arange(1, 1100), "D")
+    long_cases = np.concatenate([cases, np.full(len(later), cases[-1] * 50)])
+    long_dates = dates.append(later)
+    last_days = []
+
+    def simulate(population, doubling_time, reductions, schedule, *args):
+        last_days.append(args[-1][-1])
+        return simulate_reported(population, doubling_time, reductions, schedule, *args)
+
+    monkeypatch.setattr(calibration, "simulate_reported", simulate)
+    window = calibrate(long_cases, long_dates, START, POPULATION, guess, 5.2, 3.0, 0.01, FIT_DAYS)
+    assert max(last_days) < FIT_DAYS
+    in_window = (long_dates - START).days < FIT_DAYS
+    expected = calibrate(long_cases[in_window], long_dates[in_window], START, POPULATION, guess, 5.2, 3.0, 0.01, None)
+    assert window.doubling_time == expected.doubling_time and window.loss == expected.loss
+    assert window.fit["day"].max() == FIT_DAYS - 1
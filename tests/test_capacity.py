@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+
+from covid_model.capacity import (
+    breach_table, capacity_frame, find_breaches, surge_plan, surge_plan_from_csv)
+
+
+def brute_force(census, capacity):
+    """First day over, length of that first run, days over, peak deficit and its day, one series at a time."""
+    first, duration, days_over, peak, peak_day = -1, 0, 0, 0.0, 0
+    for day, (value, limit) in enumerate(zip(census, capacity)):
+        if value > limit:
+            days_over += 1
+            if first < 0:
+                first = day
+            if first >= 0 and duration == day - first:
+                duration += 1
+            if value - limit > peak:
+                peak, peak_day = value - limit, day
+    return first, duration, days_over, peak, peak_day
+
+
+def test_matches_a_loop_over_every_series():
+    rng = np.random.default_rng(1)
+    census = rng.integers(0, 20, size=(4, 5, 30, 3)).astype(float)
+    capacity = rng.integers(5, 15, size=(30, 3)).astype(float)
+    breaches = find_breaches(census, capacity)
+    for index in np.ndindex(4, 5, 3):
+        draw, category = index[:2], index[2]
+        expected = brute_force(census[draw][:, category], capacity[:, category])
+        assert tuple(np.asarray(field)[draw][category] for field in breaches) == expected
+
+def test_no_breach_and_nan_capacity():
+    census = np.tile([[1.0, 2.0, 3.0]], (10, 1))
+    breaches = find_breaches(census, [np.nan, 5.0, 2.0])
+    assert breaches.first_day.tolist() == [-1, -1, 0]
+    assert breaches.duration.tolist() == [0, 0, 10]
+    assert breaches.peak_deficit.tolist() == [0.0, 0.0, 1.0]
+
+def test_surge_plans():
+    plan = surge_plan([10, 5, 2], [(6, [20, 8, 4]), (3, [15, 5, 2])], 8)
+    np.testing.assert_array_equal(plan[:, 0], [10, 10, 10, 15, 15, 15, 20, 20])
+    from_csv = surge_plan_from_csv(
+        io.StringIO("date,hosp,vent\n2020-04-07,20,4\n2020-04-04,15,\n"), [10, 5, 2], "2020-04-01", 8)
+    np.testing.assert_array_equal(from_csv[:, 0], plan[:, 0])
+    np.testing.assert_array_equal(from_csv[:, 1], 5)
+    np.testing.assert_array_equal(from_csv[:, 2], [2] * 6 + [4] * 2)
+    frame = capacity_frame([10, 5, 2], 4)
+    assert frame.shape == (4, 4) and frame["icu"].tolist() == [5.0] * 4
+
+def test_breach_table():
+    census = np.zeros((2, 10, 3))
+    census[1, 4:7, 1] = 9
+    table = breach_table(find_breaches(census, [5, 5, 5]), ["Low", "High"], "2020-04-01")
+    assert table[["name", "category"]].values.tolist()[:4] == [["Low", "hosp"], ["Low", "icu"], ["Low", "vent"],
+                                                                  ["High", "hosp"]]
+    row = table.iloc[4]
+    assert (row["first_day"], row["duration"], row["days_over"], row["peak_deficit"]) == (4, 3, 3, 4.0)
+    assert str(row["first_date"]) == "2020-04-05"
+    assert table["first_date"].isna().sum() == 5
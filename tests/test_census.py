@@ -0,0 +1,62 @@
+import numpy as np
+
+from covid_model.census import (
+    convolve_census, empirical_survival, gamma_survival, mean_length_of_stay, pmf_survival, point_mass_survival,
+    window_census)
+
+
+def admissions(shape=(3, 150), seed=0):
+    return np.random.default_rng(seed).gamma(2.0, 20.0, shape)
+
+def direct_census(admits, curve):
+    """Census as the explicit sum over each day's earlier admissions."""
+    return np.array([
+        sum(admits[t - k] * curve[k] for k in range(min(len(curve), t + 1))) for t in range(len(admits))])
+
+
+def test_window_census_is_the_point_mass_convolution():
+    admits = admissions()
+    census = window_census(admits, (7, 9, 0))
+    for k, los in enumerate((7, 9)):
+        np.testing.assert_allclose(census[k], direct_census(admits[k], point_mass_survival(los)))
+    assert not census[2].any()
+
+def test_fft_and_window_sums_round_to_the_same_census():
+    admits = admissions((5, 3, 150))
+    windows = convolve_census(admits, (7, 9, 5))
+    curves = convolve_census(admits, tuple(point_mass_survival(los) for los in (7, 9, 5)))
+    np.testing.assert_array_equal(windows, curves)
+
+def test_survival_curves_convolve_like_the_direct_sum():
+    admits = admissions()
+    curve = gamma_survival(7.0, 2.0, 200)
+    census = convolve_census(admits, (curve, 9, curve))
+    np.testing.assert_array_equal(census[0], np.ceil(np.round(direct_census(admits[0], curve), 6)))
+    np.testing.assert_array_equal(census[1], convolve_census(admits, (7, 9, 5))[1])
+
+def test_gamma_survival_keeps_its_mean():
+    for mean, shape in ((7.0, 2.0), (4.5, 1.0), (12.0, 6.0)):
+        # Rounding stays up to whole days adds about half a day
+        assert abs(mean_length_of_stay(gamma_survival(mean, shape, 400)) - (mean + 0.5)) < 0.05
+    assert mean_length_of_stay(9) == 9.0
+
+def test_empirical_survival_from_stays():
+    np.testing.assert_allclose(empirical_survival([1, 2, 2, 4, np.nan]), [1.0, 0.75, 0.25, 0.25])
+    np.testing.assert_allclose(pmf_survival([0, 0, 0, 1]), point_mass_survival(3))
+    # Partial days round up to a whole one
+    np.testing.assert_allclose(empirical_survival([0.5, 1.5]), empirical_survival([1, 2]))
+
+def test_nan_admissions_count_as_none():
+    admits = admissions()
+    admits[:, 0] = np.nan
+    cleaned = np.where(np.isnan(admits), 0.0, admits)
+    np.testing.assert_array_equal(convolve_census(admits, (7, 9, 5)), convolve_census(cleaned, (7, 9, 5)))
+    curve = gamma_survival(7.0, 2.0, 200)
+    np.testing.assert_array_equal(convolve_census(admits, (curve,) * 3), convolve_census(cleaned, (curve,) * 3))
+
+def test_per_hospital_lengths_of_stay():
+    admits = admissions((4, 3, 150))
+    los = np.array([[7, 9, 5], [3, 4, 2], [7, 9, 5], [30, 1, 0]])
+    census = window_census(admits, los)
+    for h in range(4):
+        np.testing.assert_allclose(census[h], window_census(admits[h], los[h]))
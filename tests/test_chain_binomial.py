@@ -0,0 +1,45 @@
+import numpy as np
+
+from covid_model import InterventionSchedule, sim_seird_decay
+from covid_model.models import sim_seird_chain_binomial
+from covid_model.rates import intrinsic_growth_rate, seir_beta
+from covid_model.uncertainty import REPLICATE_BLOCK, run_chain_binomial_ensemble
+
+
+POPULATION = 200000
+N_DAYS = 60
+GAMMA, ALPHA, FATAL = 1 / 3.0, 1 / 5.2, 0.01
+BETA = seir_beta(intrinsic_growth_rate(4.0), ALPHA, 3.0, POPULATION)
+CONTACT = InterventionSchedule([(0, 0.0, 0), (30, 0.4, 0)]).contact_multipliers(N_DAYS)
+
+
+def test_replicates_count_whole_people_and_lose_none():
+    runs = sim_seird_chain_binomial(
+        POPULATION - 150, 100, 50, 0, 0, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, 50, np.random.default_rng(0))
+    assert all(run.shape == (50, N_DAYS + 1) and run.dtype == np.int64 for run in runs)
+    assert (sum(runs) == POPULATION).all()
+    assert all((run >= 0).all() for run in runs)
+    # Nobody recovers back into susceptible or is revived
+    assert (np.diff(runs[0], axis=1) <= 0).all() and (np.diff(runs[4], axis=1) >= 0).all()
+
+def test_mean_follows_the_deterministic_model():
+    runs = sim_seird_chain_binomial(
+        POPULATION - 150, 100, 50, 0, 0, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, 4000, np.random.default_rng(1))
+    expected = sim_seird_decay(POPULATION - 150, 100.0, 50.0, 0.0, 0.0, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL)
+    ever = (runs[2] + runs[3] + runs[4]).mean(axis=0)
+    np.testing.assert_allclose(ever, expected[2] + expected[3] + expected[4], rtol=0.05)
+
+def test_ensemble_does_not_depend_on_the_worker_count():
+    n_replicates = 2 * REPLICATE_BLOCK + 7
+    args = (POPULATION, 100, 50, BETA, GAMMA, ALPHA, FATAL, CONTACT, (0.025, 0.0075, 0.005), N_DAYS, (7, 9, 10))
+    serial = run_chain_binomial_ensemble(*args, n_replicates=n_replicates, seed=5, workers=1)
+    threaded = run_chain_binomial_ensemble(*args, n_replicates=n_replicates, seed=5, workers=4)
+    np.testing.assert_array_equal(serial.admits, threaded.admits)
+    np.testing.assert_array_equal(serial.census, threaded.census)
+    assert serial.admits.shape == serial.census.shape == (n_replicates, N_DAYS, 3)
+    assert not serial.admits[:, 0].any()
+    assert (serial.admits == np.round(serial.admits)).all()
+    # Whole patients stay whole in the census
+    assert (serial.census == np.round(serial.census)).all()
+    different = run_chain_binomial_ensemble(*args, n_replicates=n_replicates, seed=6, workers=1)
+    assert not np.array_equal(serial.admits, different.admits)
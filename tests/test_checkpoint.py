@@ -0,0 +1,53 @@
+import numpy as np
+
+from covid_model import InterventionSchedule, checkpoint, sim_seird_decay
+from covid_model.cache import ResultCache
+from covid_model.checkpoint import sim_seird_decay_checkpointed
+
+
+N_DAYS = 365
+START = (1000000.0 - 150, 100.0, 50.0, 0.0, 0.0)
+RATES = (0.5, 1 / 3, 1 / 5.2)
+BOUNDARIES = (20, 60, 180)
+
+
+def contact(level, early=0.3, n_days=N_DAYS):
+    return InterventionSchedule([(0, 0.0, 0), (20, early, 0), (60, 0.5, 0), (180, level, 0)]).contact_multipliers(n_days)
+
+def run(multipliers, cache, n_days=N_DAYS):
+    return sim_seird_decay_checkpointed(*START, *RATES, n_days, multipliers, 0.01, BOUNDARIES, cache)
+
+def counted(monkeypatch):
+    """Days simulated by each call to sim_seird_decay from the checkpointed runs."""
+    days = []
+
+    def sim(*args, **kwargs):
+        days.append(args[8])
+        return sim_seird_decay(*args, **kwargs)
+
+    monkeypatch.setattr(checkpoint, "sim_seird_decay", sim)
+    return days
+
+
+def test_resumed_runs_match_runs_from_day_zero():
+    cache = ResultCache()
+    for multipliers in (contact(0.1), contact(0.6), contact(0.6, early=0.2), contact(0.2)):
+        resumed = run(multipliers, cache)
+        full = sim_seird_decay(*START, *RATES, N_DAYS, multipliers, 0.01)
+        for got, expected in zip(resumed, full):
+            np.testing.assert_array_equal(got, expected)
+
+def test_only_days_after_the_changed_phase_are_simulated(monkeypatch):
+    days, cache = counted(monkeypatch), ResultCache()
+    run(contact(0.1), cache)
+    run(contact(0.4), cache)
+    run(contact(0.4, early=0.2), cache)
+    # From day 0, from the end date, then from the first phase
+    assert days == [N_DAYS, N_DAYS - 180, N_DAYS - 20]
+
+def test_a_longer_horizon_resumes_from_the_last_boundary_it_covers(monkeypatch):
+    days, cache = counted(monkeypatch), ResultCache()
+    run(contact(0.1, n_days=100), cache, n_days=100)
+    resumed = run(contact(0.1), cache)
+    assert days == [100, N_DAYS - 60]
+    np.testing.assert_array_equal(resumed[2], sim_seird_decay(*START, *RATES, N_DAYS, contact(0.1), 0.01)[2])
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from covid_model import county_store
+from covid_model.county_store import CountyStore, build_county_store, open_county_store, parse_date_columns
+from covid_model.jhu import confirmed_cases_frame
+from conftest import DATES, jhu_frame
+
+
+POPULATIONS = pd.Series({84036029: 918702.0, 84036061: 1628706.0, 84006037: 10039107.0})
+
+
+def test_lookups_and_rollups(tmp_path):
+    frame = jhu_frame()
+    build_county_store(frame, str(tmp_path), POPULATIONS)
+    store = CountyStore(str(tmp_path))
+    assert list(store.dates) == list(pd.to_datetime(DATES, format="%m/%d/%y"))
+    np.testing.assert_array_equal(store.county(36029), [0, 1, 3, 7])
+    np.testing.assert_array_equal(store.county_by_name("California", "Los Angeles"), [1, 1, 2, 4])
+    np.testing.assert_array_equal(store.state("New York"), frame[frame.Province_State == "New York"][DATES].sum())
+    np.testing.assert_array_equal(store.national(), frame[DATES].sum())
+    assert store.states() == ["California", "New York"]
+    assert store.counties("New York") == ["Erie", "New York"]
+    assert store.population("New York", "Erie") == 918702.0
+    assert store.population("New York") == 918702.0 + 1628706.0
+    assert np.isnan(store.population("California", "San Francisco"))
+    assert store.is_county().tolist() == [True, True, False, True, False]
+    assert store.rows("New York").tolist() == [0, 1, 2]
+    assert store.rows("California", "Los Angeles").tolist() == [3]
+    assert store.rows("Texas").tolist() == [] and store.rows().tolist() == [0, 1, 2, 3, 4]
+    assert np.isnan(store.lat[2])
+    assert store.window("3/2/20", "3/3/20") == slice(1, 3)
+    assert store.first_case_date(store.county(36029)) == pd.Timestamp("2020-03-02")
+    assert store.first_case_date(store.county_by_name("California", "San Francisco")) is None
+
+def test_versions_are_built_once_and_kept_while_recent(tmp_path, monkeypatch):
+    monkeypatch.setattr(county_store, "_stores", {})
+    root = str(tmp_path)
+    loads = []
+
+    def load(extra_day=False):
+        def load_frame():
+            loads.append(extra_day)
+            return jhu_frame(extra_day)
+        return load_frame
+
+    first = open_county_store(root, "v1", load())
+    assert open_county_store(root, "v1", load()) is first
+    second = open_county_store(root, "v2", load(extra_day=True))
+    assert loads == [False, True]
+    assert len(second.dates) == 5
+    # The earlier version is still on disk for sessions that have it mapped
+    np.testing.assert_array_equal(first.county(36029), [0, 1, 3, 7])
+    assert len(CountyStore(first.directory).dates) == 4
+
+    for version in range(3, 3 + county_store.KEEP_STORES):
+        open_county_store(root, "v{}".format(version), load())
+    kept = sorted(path.name for path in tmp_path.iterdir())
+    assert len(kept) == county_store.KEEP_STORES
+    assert not (tmp_path / first.directory.rsplit("/", 1)[1]).exists()
+
+def test_previous_store_on_disk_is_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(county_store, "_stores", {})
+    open_county_store(str(tmp_path), "v1", jhu_frame)
+    monkeypatch.setattr(county_store, "_stores", {})
+    store = open_county_store(str(tmp_path), "v1", lambda: (_ for _ in ()).throw(AssertionError("rebuilt")))
+    assert len(store.dates) == 4
+
+def test_date_columns_are_found_by_parsing_labels():
+    columns = ["UID", "Admin2", "1/22/20", "Combined_Key", "12/31/20", "13/1/20", "2/1/21"]
+    positions, dates = parse_date_columns(columns)
+    assert positions.tolist() == [2, 4, 6]
+    assert list(dates) == [pd.Timestamp("2020-01-22"), pd.Timestamp("2020-12-31"), pd.Timestamp("2021-02-01")]
+
+def test_known_labels_are_not_parsed_again():
+    # A known label is trusted as given, which shows it was looked up rather than parsed
+    known = {"1/22/20": np.datetime64("1999-01-01")}
+    positions, dates = parse_date_columns(["UID", "1/22/20", "1/23/20"], known)
+    assert positions.tolist() == [1, 2]
+    assert list(dates) == [pd.Timestamp("1999-01-01"), pd.Timestamp("2020-01-23")]
+
+def test_incremental_build_keeps_corrections_to_past_days(tmp_path):
+    build_county_store(jhu_frame(), str(tmp_path / "v1"))
+    previous = CountyStore(str(tmp_path / "v1"))
+    frame = jhu_frame(extra_day=True)
+    frame.loc[0, "3/2/20"] = 2
+    build_county_store(frame, str(tmp_path / "v2"), previous=previous)
+    store = CountyStore(str(tmp_path / "v2"))
+    assert store.date_labels() == dict(previous.date_labels(), **{"3/5/20": np.datetime64("2020-03-05")})
+    np.testing.assert_array_equal(store.county(36029), [0, 2, 3, 7, 8])
+
+def test_confirmed_cases_window(tmp_path):
+    frame = jhu_frame(extra_day=True)
+    build_county_store(frame, str(tmp_path))
+    store = CountyStore(str(tmp_path))
+    cases = confirmed_cases_frame(store, datetime(2020, 3, 2))
+    assert cases["day"].tolist() == [0, 1, 2, 3]
+    assert cases["Date"].iloc[-1] == pd.Timestamp("2020-03-05")
+    np.testing.assert_allclose(cases["Erie"], np.array([1, 3, 7, 8]) / 1500000 * 100)
+    assert len(confirmed_cases_frame(store, None, datetime(2020, 3, 2))) == 2
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from covid_model import sum_dispositions
+from covid_model.cache import ResultCache
+from covid_model.graph import Graph
+
+
+def pipeline(graph, calls):
+    def doubled(x):
+        calls.append("doubled")
+        return 2 * x
+
+    def total(d, y):
+        calls.append("total")
+        return d + y
+
+    graph.update(x=1, y=10)
+    graph.node("doubled", doubled, "x")
+    graph.node("total", total, "doubled", "y")
+
+
+def test_only_nodes_downstream_of_a_change_are_recomputed():
+    graph, calls = Graph(), []
+    pipeline(graph, calls)
+    assert graph.get("total") == 12
+    graph.begin()
+    pipeline(graph, calls)
+    graph.set("y", 20)
+    assert graph.get("total") == 22
+    assert graph.computed == ["total"]
+    assert calls == ["doubled", "total", "total"]
+    assert graph.is_current("doubled") and graph.is_current("total")
+
+def test_a_changed_node_function_is_recomputed():
+    graph = Graph()
+    graph.set("x", 3)
+    graph.node("f", lambda x: x + 1, "x")
+    assert graph.get("f") == 4
+    before = graph.fingerprint("f")
+    graph.node("f", lambda x: x + 1, "x")
+    assert graph.fingerprint("f") == before and graph.is_current("f")
+    graph.node("f", lambda x: x * 10, "x")
+    assert graph.fingerprint("f") != before
+    assert graph.get("f") == 30
+
+def test_shared_nodes_are_found_by_other_graphs():
+    cache = ResultCache()
+    first, second, calls = Graph(cache), Graph(cache), []
+    for graph in (first, second):
+        graph.set("x", np.arange(3.0))
+        graph.node("squares", lambda x: calls.append(1) or x ** 2, "x", shared=True)
+    np.testing.assert_array_equal(first.get("squares"), second.get("squares"))
+    assert len(calls) == 1 and second.computed == []
+
+def test_inputs_and_nodes_have_distinct_names():
+    graph = Graph()
+    graph.set("x", 1)
+    with pytest.raises(ValueError):
+        graph.node("x", lambda: 1)
+    with pytest.raises(KeyError):
+        graph.get("missing")
+
+def test_dispositions_sum_every_compartment_per_category():
+    compartments = (np.arange(5.0), np.ones(5), np.full(5, 2.0))
+    hosp, icu, vent = sum_dispositions(compartments, (0.1, 0.02, 0.01), 0.5)
+    total = sum(compartments)
+    np.testing.assert_allclose(hosp, total * 0.1 * 0.5)
+    np.testing.assert_allclose(icu, total * 0.02 * 0.5)
+    np.testing.assert_allclose(vent, total * 0.01 * 0.5)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from covid_model.hospital import (
+    CATEGORIES, PPE_COLUMNS, PpeRates, admissions_frame, build_admissions_array, build_admissions_df,
+    build_census_df, build_hospital_tables, census_frame)
+from conftest import HOSPITAL_DAYS, dispositions
+
+
+LENGTHS_OF_STAY = (7, 9, 10)
+
+
+def test_tables_match_the_frame_builders():
+    ppe = PpeRates(10, 12, 20, 30)
+    disp = dispositions()
+    tables = build_hospital_tables(disp, LENGTHS_OF_STAY, ppe)
+    assert tables.admits.shape == (3, HOSPITAL_DAYS, 3)
+    assert tables.ppe.shape == (3, HOSPITAL_DAYS, len(PPE_COLUMNS))
+    for k in range(len(disp)):
+        admits_df = build_admissions_df(tuple(disp[k]), HOSPITAL_DAYS)
+        pd.testing.assert_frame_equal(admissions_frame(tables.admits[k]), admits_df)
+        census_df = build_census_df(admits_df, LENGTHS_OF_STAY, HOSPITAL_DAYS, ppe)
+        table = census_frame(np.arange(HOSPITAL_DAYS), tuple(tables.census[k].T), HOSPITAL_DAYS, ppe)
+        pd.testing.assert_frame_equal(table, census_df, check_dtype=False)
+
+def test_admissions_are_daily_differences():
+    disp = dispositions(1)[0]
+    admits = build_admissions_array(disp)
+    assert admits.shape == (3, HOSPITAL_DAYS)
+    np.testing.assert_array_equal(admits[:, 0], 0.0)
+    np.testing.assert_allclose(admits[:, 1:], np.diff(disp[:, :-1], axis=-1))
+    frame = admissions_frame(admits.T)
+    assert list(frame.columns) == ["day"] + list(CATEGORIES)
+    assert frame[list(CATEGORIES)].iloc[[0, -1]].isna().all().all()
+
+def test_leading_axes_are_independent():
+    disp = dispositions(4).reshape(2, 2, 3, HOSPITAL_DAYS + 1)
+    tables = build_hospital_tables(disp, LENGTHS_OF_STAY)
+    single = build_hospital_tables(disp[1, 0], LENGTHS_OF_STAY)
+    for batch, one in zip(tables, single):
+        np.testing.assert_array_equal(batch[1, 0], one)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from covid_model import sim_seir_decay, sim_seird_decay
+from covid_model.integrators import dopri5_day, rk4_day, seird_rhs, sim_seir_ode, sim_seird_ode
+
+
+POPULATION = 1000000.0
+N_DAYS = 120
+START = (POPULATION - 150, 100.0, 50.0, 0.0, 0.0)
+BETA, GAMMA, ALPHA, FATAL = 0.6 / POPULATION, 1 / 3.0, 1 / 5.2, 0.01
+CONTACT = np.where(np.arange(N_DAYS) < 30, 1.0, 0.6)
+
+
+def reference(method="rk4", steps_per_day=64):
+    return np.array(sim_seird_ode(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, method, steps_per_day))
+
+
+def test_rk4_converges_at_fourth_order():
+    exact = reference(steps_per_day=256)
+    errors = [np.abs(reference(steps_per_day=n) - exact).max() for n in (2, 4)]
+    assert 12 < errors[0] / errors[1] < 20
+
+def test_dormand_prince_agrees_with_fine_rk4():
+    exact = reference(steps_per_day=64)
+    adaptive = np.array(sim_seird_ode(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, "dopri5", rtol=1e-8,
+                                      atol=1e-8))
+    np.testing.assert_allclose(adaptive, exact, rtol=1e-6, atol=1e-3)
+    np.testing.assert_allclose(adaptive.sum(axis=0), POPULATION)
+
+def test_euler_is_the_daily_kernel():
+    euler = sim_seird_ode(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, "euler")
+    for got, expected in zip(euler, sim_seird_decay(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL)):
+        np.testing.assert_array_equal(got, expected)
+    with pytest.raises(ValueError):
+        sim_seird_ode(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, "midpoint")
+
+def test_batch_matches_single_runs():
+    betas = np.array([0.4, 0.6]) / POPULATION
+    for method in ("rk4", "dopri5"):
+        batch = sim_seird_ode(*START, betas, GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, method)
+        single = sim_seird_ode(*START, betas[1], GAMMA, ALPHA, N_DAYS, CONTACT, FATAL, method)
+        assert batch[0].shape == (2, N_DAYS + 1)
+        np.testing.assert_allclose(batch[2][1], single[2], rtol=1e-5, atol=1e-3)
+
+def test_zero_period_raises_instead_of_looping():
+    y = np.array(START)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = np.float64(1.0) / np.float64(0.0)
+        with pytest.raises(FloatingPointError):
+            dopri5_day(y, np.array([BETA]), gamma, ALPHA, FATAL, 0.25, 1e-6, 1e-6)
+        with pytest.raises(FloatingPointError):
+            sim_seird_ode(*START, BETA, gamma, ALPHA, N_DAYS, CONTACT, FATAL, "dopri5")
+
+def test_step_count_is_bounded():
+    y = np.array(START)[:, None]
+    with pytest.raises(FloatingPointError):
+        dopri5_day(y, np.array([BETA]), 50.0, ALPHA, FATAL, 0.25, 1e-14, 1e-14, max_steps=20)
+    _, _, steps = dopri5_day(y, np.array([BETA]), GAMMA, ALPHA, FATAL, 0.25, 1e-6, 1e-6)
+    assert steps < 20
+    np.testing.assert_allclose(rk4_day(y, BETA, GAMMA, ALPHA, FATAL, 8).sum(), POPULATION)
+    np.testing.assert_allclose(seird_rhs(y, BETA, GAMMA, ALPHA, FATAL).sum(), 0.0, atol=1e-9)
+
+def test_seir_is_seird_without_deaths():
+    for got, expected in zip(
+            sim_seir_ode(*START[:4], BETA, GAMMA, ALPHA, N_DAYS, CONTACT, "euler"),
+            sim_seir_decay(*START[:4], BETA, GAMMA, ALPHA, N_DAYS, CONTACT)):
+        np.testing.assert_array_equal(got, expected)
+    for method in ("rk4", "dopri5"):
+        seir = sim_seir_ode(*START[:4], BETA, GAMMA, ALPHA, N_DAYS, CONTACT, method)
+        seird = sim_seird_ode(*START, BETA, GAMMA, ALPHA, N_DAYS, CONTACT, 0.0, method)
+        assert len(seir) == 4
+        for got, expected in zip(seir, seird):
+            np.testing.assert_allclose(got, expected)
+    batch = sim_seir_ode(*START[:4], np.array([BETA, 2 * BETA]), GAMMA, ALPHA, N_DAYS, CONTACT, "euler")
+    assert batch[0].shape == (2, N_DAYS + 1)
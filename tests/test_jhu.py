@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from covid_model import county_store, jhu, store
+from covid_model.jhu import CaseDataRefresher
+
+from conftest import jhu_frame
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """A local US county file that jhu reads in place of GitHub."""
+    path = tmp_path / "time_series_covid19_confirmed_US.csv"
+    jhu_frame().to_csv(str(path), index=False)
+    os.utime(str(path), (1000000000, 1000000000))
+    monkeypatch.setattr(jhu, "CONFIRMED_US_URL", str(path))
+    monkeypatch.setattr(jhu, "JHU_LOOKUP_URL", str(tmp_path / "missing.csv"))
+    monkeypatch.setattr(jhu, "JHU_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(store, "_stores", {})
+    monkeypatch.setattr(county_store, "_stores", {})
+    return path
+
+
+def test_snapshot_is_built_once_and_kept_while_unchanged(source):
+    refresher = CaseDataRefresher(interval=3600.0)
+    try:
+        first = refresher.snapshot()
+        assert refresher.snapshot() is first
+        assert first.checked_at is not None
+        assert len(first.result) == len(first.counties.dates)
+        refreshed = refresher.refresh()
+        assert refreshed.counties is first.counties and refreshed.result is first.result
+        assert refreshed.checked_at >= first.checked_at
+    finally:
+        refresher.stop()
+
+def test_new_version_is_swapped_in_whole(source):
+    refresher = CaseDataRefresher(interval=3600.0)
+    try:
+        first = refresher.snapshot()
+        jhu_frame(extra_day=True).to_csv(str(source), index=False)
+        os.utime(str(source), (1000000100, 1000000100))
+        second = refresher.refresh()
+        assert refresher.snapshot() is second
+        assert len(second.counties.dates) == len(second.result) == 5
+        # Sessions holding the old snapshot keep a consistent old version
+        assert len(first.counties.dates) == len(first.result) == 4
+    finally:
+        refresher.stop()
+
+def test_revalidation_is_due_after_the_interval(source):
+    refresher = CaseDataRefresher(interval=3600.0)
+    assert refresher._delay() == 0.0
+    try:
+        refresher.snapshot()
+        assert 3590.0 < refresher._delay() <= 3600.0
+    finally:
+        refresher.stop()
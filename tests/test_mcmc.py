@@ -0,0 +1,42 @@
+import numpy as np
+
+from covid_model.mcmc import credible_intervals, posterior_draws, sample_posterior, stretch_sampler
+
+from conftest import POPULATION, START, synthetic
+
+
+COVARIANCE = np.array([[1.0, 0.8], [0.8, 2.0]])
+
+
+def gaussian(points):
+    return -0.5 * np.einsum("ij,jk,ik->i", points, np.linalg.inv(COVARIANCE), points)
+
+
+def test_stretch_moves_sample_a_correlated_gaussian():
+    start = np.random.default_rng(0).normal(0.0, 0.1, (64, 2))
+    chain, log_probs, acceptance = stretch_sampler(gaussian, start, 1500, seed=1)
+    assert chain.shape == (1500, 64, 2) and log_probs.shape == (1500, 64)
+    kept = chain[500:].reshape(-1, 2)
+    np.testing.assert_allclose(kept.mean(axis=0), 0.0, atol=0.15)
+    np.testing.assert_allclose(np.cov(kept.T), COVARIANCE, rtol=0.15)
+    assert 0.3 < acceptance < 0.9
+    np.testing.assert_array_equal(stretch_sampler(gaussian, start, 20, seed=1)[0], chain[:20])
+
+def test_walkers_stay_where_the_density_is_positive():
+    box = lambda points: np.where(np.all(np.abs(points) <= 1.0, axis=1), 0.0, -np.inf)
+    start = np.random.default_rng(0).uniform(-0.1, 0.1, (32, 3))
+    chain, _, _ = stretch_sampler(box, start, 300, seed=2)
+    assert np.abs(chain).max() <= 1.0
+    # A flat box is filled out, not left at the starting ball
+    assert chain[-1].std(axis=0).min() > 0.3
+
+def test_posterior_covers_the_parameters_reports_came_from():
+    cases, dates, guess, truth = synthetic(1, noise=0.05)
+    chain = sample_posterior(cases, dates, START, POPULATION, guess, 5.2, 3.0, 0.01, n_walkers=32, n_steps=300)
+    assert chain.names == ("doubling_time", "reduction_1", "reporting_fraction", "sigma")
+    draws, reductions = posterior_draws(chain, 2000, seed=0)
+    assert reductions.shape == (2000, 2) and not reductions[:, 0].any()
+    intervals = credible_intervals(draws)
+    for name, value in (("doubling_time", 3.5), ("reduction_1", truth[1]), ("reporting_fraction", 0.2)):
+        assert intervals.loc[name, "p2.5"] <= value <= intervals.loc[name, "p97.5"], name
+    assert 0.02 < intervals.loc["sigma", "p50"] < 0.1
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from covid_model import sim_seird_decay
+from covid_model.metapop import (
+    MetapopRun, SparseMatrix, aggregation, gravity_mobility, location_totals, mobility_from_flows, rollup,
+    sim_seird_metapop)
+
+
+N_DAYS = 100
+
+
+def dense(matrix):
+    out = np.zeros(matrix.shape)
+    np.add.at(out, (matrix.row_ids(), matrix.indices), matrix.data)
+    return out
+
+def patches(n=4):
+    population = np.linspace(50000.0, 200000.0, n)
+    exposed, infected = np.full(n, 100.0), np.full(n, 50.0)
+    exposed[1:] = infected[1:] = 0.0
+    return population - exposed - infected, exposed, infected, np.zeros(n), np.zeros(n)
+
+
+def test_sparse_products_match_dense():
+    rng = np.random.default_rng(0)
+    rows, cols = rng.integers(0, 6, 40), rng.integers(0, 5, 40)
+    rows[rows == 3] = 2
+    values = rng.random(40)
+    matrix = SparseMatrix.from_triplets(rows, cols, values, (6, 5))
+    expected = np.zeros((6, 5))
+    np.add.at(expected, (rows, cols), values)
+    np.testing.assert_allclose(dense(matrix), expected)
+    x, block = rng.random(5), rng.random((5, 3))
+    np.testing.assert_allclose(matrix.dot(x), expected @ x)
+    np.testing.assert_allclose(matrix.dot(block), expected @ block)
+    np.testing.assert_allclose(dense(matrix.transpose()), expected.T)
+    np.testing.assert_allclose(matrix.row_sums(), expected.sum(axis=1))
+    assert not SparseMatrix.from_triplets([], [], [], (2, 2)).dot(np.ones(2)).any()
+
+def test_mobility_rows_sum_to_one():
+    flows = mobility_from_flows(4, [0, 0, 1, 1], [0, 1, 1, 0], [90.0, 10.0, 30.0, 10.0])
+    np.testing.assert_allclose(dense(flows), [[0.9, 0.1, 0, 0], [0.25, 0.75, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(30, 45, 50), rng.uniform(-120, -75, 50)
+    lat[7] = np.nan
+    gravity = gravity_mobility(lat, lon, rng.uniform(1e4, 1e6, 50), neighbours=5, travel=0.1)
+    np.testing.assert_allclose(gravity.row_sums(), 1.0)
+    assert dense(gravity)[7, 7] == 1.0 and not dense(gravity)[:, 7].sum() - 1.0
+    assert np.allclose(np.diag(dense(gravity))[np.arange(50) != 7], 0.9)
+
+def test_uncoupled_patches_are_independent_runs():
+    s, e, i, r, d = patches()
+    population = s + e + i + r + d
+    beta, contact = 0.6, np.linspace(1.0, 0.5, N_DAYS)
+    home = SparseMatrix.from_triplets(np.arange(4), np.arange(4), np.ones(4), (4, 4))
+    run = sim_seird_metapop(s, e, i, r, d, beta, 1 / 3, 1 / 5.2, N_DAYS, contact, 0.01, home)
+    for k in range(4):
+        single = sim_seird_decay(s[k], e[k], i[k], r[k], d[k], beta / population[k], 1 / 3, 1 / 5.2, N_DAYS,
+                                 contact, 0.01)
+        for got, expected in zip(run, single):
+            np.testing.assert_allclose(got[k], expected, rtol=1e-9, atol=1e-9)
+    # Unseeded patches stay uninfected without travel
+    assert not run[2][1:].any()
+
+def test_coupling_spreads_infection_and_conserves_people():
+    s, e, i, r, d = patches()
+    mobility = mobility_from_flows(4, [0, 0, 1, 1, 2, 2, 3], [0, 1, 1, 2, 2, 3, 3], [9, 1, 9, 1, 9, 1, 1])
+    run = sim_seird_metapop(s, e, i, r, d, 0.6, 1 / 3, 1 / 5.2, N_DAYS, np.ones(N_DAYS), 0.01, mobility)
+    np.testing.assert_allclose(sum(run), np.repeat((s + e + i + r + d)[:, None], N_DAYS + 1, axis=1))
+    assert (run[3][:, -1] > 0).all()
+
+def test_rollups_sum_patches_by_group():
+    rng = np.random.default_rng(2)
+    compartments = [rng.random((5, 11)) for _ in range(5)]
+    run = MetapopRun(np.array([3, 4, 8, 9, 12]), np.array(["NY", "CA", "NY", "CA", "TX"]), *compartments)
+    names, totals = rollup(run)
+    assert names == ["CA", "NY", "TX"]
+    np.testing.assert_allclose(totals[2][1], compartments[2][[0, 2]].sum(axis=0))
+    matrix, _ = aggregation(["b", "a", "b"], ["a", "b"])
+    np.testing.assert_allclose(dense(matrix), [[0, 1, 0], [1, 0, 1]])
+    np.testing.assert_allclose(location_totals(run, np.array([4, 9]))[0], compartments[0][[1, 3]].sum(axis=0))
+
+def test_location_totals_rescale_to_the_given_population():
+    compartments = [np.full((2, 3), value) for value in (60.0, 10.0, 20.0, 5.0, 5.0)]
+    run = MetapopRun(np.array([1, 2]), np.array(["NY", "NY"]), *compartments)
+    totals = location_totals(run, np.array([1, 2]), 50.0)
+    assert sum(compartment[0] for compartment in totals) == pytest.approx(50.0)
+    np.testing.assert_allclose(totals[2], 10.0)
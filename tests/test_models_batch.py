@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from covid_model import sim_seird_decay, sim_seird_decay_batch
+from conftest import N_DAYS, POPULATION, contact
+
+
+def scalar_run(beta, gamma=1 / 3, alpha=1 / 5.2, fatal=0.006, multipliers=None):
+    multipliers = contact() if multipliers is None else multipliers
+    return sim_seird_decay(
+        POPULATION - 150, 100.0, 50.0, 0.0, 0.0, beta, gamma, alpha, N_DAYS, multipliers, fatal)
+
+
+def test_batch_matches_scalar_runs_exactly():
+    betas = np.array([0.4, 0.6, 0.9]) / POPULATION
+    fatals = np.array([0.003, 0.006, 0.02])
+    batch = sim_seird_decay_batch(
+        POPULATION - 150, 100.0, 50.0, 0.0, 0.0, betas, 1 / 3, 1 / 5.2, N_DAYS, contact(), fatals)
+    for k, (beta, fatal) in enumerate(zip(betas, fatals)):
+        for batched, scalar in zip(batch, scalar_run(beta, fatal=fatal)):
+            assert np.max(np.abs(batched[k] - scalar)) == 0.0
+
+def test_batch_shapes_and_scalar_broadcast():
+    batch = sim_seird_decay_batch(
+        POPULATION - 150, 100.0, 50.0, 0.0, 0.0, 0.5 / POPULATION, 1 / 3, 1 / 5.2, N_DAYS, contact(), 0.006)
+    assert all(run.shape == (1, N_DAYS + 1) for run in batch)
+
+def test_per_scenario_contact():
+    multipliers = np.stack([contact(), np.ones(N_DAYS)])
+    batch = sim_seird_decay_batch(
+        POPULATION - 150, 100.0, 50.0, 0.0, 0.0, 0.5 / POPULATION, 1 / 3, 1 / 5.2, N_DAYS, multipliers, 0.006)
+    for k in range(2):
+        for batched, scalar in zip(batch, scalar_run(0.5 / POPULATION, multipliers=multipliers[k])):
+            np.testing.assert_array_equal(batched[k], scalar)
+
+def test_population_is_conserved():
+    s, e, i, r, d = sim_seird_decay_batch(
+        POPULATION - 150, 100.0, 50.0, 0.0, 0.0, np.array([0.5, 2.0]) / POPULATION, 1 / 3, 1 / 5.2, N_DAYS,
+        contact(), 0.006)
+    np.testing.assert_allclose(s + e + i + r + d, POPULATION, rtol=1e-12)
+    assert (np.stack([s, e, i, r, d]) >= 0).all()
+
+def test_mismatched_scenario_counts_raise():
+    with pytest.raises(ValueError):
+        sim_seird_decay_batch(
+            np.ones(3) * POPULATION, 100.0, 50.0, 0.0, 0.0, np.ones(2) / POPULATION, 1 / 3, 1 / 5.2, N_DAYS,
+            contact(), 0.006)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from covid_model import seird_capacity, sim_seird_decay, sim_seird_decay_capacity
+from covid_model.graph import Graph
+from covid_model.pipeline import model_handles
+from conftest import N_DAYS, POPULATION, RATES, contact, inputs
+
+
+BETA = 0.6 / POPULATION
+START = (POPULATION - 150, 100.0, 50.0, 0.0, 0.0)
+
+
+def run(capacity, overflow_fatal=(0.2, 0.8), rates=RATES[:2]):
+    return sim_seird_decay_capacity(
+        *START, BETA, 1 / 3, 1 / 5.2, N_DAYS, contact(), 0.006, rates, (7.0, 9.0), capacity, 0.05, overflow_fatal)
+
+
+def test_ample_beds_are_the_step_wise_model():
+    runs = run([1e9, 1e9])
+    for got, expected in zip(runs, sim_seird_decay(*START, BETA, 1 / 3, 1 / 5.2, N_DAYS, contact(), 0.006)):
+        np.testing.assert_array_equal(got, expected)
+    assert runs[9][-1] == 0.0
+    # Everyone who needs a bed gets one
+    onsets = np.concatenate([[0.0], np.cumsum(runs[1][:-1] / 5.2)])
+    np.testing.assert_allclose(runs[7], RATES[0] * onsets)
+    np.testing.assert_allclose(runs[8], RATES[1] * onsets)
+
+def test_scarce_beds_keep_the_population_and_the_capacity():
+    capacity = np.array([[2000.0, 400.0], [500.0, 100.0]])
+    runs = sim_seird_decay_capacity(
+        *START, BETA, 1 / 3, 1 / 5.2, N_DAYS, np.ones(N_DAYS), 0.006, RATES[:2], (7.0, 9.0), capacity[:, None],
+        0.05, (0.2, 0.8))
+    np.testing.assert_allclose(sum(runs[:5]), POPULATION)
+    assert np.all(runs[5] <= capacity[:, :1] + 1e-9) and np.all(runs[6] <= capacity[:, 1:] + 1e-9)
+    assert np.all(np.diff(runs[9], axis=-1) >= 0) and runs[9][1, -1] > runs[9][0, -1] > 0
+    assert np.all(runs[4] >= runs[9])
+
+def test_each_patient_without_a_bed_dies_once():
+    e = np.array([1000.0])
+    beds = np.zeros((2, 1))
+    rates = np.array(RATES[:2])[:, None]
+    excess_fatal = np.array([[0.1], [0.5]])
+    step = seird_capacity(
+        np.array([1e5]), e, np.array([100.0]), np.zeros(1), np.zeros(1), beds, 0.0, 1 / 3, 0.2,
+        np.array([1e5 + 1100]), 0.0, rates, np.full((2, 1), 1 / 7), np.zeros((2, 1)), excess_fatal)
+    onsets = 0.2 * 1000.0
+    need_icu = RATES[1] * onsets
+    need_ward = (RATES[0] - RATES[1]) * onsets
+    np.testing.assert_allclose(step[-1], 0.5 * need_icu + 0.1 * need_ward)
+    np.testing.assert_array_equal(step[6], 0.0)
+
+def test_tables_come_from_the_beds_filled():
+    graph = inputs(Graph())
+    plan = np.tile([1500.0, 300.0, 200.0], (graph.get("n_days"), 1))
+    graph.update(capacity_plan=plan, fatal_hosp=0.05, overflow_fatal=(0.2, 0.8))
+    model = model_handles(graph, ("C",))["C"]
+    runs = model.run()
+    census = model.census_array()
+    assert census[:, 0].max() == 1500 and census[:, 1].max() == 300
+    np.testing.assert_array_equal(census[:, :2], np.ceil(np.round(np.stack(runs[5:7], axis=-1)[:-1], 6)))
+    admits = model.admissions()
+    np.testing.assert_allclose(admits["hosp"].values[1:-1], np.diff(runs[7][:-1]))
+    np.testing.assert_allclose(admits["vent"].values[1:-1], np.diff(runs[8][:-1]) * RATES[2] / RATES[1])
+    assert len(model.census()) == graph.get("n_days") - 10
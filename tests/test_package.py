@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from covid_model import InterventionSchedule, sim_seird_decay
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = (
+    "age", "assimilation", "cache", "calibration", "capacity", "census", "checkpoint", "county_store", "graph",
+    "hospital", "integrators", "jhu", "mcmc", "metapop", "models", "pipeline", "rates", "resources", "schedule",
+    "store", "system", "uncertainty")
+
+
+def test_importing_the_package_draws_no_widgets():
+    # A fresh interpreter, so modules the test session already loaded do not count
+    code = "import sys; import covid_model; {}; print('streamlit' in sys.modules)".format(
+        "; ".join("import covid_model.{}".format(module) for module in MODULES))
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_kernels_give_the_same_runs_from_several_threads():
+    contact = InterventionSchedule([(0, 0.0, 0), (20, 0.4, 0)]).contact_multipliers(100)
+    run = lambda beta: sim_seird_decay(999850.0, 100.0, 50.0, 0.0, 0.0, beta, 1 / 3, 1 / 5.2, 100, contact, 0.01)
+    betas = [k * 1e-7 for k in range(3, 11)]
+    with ThreadPoolExecutor(4) as pool:
+        threaded = list(pool.map(run, betas))
+    for beta, runs in zip(betas, threaded):
+        for a, b in zip(runs, run(beta)):
+            np.testing.assert_array_equal(a, b)
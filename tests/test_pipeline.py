@@ -0,0 +1,34 @@
+import numpy as np
+
+from covid_model import sum_dispositions
+from covid_model.graph import Graph
+from covid_model.pipeline import model_handles, registered_models
+from conftest import RATES, inputs
+
+
+def test_the_registry_is_fixed_at_import():
+    before = registered_models()
+    model_handles(inputs(Graph()))
+    model_handles(inputs(Graph()), ("e", "D_ir"))
+    assert list(registered_models()) == list(before)
+    assert "D_ir" in before
+    assert before["D_ir"].simulate is before["D"].simulate and before["D_ir"].ever_infected == slice(2, 4)
+
+def test_handles_compute_only_what_is_asked_for():
+    graph = inputs(Graph())
+    models = model_handles(graph)
+    assert graph.computed == []
+    models["e"].census()
+    assert not any(name.endswith(("_D", "_D2", "_R", "_v")) for name in graph.computed)
+    assert "run_e" in graph.computed and "census_e" in graph.computed
+    graph.begin()
+    models["e"].census()
+    assert graph.computed == []
+
+def test_infected_and_recovered_dispositions_leave_out_deaths():
+    graph = inputs(Graph())
+    models = model_handles(graph, ("D", "D_ir"))
+    s, e, i, r, d = models["D"].run()
+    np.testing.assert_array_equal(models["D_ir"].run()[2], i)
+    np.testing.assert_allclose(graph.get("dispositions_D_ir"), np.stack(sum_dispositions((i, r), RATES)))
+    np.testing.assert_allclose(graph.get("dispositions_D"), np.stack(sum_dispositions((i, r, d), RATES)))
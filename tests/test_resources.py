@@ -0,0 +1,57 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model.hospital import PPE_COLUMNS, PpeRates, census_frame
+from covid_model.resources import (
+    PPE_ITEMS, catalogue_from_csv, item_labels, iter_resources_csv, ppe_catalogue, project_resources,
+    write_resources_csv)
+
+
+def census(shape=(2, 40)):
+    return np.random.default_rng(0).integers(0, 100, size=shape + (3,)).astype(float)
+
+
+def test_ppe_catalogue_reproduces_the_census_table():
+    ppe = PpeRates(10, 12, 20, 30)
+    beds = census()[0]
+    table = census_frame(np.arange(len(beds)), tuple(beds.T), len(beds) + 10, ppe)
+    projection = project_resources(beds, ppe_catalogue(ppe))
+    np.testing.assert_allclose(projection, table[list(PPE_COLUMNS)].values)
+    assert item_labels(ppe_catalogue())[0] == PPE_ITEMS[0] + " (sets)"
+
+def test_catalogue_from_csv():
+    catalogue = catalogue_from_csv(io.StringIO("item,unit,hosp,vent\nN95,masks,6,\nNurse,,0.2,1\n"))
+    assert catalogue.items == ("N95", "Nurse")
+    assert catalogue.units == ("masks", "")
+    np.testing.assert_array_equal(catalogue.rates, [[6, 0, 0], [0.2, 0, 1]])
+    assert item_labels(catalogue) == ["N95 (masks)", "Nurse"]
+    np.testing.assert_allclose(project_resources(np.array([[10.0, 4, 2]]), catalogue), [[60, 4]])
+    with pytest.raises(ValueError):
+        catalogue_from_csv(io.StringIO("name,hosp\nN95,6\n"))
+
+def test_blocks_join_to_one_csv():
+    catalogue = ppe_catalogue()
+    projection = project_resources(census(), catalogue)
+    whole = "".join(iter_resources_csv(projection, catalogue, ["A", "B"], "2020-04-01", block=10 ** 6))
+    blocks = list(iter_resources_csv(projection, catalogue, ["A", "B"], "2020-04-01", block=7))
+    assert len(blocks) == 12
+    assert "".join(blocks) == whole
+    buffer = io.StringIO()
+    write_resources_csv(buffer, projection, catalogue, ["A", "B"], "2020-04-01", block=7)
+    assert buffer.getvalue() == whole
+
+    table = pd.read_csv(io.StringIO(whole))
+    assert list(table.columns[:3]) == ["scenario", "day", "date"]
+    assert table["scenario"].tolist() == ["A"] * 40 + ["B"] * 40
+    assert table["date"].iloc[41] == "2020-04-02"
+    np.testing.assert_allclose(table[item_labels(catalogue)].values, projection.reshape(80, -1), atol=0.05)
+
+def test_write_to_path(tmp_path):
+    catalogue = ppe_catalogue()
+    projection = project_resources(census(), catalogue)
+    path = tmp_path / "resources.csv"
+    write_resources_csv(str(path), projection, catalogue, ["A", "B"])
+    assert path.read_text() == "".join(iter_resources_csv(projection, catalogue, ["A", "B"]))
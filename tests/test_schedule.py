@@ -0,0 +1,56 @@
+import io
+
+import numpy as np
+
+from covid_model import InterventionSchedule
+
+
+def legacy_multiplier(day, int1_delta, int2_delta, end_delta, decay1, decay2, decay3, decay4, start_day=1):
+    """The if/elif chain the decay kernels walked every step before schedules were compiled."""
+    if start_day <= day <= int1_delta:
+        return 1 - decay1
+    elif int1_delta <= day <= int2_delta:
+        return 1 - decay2
+    elif int2_delta <= day <= end_delta:
+        return 1 - decay3
+    return 1 - decay4
+
+
+def test_four_phases_match_the_legacy_chain_after_day_zero():
+    int1, int2, end, decays = 20, 27, 80, (0.0, 0.15, 0.40, 0.20)
+    schedule = InterventionSchedule([(0, decays[0], 0), (int1 + 1, decays[1], 0), (int2 + 1, decays[2], 0),
+                                     (end + 1, decays[3], 0)])
+    contact = schedule.contact_multipliers(150)
+    expected = [legacy_multiplier(day, int1, int2, end, *decays) for day in range(150)]
+    np.testing.assert_allclose(contact[1:], expected[1:], rtol=0, atol=1e-15)
+    # Day 0 fell through to the post-end level before; it now has the first phase
+    assert contact[0] == 1 - decays[0]
+
+def test_no_reduction_before_the_first_phase():
+    contact = InterventionSchedule([(10, 0.5, 0)]).contact_multipliers(20)
+    np.testing.assert_array_equal(contact[:10], 1.0)
+    np.testing.assert_array_equal(contact[10:], 0.5)
+
+def test_ramp_moves_linearly_from_the_previous_level():
+    contact = InterventionSchedule([(0, 0.0, 0), (10, 0.4, 4)]).contact_multipliers(20)
+    np.testing.assert_allclose(contact[9:15], [1.0, 1.0, 0.9, 0.8, 0.7, 0.6])
+    np.testing.assert_allclose(contact[14:], 0.6)
+
+def test_phases_are_sorted_and_a_sweep_compiles_in_one_product():
+    schedule = InterventionSchedule([(30, 0.4, 0), (0, 0.1, 0)])
+    assert [phase.day for phase in schedule.phases] == [0, 30]
+    reductions = np.array([[0.1, 0.4], [0.0, 0.0], [0.2, 0.9]])
+    sweep = schedule.contact_multipliers(60, reductions)
+    assert sweep.shape == (3, 60)
+    np.testing.assert_array_equal(sweep[0], schedule.contact_multipliers(60))
+    np.testing.assert_array_equal(sweep[1], 1.0)
+
+def test_phases_past_the_horizon_are_ignored():
+    contact = InterventionSchedule([(0, 0.2, 0), (500, 0.9, 0)]).contact_multipliers(30)
+    np.testing.assert_allclose(contact, 0.8)
+
+def test_from_csv_dates_relative_to_the_start_date():
+    table = io.StringIO("date,reduction,ramp_days\n2020-03-01,0,\n2020-03-11,50,2\n")
+    schedule = InterventionSchedule.from_csv(table, "2020-03-01")
+    assert schedule.phases[1].day == 10 and schedule.phases[1].ramp_days == 2
+    np.testing.assert_allclose(schedule.contact_multipliers(14)[9:13], [1.0, 1.0, 0.75, 0.5])
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from covid_model import store
+from covid_model.store import CsvStore, open_store, read_frame, write_frame
+
+
+def write_source(path, rows=3, mtime=1000000000):
+    pd.DataFrame({
+        "Province/State": ["A", None, "C"][:rows], "Lat": np.arange(rows, dtype=float), "1/22/20": np.arange(rows),
+    }).to_csv(str(path), index=False)
+    os.utime(str(path), (mtime, mtime))
+    return str(path)
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+
+def test_frames_round_trip_with_missing_text(tmp_path):
+    frame = pd.DataFrame({"name": ["a", None, "c"], "x": [1.5, np.nan, 3.0], "n": [1, 2, 3], "flag": [True, False, True]})
+    write_frame(frame, str(tmp_path / "f.npz"))
+    loaded = read_frame(str(tmp_path / "f.npz"))
+    assert list(loaded.columns) == list(frame.columns)
+    assert loaded["name"].isna().tolist() == [False, True, False]
+    assert loaded["name"][0] == "a"
+    np.testing.assert_array_equal(loaded["x"].values, frame["x"].values)
+    np.testing.assert_array_equal(loaded["n"].values, frame["n"].values)
+
+def test_local_source_is_fetched_once_and_revalidated_by_mtime(tmp_path):
+    source = write_source(tmp_path / "cases.csv")
+    cache = CsvStore(source, str(tmp_path / "cache"), ttl=0.0)
+    assert cache.refresh()
+    assert os.path.exists(cache.path) and cache.checked_at() is not None
+    assert len(cache.frame()) == 3
+    # Unchanged source: nothing new is stored
+    assert not cache.refresh()
+    write_source(tmp_path / "cases.csv", rows=2, mtime=1000000100)
+    assert cache.refresh()
+    assert len(cache.frame()) == 2
+    # A fresh store reads the copy on disk
+    assert len(CsvStore(source, str(tmp_path / "cache"), ttl=3600.0).frame()) == 2
+
+def test_local_copy_survives_an_unreachable_source(tmp_path):
+    source = write_source(tmp_path / "cases.csv")
+    cache = CsvStore(source, str(tmp_path / "cache"))
+    cache.refresh()
+    os.remove(source)
+    assert not cache.refresh()
+    assert len(cache.frame()) == 3
+    with pytest.raises(OSError):
+        CsvStore(source, str(tmp_path / "other")).refresh()
+
+def test_http_revalidation_sends_the_stored_validators(tmp_path, monkeypatch):
+    calls = []
+    responses = [
+        FakeResponse(200, b"a,b\n1,2\n", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jun 2020 00:00:00 GMT"}),
+        FakeResponse(304),
+    ]
+
+    def get(url, headers, timeout):
+        calls.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr(store.requests, "get", get)
+    cache = CsvStore("https://example.org/data/cases.csv", str(tmp_path), ttl=3600.0)
+    assert cache.refresh()
+    version = cache.version()
+    assert not cache.refresh()
+    assert calls[0] == {}
+    assert calls[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jun 2020 00:00:00 GMT"}
+    assert cache.frame()["b"].tolist() == [2]
+    assert cache.version() == version
+
+def test_stores_are_shared_per_source(tmp_path):
+    source = write_source(tmp_path / "cases.csv")
+    assert open_store(source, str(tmp_path)) is open_store(source, str(tmp_path))
+    assert open_store(source, str(tmp_path)) is not open_store(source, str(tmp_path / "elsewhere"))
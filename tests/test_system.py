@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+from covid_model.hospital import build_hospital_tables
+from covid_model.system import (
+    HealthSystem, build_system_tables, hospital_dispositions, peak_census, system_from_csv)
+from conftest import HOSPITAL_DAYS, dispositions
+
+
+LENGTHS_OF_STAY = (7, 9, 10)
+
+
+def system(shares, lengths_of_stay):
+    shares = np.asarray(shares, dtype=float)
+    return HealthSystem(
+        tuple("H{}".format(h) for h in range(len(shares))), np.arange(shares.shape[1]), shares,
+        np.asarray(lengths_of_stay, dtype=int), np.full((len(shares), 3), np.nan))
+
+
+def test_one_hospital_with_the_whole_region_is_the_regional_table():
+    disp = dispositions(2)
+    tables = build_system_tables(disp[:, None], system([[1.0]], [LENGTHS_OF_STAY]))
+    expected = build_hospital_tables(disp, LENGTHS_OF_STAY)
+    for got, want in zip(tables, expected):
+        np.testing.assert_array_equal(got[:, 0], want)
+
+def test_each_hospital_has_its_own_share_and_stay():
+    disp = dispositions(2)
+    shares = [[0.5, 0.0], [0.25, 1.0]]
+    stays = [LENGTHS_OF_STAY, (3, 4, 5)]
+    tables = build_system_tables(disp, system(shares, stays))
+    assert tables.census.shape == (2, HOSPITAL_DAYS, 3)
+    np.testing.assert_allclose(hospital_dispositions(disp, np.asarray(shares))[1], 0.25 * disp[0] + disp[1])
+    for h in range(2):
+        own = build_hospital_tables(np.tensordot(shares[h], disp, axes=1), stays[h])
+        np.testing.assert_allclose(tables.admits[h], own.admits)
+        np.testing.assert_array_equal(tables.census[h], own.census)
+
+def test_system_from_csv():
+    table = (
+        "hospital,region,share,icu_los,hosp_capacity\n"
+        "North,1001,0.6,12,300\nNorth,1003,0.2,,\nSouth,1001,0.3,,120\n")
+    health = system_from_csv(io.StringIO(table), LENGTHS_OF_STAY)
+    assert health.hospitals == ("North", "South")
+    assert health.regions.tolist() == [1001, 1003]
+    np.testing.assert_allclose(health.shares, [[0.6, 0.2], [0.3, 0.0]])
+    np.testing.assert_array_equal(health.lengths_of_stay, [[7, 12, 10], [7, 9, 10]])
+    np.testing.assert_array_equal(health.capacity[:, 0], [300, 120])
+    assert np.isnan(health.capacity[:, 1:]).all()
+
+    with pytest.raises(ValueError):
+        system_from_csv(io.StringIO("hospital,share\nNorth,0.5\n"), LENGTHS_OF_STAY)
+    with pytest.raises(ValueError):
+        system_from_csv(io.StringIO("hospital,region,share\nNorth,1001,0.7\nSouth,1001,0.4\n"), LENGTHS_OF_STAY)
+
+def test_peak_census():
+    tables = build_system_tables(dispositions(2), system([[0.5, 0.0], [0.25, 1.0]], [LENGTHS_OF_STAY] * 2))
+    peaks = peak_census(tables, ["North", "South"], 30)
+    assert peaks["hospital"].tolist() == ["North", "South"]
+    np.testing.assert_array_equal(peaks["icu_peak"], tables.census[:, :30, 1].max(axis=1))
+    np.testing.assert_array_equal(peaks["vent_peak_day"], tables.census[:, :30, 2].argmax(axis=1))
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from covid_model import InterventionSchedule, build_admissions_df, build_census_df, sim_seird_decay
+from covid_model.rates import intrinsic_growth_rate, seir_beta
+from covid_model.uncertainty import around, draw, percentile_bands, run_seird_ensemble, sample_parameters
+
+
+POPULATION = 1000000.0
+N_DAYS = 120
+SCHEDULE = InterventionSchedule([(0, 0.0, 0), (20, 0.3, 0), (50, 0.5, 0)])
+VALUES = dict(doubling_time=4.0, incubation_period=5.2, infectious_period=3.0, fatal=0.01, hosp_rate=0.025,
+              icu_rate=0.0075, vent_rate=0.005)
+
+
+def test_around_clips_to_the_valid_range():
+    assert around(0.9, 0.5, upper=1.0) == ("triangular", 0.45, 0.9, 1.0)
+    assert around(2.0, 0.0).kind == "fixed"
+    rng = np.random.default_rng(0)
+    values = draw(around(0.9, 0.5, "uniform", upper=1.0), 10000, rng)
+    assert values.min() >= 0.45 and values.max() <= 1.0
+    with pytest.raises(ValueError):
+        draw(("lognormal", 0.0, 1.0, 2.0), 10, rng)
+
+def test_samples_depend_only_on_the_seed():
+    distributions = {name: around(value, 0.2) for name, value in VALUES.items()}
+    first, second = sample_parameters(distributions, 500, seed=3), sample_parameters(distributions, 500, seed=3)
+    for name in VALUES:
+        np.testing.assert_array_equal(first[name], second[name])
+        assert first[name].shape == (500,)
+
+def test_fixed_draws_reproduce_the_deterministic_tables():
+    n_draws = 4
+    samples = {name: np.full(n_draws, value) for name, value in VALUES.items()}
+    reductions = np.tile([phase.reduction for phase in SCHEDULE.phases], (n_draws, 1))
+    ensemble = run_seird_ensemble(POPULATION, 100.0, 50.0, samples, SCHEDULE, reductions, N_DAYS, (5, 9, 6))
+    assert ensemble.admits.shape == ensemble.census.shape == (n_draws, N_DAYS, 3)
+
+    alpha, gamma = 1 / VALUES["incubation_period"], 1 / VALUES["infectious_period"]
+    beta = seir_beta(intrinsic_growth_rate(VALUES["doubling_time"]), alpha, VALUES["infectious_period"], POPULATION)
+    _, _, i, r, d = sim_seird_decay(POPULATION - 150, 100.0, 50.0, 0.0, 0.0, beta, gamma, alpha, N_DAYS,
+                                    SCHEDULE.contact_multipliers(N_DAYS), VALUES["fatal"])
+    rates = (VALUES["hosp_rate"], VALUES["icu_rate"], VALUES["vent_rate"])
+    admits = build_admissions_df([(i + r + d) * rate for rate in rates], N_DAYS)
+    census = build_census_df(admits, (5, 9, 6), N_DAYS)
+    for k, category in enumerate(("hosp", "icu", "vent")):
+        np.testing.assert_allclose(ensemble.admits[0, 1:, k], admits[category].values[1:N_DAYS], rtol=1e-6)
+        np.testing.assert_allclose(ensemble.census[-1, :len(census), k], census[category].values, rtol=1e-6)
+
+def test_ensemble_admits_the_regional_share():
+    samples = {name: np.full(2, value) for name, value in VALUES.items()}
+    reductions = np.tile([phase.reduction for phase in SCHEDULE.phases], (2, 1))
+    whole = run_seird_ensemble(POPULATION, 100.0, 50.0, samples, SCHEDULE, reductions, N_DAYS, (5, 9, 6))
+    share = run_seird_ensemble(POPULATION, 100.0, 50.0, samples, SCHEDULE, reductions, N_DAYS, (5, 9, 6), "euler", 0.25)
+    np.testing.assert_allclose(share.admits, 0.25 * whole.admits)
+
+def test_percentile_bands_match_numpy():
+    values = np.random.default_rng(1).gamma(2.0, 10.0, (1001, 30, 2))
+    bands = percentile_bands(values, ("a", "b"))
+    assert len(bands) == 60
+    for k, key in enumerate(("a", "b")):
+        rows = bands[bands.key == key]
+        for p in (5, 25, 50, 75, 95):
+            np.testing.assert_allclose(rows["p{}".format(p)].values, np.percentile(values[:, :, k], p, axis=0))